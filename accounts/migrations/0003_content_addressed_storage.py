@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 23:33
+
+import accounts.models
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_squashed_0002_user_profile_picture"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="profile_picture",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to=accounts.models.user_profile_picture_path,
+            ),
+        ),
+    ]
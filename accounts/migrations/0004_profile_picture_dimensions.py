@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 00:05
+
+import accounts.models
+import catalog.fields
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="profile_picture_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="profile_picture_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="profile_picture",
+            field=catalog.fields.StoredImageField(
+                blank=True,
+                height_field="profile_picture_height",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to=accounts.models.user_profile_picture_path,
+                width_field="profile_picture_width",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 01:20
+
+import catalog.fields
+import catalog.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_profile_picture_dimensions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="profile_picture",
+            field=catalog.fields.StoredImageField(
+                blank=True,
+                height_field="profile_picture_height",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to="",
+                width_field="profile_picture_width",
+            ),
+        ),
+    ]
@@ -1,12 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.core.files.storage import default_storage
+from catalog.fields import StoredImageField
+from catalog.storage import blob_storage
 
 
 def user_profile_picture_path(instance, filename):
-    # Get the file extension
-    ext = filename.split(".")[-1]
-    # Create the path: accounts/<username>/<filename>.<ext>
+    # No longer used, BlobStorage names files by their content (catalog.storage).
+    # Kept because old migrations import it
     return f"accounts/{instance.username}/{filename}"
 
 
@@ -15,11 +15,19 @@ class User(AbstractUser):
     role = models.IntegerField(
         default=0, help_text="0=Patron, 1=Librarian (superusers remain separate)."
     )
-    profile_picture = models.ImageField(
-        upload_to=user_profile_picture_path,
+    profile_picture = StoredImageField(
         null=True,
         blank=True,
-        storage=default_storage,
+        storage=blob_storage,
+        width_field="profile_picture_width",
+        height_field="profile_picture_height",
+    )
+    # Recorded on upload so .width/.height never download the picture
+    profile_picture_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    profile_picture_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
     )
 
     class Meta:
@@ -3,6 +3,9 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponseForbidden
+from django.core.exceptions import ValidationError
+from catalog import jobs
+from catalog.images import probe
 from catalog.models import ItemReview, Item
 from loans.models import Loan
 from collection.models import CollectionAuthorizedUser, CollectionItems
@@ -58,9 +61,9 @@ def user_profile(request, username):
         # Only fetch this data for the user's own profile
         authorized_collections = CollectionAuthorizedUser.objects.filter(
             user=user
-        ).select_related("collection")
+        ).select_related("collection__creator")
         access_requests = AccessRequest.objects.filter(user=user).select_related(
-            "collection"
+            "collection__creator"
         )
 
         # Combine data for exclusive access section
@@ -76,6 +79,8 @@ def user_profile(request, username):
     else:
         # If viewing someone else's profile, only show public collections
         user_collections = user.collections_created.filter(visibility=0)
+    # Each card lists its items
+    user_collections = user_collections.prefetch_related("collectionitems_set__item")
 
     # gets all 'available to add' items for the collection creation modal if this is the user's own profile
     all_items = None
@@ -106,8 +111,14 @@ def update_profile_photo(request):
     if request.method == "POST":
         if "profile_picture" in request.FILES:
             user = request.user
+            try:
+                probe(request.FILES["profile_picture"])
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect("accounts:user_profile", username=request.user.username)
             user.profile_picture = request.FILES["profile_picture"]
             user.save()
+            jobs.enqueue_derivatives(user.profile_picture.name)
             messages.success(request, "Profile picture updated successfully!")
         else:
             messages.error(request, "No file was uploaded.")
@@ -0,0 +1,42 @@
+"""
+Shared setup for the blob storage benchmarks: Django with a throwaway SQLite
+database (VercelBlobStorage keeps its index in core.BlobURL) and a storage
+pointed at a FakeBlobServer.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def configure(api_url, **overrides):
+    """Set up Django against api_url, returns (storage_backends, storage)"""
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hootel.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["VERCEL_BLOB_READ_WRITE_TOKEN"] = "benchmark"
+    directory = tempfile.mkdtemp()
+
+    # Before django.setup(), so nothing connects to the configured database
+    settings.DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(directory, "db.sqlite3"),
+        }
+    }
+    settings.VERCEL_BLOB_API_URL = api_url
+    settings.VERCEL_BLOB_MANIFEST = os.path.join(directory, "blob-manifest.json")
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    django.setup()
+    call_command("migrate", verbosity=0)
+
+    import storage_backends
+
+    return storage_backends, storage_backends.VercelBlobStorage()
@@ -0,0 +1,127 @@
+"""
+Throughput of VercelBlobStorage operations against the local fake Blob API,
+with no token or network access needed.
+
+    python benchmarks/blob_storage.py [--operations 200] [--size 4096]
+        [--latency 0.02] [--error-rate 0.05] [--tls] [--json results.json]
+
+Each operation is timed on its own: save, url (cold, from a new storage
+instance, and warm), size, open + read (through the disk cache), delete,
+and delete_many for the whole set. --latency adds a delay to every fake
+response and --error-rate fails that fraction of requests with a 503, so
+the retry path is measured too. --json writes the numbers for tracking
+between runs, e.g. in CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from blob_setup import configure
+from fake_blob_server import FakeBlobServer
+
+
+def timed(calls):
+    """Run the callables, returns per-call seconds and the total"""
+    timings = []
+    start = time.perf_counter()
+    for call in calls:
+        began = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - began)
+    return timings, time.perf_counter() - start
+
+
+def summary(timings, elapsed):
+    ordered = sorted(timings)
+    return {
+        "operations": len(ordered),
+        "ops_per_second": round(len(ordered) / elapsed, 1) if elapsed else None,
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def run(backend, storage, operations, payload):
+    from django.core.files.base import ContentFile
+
+    names = [f"bench/{i}.bin" for i in range(operations)]
+    results = {}
+
+    def measure(label, calls):
+        backend.reset_blob_stats()
+        timings, elapsed = timed(calls)
+        results[label] = summary(timings, elapsed)
+        stats = backend.blob_stats()
+        results[label]["requests"] = sum(
+            v for k, v in stats.items() if k.endswith(".requests")
+        )
+        results[label]["retries"] = sum(
+            v for k, v in stats.items() if k.endswith(".retries")
+        )
+
+    measure(
+        "save",
+        [lambda n=n: storage.save(n, ContentFile(payload)) for n in names],
+    )
+    cold = backend.VercelBlobStorage()
+    measure("url (cold)", [lambda n=n: cold.url(n) for n in names])
+    measure("url (warm)", [lambda n=n: storage.url(n) for n in names])
+    measure("size", [lambda n=n: storage.size(n) for n in names])
+
+    def read(name):
+        with storage.open(name) as f:
+            f.read()
+
+    measure("open + read", [lambda n=n: read(n) for n in names])
+    half = len(names) // 2
+    measure("delete", [lambda n=n: storage.delete(n) for n in names[:half]])
+    measure("delete_many", [lambda: storage.delete_many(names[half:])])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--latency", type=float, default=0, help="seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, FakeBlobServer(
+        tls=args.tls,
+        directory=directory,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        seed=0,
+    ) as server:
+        if server.cert_path:
+            os.environ["REQUESTS_CA_BUNDLE"] = server.cert_path
+        backend, storage = configure(
+            server.url, VERCEL_BLOB_CACHE_DIR=os.path.join(directory, "cache")
+        )
+        results = run(backend, storage, args.operations, os.urandom(args.size))
+
+    print(
+        f"{args.operations} x {args.size} byte blobs, latency {args.latency * 1000:g} ms, "
+        f"error rate {args.error_rate:g}"
+    )
+    for label, row in results.items():
+        print(
+            f"{label:>12}: {row['ops_per_second'] or 0:>9.1f} ops/s "
+            f"{row['median_ms']:>8.2f} ms median {row['p95_ms']:>8.2f} ms p95 "
+            f"{row['requests']:>5} requests {row['retries']:>3} retries"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Latency of many small Vercel Blob operations, one connection per request
+(what VercelBlobStorage used to do) vs the pooled keep-alive session.
+
+    python benchmarks/blob_transport.py [--operations 200] [--size 2048]
+
+Runs against a local HTTPS server that speaks the subset of the Blob API the
+storage uses, with a throwaway self-signed certificate, so each fresh
+connection pays a real TCP and TLS handshake. Real round trips to the Blob
+API are far longer than loopback, so the gap in production is larger.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from blob_setup import configure
+from fake_blob_server import FakeBlobServer
+
+
+def run(storage, operations, payload):
+    from django.core.files.base import ContentFile
+
+    timings = []
+    for i in range(operations):
+        name = f"bench/{i}.bin"
+        start = time.perf_counter()
+        storage.save(name, ContentFile(payload))
+        storage.open(name).read()
+        storage.delete(name)
+        timings.append((time.perf_counter() - start) / 3)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--size", type=int, default=2048)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, FakeBlobServer(
+        tls=True, directory=directory
+    ) as server:
+        # Both modes trust the throwaway certificate
+        os.environ["REQUESTS_CA_BUNDLE"] = server.cert_path
+        api_url = server.url
+        backend, storage = configure(api_url)
+        payload = os.urandom(args.size)
+
+        import requests
+
+        class FreshSession:
+            """A new session, and so a new connection, for every request"""
+
+            def request(self, *args, **kwargs):
+                with requests.Session() as session:
+                    return session.request(*args, **kwargs)
+
+        results = {}
+        pooled = backend.get_session
+        for mode, session in (("per-request", FreshSession), ("pooled", pooled)):
+            backend.get_session = session
+            run(storage, 5, payload)  # warm up
+            backend.reset_blob_stats()
+            start = time.perf_counter()
+            timings = run(storage, args.operations, payload)
+            results[mode] = (time.perf_counter() - start, timings, backend.blob_stats())
+
+    total_ops = args.operations * 3
+    print(f"{total_ops} operations ({args.size} byte blobs) against {api_url}")
+    for mode, (elapsed, timings, stats) in results.items():
+        timings.sort()
+        print(
+            f"{mode:>12}: {elapsed:.2f}s total, "
+            f"{statistics.median(timings) * 1000:.2f} ms median, "
+            f"{timings[int(len(timings) * 0.95)] * 1000:.2f} ms p95 per operation, "
+            f"{sum(v for k, v in stats.items() if k.endswith('.requests'))} requests"
+        )
+    speedup = results["per-request"][0] / results["pooled"][0]
+    print(f"pooled is {speedup:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
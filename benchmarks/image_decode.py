@@ -0,0 +1,115 @@
+"""
+Peak memory of resizing a large upload, full decode vs reduced-size decode.
+
+    python benchmarks/image_decode.py [--megapixels 40]
+
+Each mode runs in a fresh subprocess and reports the growth of its peak RSS
+over the baseline after imports, so Pillow's C allocations are counted too.
+The test photo is also made in a subprocess, since a child inherits its
+parent's peak RSS.
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_photo(path, megapixels):
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    noise = Image.effect_noise((width, height), 40)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    Image.merge("RGB", (noise, gradient, noise)).save(path, format="JPEG", quality=90)
+    return width, height
+
+
+def run_full(path):
+    # What create_item used to do inside the request
+    import sys as _sys
+    from PIL import Image
+    from catalog.images import IMAGE_SPECS, fit_within
+
+    spec = IMAGE_SPECS["hero_image"]
+    image = Image.open(path)
+    image = image.resize(
+        fit_within(image.width, image.height, spec.width, spec.height), Image.LANCZOS
+    )
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=spec.quality)
+    return _sys.getsizeof(output)
+
+
+def run_reduced(path):
+    from catalog.images import IMAGE_SPECS, resize_image
+
+    with open(path, "rb") as f, resize_image(f, IMAGE_SPECS["hero_image"]) as out:
+        return out.size
+
+
+def child(mode, path):
+    from django.conf import settings
+
+    settings.configure()
+    import PIL.Image  # noqa: F401, imported before the baseline
+    import catalog.images  # noqa: F401
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    {"full": run_full, "reduced": run_reduced}[mode](path)
+    elapsed = time.perf_counter() - start
+    print(f"{peak_rss_mb() - baseline:.1f} {elapsed:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=40)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--make", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+    if args.make:
+        print(*make_photo(args.make, args.megapixels))
+        return
+
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "photo.jpg")
+        width, height = subprocess.run(
+            [sys.executable, __file__, "--make", path, "--megapixels", str(args.megapixels)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{width}x{height} JPEG, {size_mb:.1f} MB, resized to the hero spec\n")
+        print(f"{'mode':<10}{'peak RSS growth':>18}{'time':>10}")
+
+        for mode in ("full", "reduced"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, path],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.split()
+            print(f"{mode:<10}{float(out[0]):>15.1f} MB{float(out[1]):>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
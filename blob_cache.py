@@ -0,0 +1,180 @@
+"""
+Read-through disk cache for blob downloads, used by VercelBlobStorage._open.
+
+Each cached blob is one file, <directory>/<aa>/<sha256 of url>-<etag>, so the
+body and the ETag it was served with are always replaced together by a
+single os.replace(). Every open revalidates with If-None-Match: a 304 serves
+the local file, a 200 streams the new body to disk first. Files are touched
+on use and the least recently used are evicted once the directory grows past
+max_bytes, which works across processes sharing the directory.
+"""
+
+import base64
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 256 * 1024
+# Eviction goes down to this fraction of max_bytes so it doesn't run on
+# every write once the cache is full
+LOW_WATER = 0.9
+
+
+def _encode_etag(etag):
+    return base64.urlsafe_b64encode(etag.encode()).decode().rstrip("=")
+
+
+def _decode_etag(encoded):
+    return base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+
+
+class BlobDiskCache:
+
+    def __init__(self, directory, max_bytes, max_entry_bytes=None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self._total = None  # bytes on disk, counted on first write
+
+    def _location(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, key[:2]), key
+
+    def _entry(self, bucket, key):
+        """(path, etag) of the cached copy, or (None, None)"""
+        try:
+            names = os.listdir(bucket)
+        except FileNotFoundError:
+            return None, None
+        for name in names:
+            if name.startswith(key + "-") and not name.endswith(".tmp"):
+                return os.path.join(bucket, name), _decode_etag(name[len(key) + 1:])
+        return None, None
+
+    def open(self, url, get):
+        """
+        Open url through the cache. get(headers) sends a streamed GET and
+        returns the response. Returns (file, hit), raises FileNotFoundError
+        if the blob can't be read.
+        """
+        bucket, key = self._location(url)
+        path, etag = self._entry(bucket, key)
+
+        response = get({"If-None-Match": etag} if etag else {})
+        if response.status_code == 304 and path:
+            response.close()
+            try:
+                os.utime(path)
+                return open(path, "rb"), True
+            except FileNotFoundError:
+                # Evicted by another process in the meantime
+                response = get({})
+
+        if response.status_code != 200:
+            response.close()
+            raise FileNotFoundError(f"Could not read {url}: {response.status_code}")
+
+        new_etag = response.headers.get("ETag")
+        length = response.headers.get("Content-Length")
+        if not new_etag or (length and int(length) > self.max_entry_bytes):
+            return self._spool(response), False
+
+        os.makedirs(bucket, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=bucket, suffix=".tmp")
+        spooled = None
+        try:
+            with os.fdopen(fd, "w+b") as f, response:
+                chunks = response.iter_content(CHUNK_SIZE)
+                for chunk in chunks:
+                    f.write(chunk)
+                    # Without a Content-Length the size is only known here
+                    if f.tell() > self.max_entry_bytes:
+                        f.seek(0)
+                        spooled = self._spool(response, f, chunks)
+                        break
+                size = f.tell()
+            if spooled is None:
+                final = os.path.join(bucket, f"{key}-{_encode_etag(new_etag)}")
+                os.replace(tmp, final)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        if spooled is not None:
+            os.unlink(tmp)
+            return spooled, False
+
+        if path and path != final:
+            self._remove(path)
+        cached = open(final, "rb")
+        self._added(size)
+        return cached, False
+
+    def _spool(self, response, head=None, chunks=None):
+        """
+        Read an uncacheable body into a temporary file, still kept off the
+        heap beyond CHUNK_SIZE. head is a file holding the start of the body
+        when chunks is the rest of it.
+        """
+        output = tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE)
+        if head is not None:
+            for chunk in iter(lambda: head.read(CHUNK_SIZE), b""):
+                output.write(chunk)
+        with response:
+            for chunk in chunks or response.iter_content(CHUNK_SIZE):
+                output.write(chunk)
+        output.seek(0)
+        return output
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        if self._total is not None:
+            self._total -= size
+
+    def _entries(self):
+        """[(mtime, size, path), ...] of every cached file"""
+        entries = []
+        try:
+            buckets = os.scandir(self.directory)
+        except FileNotFoundError:
+            return entries
+        with buckets:
+            for bucket in buckets:
+                if not bucket.is_dir():
+                    continue
+                with os.scandir(bucket.path) as files:
+                    for entry in files:
+                        if entry.name.endswith(".tmp"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def _added(self, size):
+        if self._total is None:
+            self._total = sum(size for _, size, _ in self._entries())
+        else:
+            self._total += size
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used files until under the low-water mark"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * LOW_WATER
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total = total
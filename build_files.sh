@@ -10,12 +10,29 @@ pip install -r requirements.txt
 # Set Django settings module
 export DJANGO_SETTINGS_MODULE=hootel.settings
 
-# Collect static files
-echo "Collecting static files..."
-python manage.py collectstatic --noinput --clear
-
 # Run database migrations (if needed)
 echo "Running database migrations..."
 python manage.py migrate --noinput
+python manage.py createcachetable
+
+# Upload new and changed static files (blob URLs are recorded in the database)
+echo "Collecting static files..."
+python manage.py collectstatic_blobs --noinput
+
+# Rebuild denormalized read models
+echo "Rebuilding destination cards..."
+python manage.py rebuild_destination_cards
+
+# Record dimensions and placeholders of images stored before they were recorded
+echo "Backfilling image metadata..."
+python manage.py backfill_image_metadata
+
+# Build responsive image derivatives for images that don't have them yet
+echo "Generating image derivatives..."
+python manage.py generate_image_derivatives --run
+
+# Delete stored images nothing has referenced for the grace period
+echo "Collecting unreferenced blobs..."
+python manage.py collect_blobs
 
 echo "Build process completed successfully!"
\ No newline at end of file
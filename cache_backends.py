@@ -0,0 +1,209 @@
+"""
+Two-tier cache backend: a small in-process LRU in front of a shared cache.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "cache_backends.TieredCache",
+            "LOCATION": "shared",  # alias of the shared cache
+            "OPTIONS": {"LOCAL_MAX_ENTRIES": 1000, "LOCAL_TIMEOUT": 10},
+        },
+        "shared": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", ...},
+    }
+
+Reads are served from the local tier when they can be, then from the shared
+one, and whatever the shared tier returns is kept locally for at most
+LOCAL_TIMEOUT seconds. Writes and deletes go to both tiers, so another
+process sees a change to a plain key within LOCAL_TIMEOUT, and keys that
+embed a version (see core.caching) are never stale at all. Integers are
+counters: they are never kept locally, so incr() in one process is seen
+by every other one at once.
+
+The local tier is shared by the threads of a process, like LocMemCache, and
+holds pickled values so callers can't mutate what is cached. Hits and misses
+per tier are counted, see stats().
+"""
+
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+LOCAL_MAX_ENTRIES = 1000
+LOCAL_TIMEOUT = 10  # seconds
+
+# Per process, keyed by the shared alias, like LocMemCache's globals
+_locals = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = location
+        self._max_local = options.get("LOCAL_MAX_ENTRIES", LOCAL_MAX_ENTRIES)
+        self._local_timeout = options.get("LOCAL_TIMEOUT", LOCAL_TIMEOUT)
+        self._local = _locals.setdefault(location, OrderedDict())
+        self._counts = _stats.setdefault(location, Counter())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Local tier
+
+    def _local_get(self, key):
+        with _lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires, pickled = entry
+            if expires < time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return pickled
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if isinstance(value, int) or not self._max_local:
+            self._local_discard(key)
+            return
+        expires = time.time() + self._local_timeout
+        backend_timeout = self.get_backend_timeout(timeout)
+        if backend_timeout is not None:
+            expires = min(expires, backend_timeout)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with _lock:
+            self._local[key] = (expires, pickled)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_local:
+                self._local.popitem(last=False)
+
+    def _local_discard(self, key):
+        with _lock:
+            self._local.pop(key, None)
+
+    def _count(self, outcome, n=1):
+        with _lock:
+            self._counts[outcome] += n
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        pickled = self._local_get(local_key)
+        if pickled is not None:
+            self._count("local_hits")
+            return pickle.loads(pickled)
+
+        value = self.shared.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            self._count("misses")
+            return default
+        self._count("shared_hits")
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            pickled = self._local_get(self.make_and_validate_key(key, version=version))
+            if pickled is None:
+                remote.append(key)
+            else:
+                found[key] = pickle.loads(pickled)
+        self._count("local_hits", len(found))
+
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            for key, value in fetched.items():
+                self._local_set(self.make_key(key, version=version), value)
+            found.update(fetched)
+            self._count("shared_hits", len(fetched))
+            self._count("misses", len(remote) - len(fetched))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(local_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self.make_key(key, version=version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(local_key, value, timeout)
+        else:
+            # Someone else's value won, read it from the shared tier next time
+            self._local_discard(local_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_discard(self.make_and_validate_key(key, version=version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_discard(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_discard(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        return self._local_get(local_key) is not None or self.shared.has_key(
+            key, version=version
+        )
+
+    def incr(self, key, delta=1, version=None):
+        self._local_discard(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        with _lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop this process's local tier only"""
+        with _lock:
+            self._local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    # Counters
+
+    def stats(self):
+        """Hits and misses per tier for this process, and the local tier's size"""
+        with _lock:
+            counts = dict(self._counts)
+            entries = len(self._local)
+        lookups = sum(counts.values())
+        hits = counts.get("local_hits", 0) + counts.get("shared_hits", 0)
+        return {
+            "local_hits": counts.get("local_hits", 0),
+            "shared_hits": counts.get("shared_hits", 0),
+            "misses": counts.get("misses", 0),
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "local_entries": entries,
+        }
+
+    def reset_stats(self):
+        with _lock:
+            self._counts.clear()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Item, ItemReview
+from .models import Blob, ImageJob, Item, ItemReview
 
 
 @admin.register(Item)
@@ -9,12 +9,24 @@ class ItemAdmin(admin.ModelAdmin):
         "status",
         "location",
         "price_per_night",
+        "review_count",
+        "rating_average",
         "created_at",
         "created_by",
     )
     list_filter = ("status", "created_at")
     search_fields = ("title", "description")
     date_hierarchy = "created_at"
+    # Maintained by ItemReview, see reconcile_review_aggregates
+    readonly_fields = (
+        "review_count",
+        "rating_average",
+        "rating_1_count",
+        "rating_2_count",
+        "rating_3_count",
+        "rating_4_count",
+        "rating_5_count",
+    )
     fieldsets = (
         (
             "Basic Information",
@@ -22,6 +34,21 @@ class ItemAdmin(admin.ModelAdmin):
         ),
         ("Description", {"fields": ("description",)}),
         ("Images", {"fields": ("representative_image", "hero_image")}),
+        (
+            "Reviews",
+            {
+                "fields": (
+                    ("review_count", "rating_average"),
+                    (
+                        "rating_1_count",
+                        "rating_2_count",
+                        "rating_3_count",
+                        "rating_4_count",
+                        "rating_5_count",
+                    ),
+                )
+            },
+        ),
         ("Metadata", {"fields": ("created_by", "created_at")}),
     )
 
@@ -36,3 +63,19 @@ class ItemReviewAdmin(admin.ModelAdmin):
         ("Review Details", {"fields": ("item", "rating", "comment", "creator")}),
         ("Metadata", {"fields": ("created_at",)}),
     )
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ("item", "field", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status", "field")
+    search_fields = ("item__title", "source", "last_error")
+    readonly_fields = ("created_at", "updated_at", "locked_at", "last_error")
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ("name", "size", "ref_count", "released_at", "created_at")
+    list_filter = ("released_at",)
+    search_fields = ("name", "sha256")
+    readonly_fields = ("sha256", "name", "size", "ref_count", "released_at", "created_at")
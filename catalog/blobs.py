@@ -0,0 +1,180 @@
+"""
+Reference counting for content-addressed blobs (see catalog.storage).
+
+The image fields in TRACKED_FIELDS are watched with signals: when a save
+changes which file a field points at, the new blob is retained and the old
+one released, and deleting the row releases all of its files. A blob whose
+count drops to zero is only marked as released, and collect() deletes it
+after a grace period so an identical upload in the meantime can reuse it.
+
+Files stored before content addressing have no Blob row, they are deleted
+as soon as they are released, like before. Those deletes are queued for the
+transaction and sent in batches after it commits (see DeleteQueue), and
+collect() deletes its blobs in batches too, derivatives included.
+"""
+
+import weakref
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from . import derivatives
+from .models import Blob
+from .storage import delete_stored, is_blob
+
+TRACKED_FIELDS = {
+    "catalog.Item": ("hero_image", "representative_image"),
+    settings.AUTH_USER_MODEL: ("profile_picture",),
+}
+GRACE = timedelta(hours=1)
+
+
+def retain(name):
+    if is_blob(name):
+        Blob.objects.filter(name=name).update(
+            ref_count=F("ref_count") + 1, released_at=None
+        )
+
+
+def delete_files(names):
+    """Delete stored files and their derivatives, in batches"""
+    names = list(names)
+    derivatives.delete_for(names)
+    delete_stored(names)
+
+
+class DeleteQueue:
+    """
+    Files to delete once the current transaction commits. The first delete
+    in a savepoint registers a queue with on_commit, later ones join it, so
+    everything released by e.g. deleting many items goes out together.
+
+    Queues are kept by savepoint, and only weakly: rolling a savepoint back
+    drops its on_commit callback, and with it the queue and its names.
+    """
+
+    _queues = weakref.WeakValueDictionary()
+
+    def __init__(self):
+        self.names = []
+
+    def __call__(self):
+        names, self.names = self.names, []
+        delete_files(names)
+
+    @classmethod
+    def add(cls, name):
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            delete_files([name])
+            return
+        key = (id(connection), *connection.savepoint_ids)
+        queue = cls._queues.get(key)
+        if queue is None:
+            queue = cls._queues[key] = cls()
+            transaction.on_commit(queue)
+        queue.names.append(name)
+
+
+def release(name):
+    if not name:
+        return
+    if not is_blob(name):
+        DeleteQueue.add(name)
+        return
+
+    Blob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1
+    )
+    Blob.objects.filter(name=name, ref_count=0, released_at__isnull=True).update(
+        released_at=timezone.now()
+    )
+
+
+def collect(grace=GRACE, limit=500):
+    """Delete blobs that have been unreferenced for longer than the grace period"""
+    cutoff = timezone.now() - grace
+    with transaction.atomic():
+        blobs = list(
+            Blob.objects.select_for_update()
+            .filter(ref_count=0, released_at__lt=cutoff)
+            .order_by("released_at")[:limit]
+        )
+        Blob.objects.filter(pk__in=[b.pk for b in blobs]).delete()
+
+    delete_files(blob.name for blob in blobs)
+    return len(blobs)
+
+
+def _tracked_models():
+    from django.apps import apps
+
+    return [
+        (apps.get_model(label), fields) for label, fields in TRACKED_FIELDS.items()
+    ]
+
+
+def reconcile():
+    """Recompute every blob's ref_count from the tracked fields"""
+    counts = Counter()
+    for model, fields in _tracked_models():
+        for names in model.objects.values_list(*fields).iterator(chunk_size=2000):
+            counts.update(name for name in names if is_blob(name))
+
+    fixed = 0
+    now = timezone.now()
+    for blob in Blob.objects.only("name", "ref_count", "released_at"):
+        expected = counts.get(blob.name, 0)
+        # Unreferenced blobs need a release time too, collect() only
+        # deletes those, even if their count was already zero
+        released_at = None if expected else (blob.released_at or now)
+        if (blob.ref_count, blob.released_at) != (expected, released_at):
+            blob.ref_count = expected
+            blob.released_at = released_at
+            blob.save(update_fields=["ref_count", "released_at"])
+            fixed += 1
+    return fixed
+
+
+def _names(instance, fields):
+    return {field: getattr(instance, field).name or "" for field in fields}
+
+
+@receiver(pre_save, sender="catalog.Item")
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    fields = TRACKED_FIELDS[sender._meta.label]
+    if update_fields is not None:
+        fields = [f for f in fields if f in update_fields]
+    if raw or not fields or instance._state.adding:
+        instance._previous_files = {}
+        return
+    row = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+    instance._previous_files = dict(zip(fields, row)) if row else {}
+
+
+@receiver(post_save, sender="catalog.Item")
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def update_references(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_files", {})
+    fields = previous.keys() if not created else TRACKED_FIELDS[sender._meta.label]
+    current = _names(instance, fields)
+    for field, name in current.items():
+        old = previous.get(field) or ""
+        if name != old:
+            retain(name)
+            release(old)
+    instance._previous_files = {}
+
+
+@receiver(post_delete, sender="catalog.Item")
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def release_files(sender, instance, **kwargs):
+    for name in _names(instance, TRACKED_FIELDS[sender._meta.label]).values():
+        release(name)
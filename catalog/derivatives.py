@@ -0,0 +1,205 @@
+"""
+Responsive image derivatives.
+
+Every stored image (item hero and thumbnail images, profile pictures) gets a
+fixed ladder of widths in WebP and JPEG, saved through default_storage and
+recorded as ImageDerivative rows keyed by the original's storage name. The
+`responsive_image` template tag turns them into a <picture> with a real
+srcset, so small screens download a small file.
+
+The same pass records an ImageMetadata row per original: its dimensions,
+byte size and a tiny blurred JPEG as a data: URI, so the tag can emit
+width/height and a blur-up placeholder without touching storage.
+"""
+
+import base64
+import os
+from io import BytesIO
+from PIL import Image
+from django.core.files.storage import default_storage
+from .images import encode, open_reduced
+from .models import ImageDerivative, ImageMetadata
+from .storage import delete_stored
+
+WIDTHS = (320, 640, 1280, 2560)
+
+# format -> (PIL format, extension, quality), in <picture> source order
+FORMATS = {
+    "webp": ("WEBP", "webp", 80),
+    "jpeg": ("JPEG", "jpg", 82),
+}
+MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+# Longest side of the placeholder, the browser's upscaling does the blurring
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+
+
+def ladder(width):
+    """The ladder widths to build for an original of the given width"""
+    widths = [w for w in WIDTHS if w < width]
+    # The top rung is the original itself, capped at the largest width
+    widths.append(min(width, WIDTHS[-1]))
+    return widths
+
+
+def derivative_name(source, width, fmt):
+    stem, _ = os.path.splitext(source)
+    return f"derivatives/{stem}/{width}w.{FORMATS[fmt][1]}"
+
+
+def generate(source):
+    """Build and store the derivatives of an image, returns the rows created"""
+    existing = set(
+        ImageDerivative.objects.filter(source=source).values_list("width", "format")
+    )
+
+    original = []
+
+    def top_rung(width, height):
+        original.extend((width, height))
+        return min(width, WIDTHS[-1]), round(height * min(width, WIDTHS[-1]) / width)
+
+    # Decoded straight at the top rung, which is at most WIDTHS[-1] wide
+    with default_storage.open(source) as f:
+        image = open_reduced(f, top_rung)
+    record_metadata(source, image, *original)
+
+    rows = []
+    # Largest first, each rung is resampled from the one above it
+    for width in sorted(ladder(image.width), reverse=True):
+        if width != image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        for fmt, (pil_format, _, quality) in FORMATS.items():
+            if (width, fmt) in existing:
+                continue
+            with encode(image, pil_format, quality=quality) as output:
+                name = default_storage.save(derivative_name(source, width, fmt), output)
+            rows.append(
+                ImageDerivative(
+                    source=source,
+                    width=width,
+                    format=fmt,
+                    name=name,
+                    url=default_storage.url(name),
+                )
+            )
+
+    ImageDerivative.objects.bulk_create(rows, ignore_conflicts=True)
+    return rows
+
+
+def placeholder(image):
+    """A data: URI of a tiny JPEG of the image, a few hundred bytes"""
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    output = BytesIO()
+    small.convert("RGB").save(output, format="JPEG", quality=PLACEHOLDER_QUALITY)
+    return "data:image/jpeg;base64," + base64.b64encode(output.getvalue()).decode()
+
+
+def record_metadata(source, image, width, height):
+    """
+    Store the metadata of an original, given its full dimensions and any
+    decoded (possibly reduced) copy of it for the placeholder
+    """
+    try:
+        size = default_storage.size(source)
+    except Exception:
+        size = None
+    metadata = ImageMetadata(
+        name=source,
+        width=width,
+        height=height,
+        size=size,
+        placeholder=placeholder(image),
+    )
+    ImageMetadata.objects.bulk_create(
+        [metadata],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["width", "height", "size", "placeholder"],
+    )
+    return metadata
+
+
+def measure(source):
+    """Record the metadata of a stored original, decoding it at placeholder size"""
+    dimensions = []
+
+    def tiny(width, height):
+        dimensions.extend((width, height))
+        scale = PLACEHOLDER_SIZE / max(width, height)
+        return round(width * scale), round(height * scale)
+
+    with default_storage.open(source) as f:
+        image = open_reduced(f, tiny)
+    return record_metadata(source, image, *dimensions)
+
+
+def delete_for(sources):
+    """Delete the stored derivatives and metadata of images that are going away"""
+    sources = [s for s in sources if s]
+    if not sources:
+        return
+    ImageMetadata.objects.filter(name__in=sources).delete()
+    derivatives = ImageDerivative.objects.filter(source__in=sources)
+    names = list(derivatives.values_list("name", flat=True))
+    derivatives.delete()
+    delete_stored(names)
+
+
+def lookup(sources):
+    """Return {source: [[format, width, url], ...]} with one query"""
+    sources = {s for s in sources if s}
+    found = {source: [] for source in sources}
+    if not sources:
+        return found
+    rows = ImageDerivative.objects.filter(source__in=sources).order_by("width")
+    for d in rows:
+        found[d.source].append([d.format, d.width, d.url])
+    return found
+
+
+def metadata(sources):
+    """Return {source: ImageMetadata} for the sources that have any, in one query"""
+    sources = {s for s in sources if s}
+    if not sources:
+        return {}
+    return {m.name: m for m in ImageMetadata.objects.filter(name__in=sources)}
+
+
+def prefetch(instances, *fields):
+    """
+    Load the derivatives and metadata of the given image fields for a list
+    of model instances, so the template tag doesn't query per image
+    """
+    files = [
+        getattr(instance, field)
+        for instance in instances
+        for field in fields
+        if getattr(instance, field)
+    ]
+    found = lookup(f.name for f in files)
+    described = metadata(f.name for f in files)
+    # Storages that look URLs up (VercelBlobStorage) can do it in one query too
+    prefetch_urls = getattr(default_storage, "prefetch_urls", None)
+    if prefetch_urls:
+        prefetch_urls(f.name for f in files)
+    for f in files:
+        f.derivatives = found.get(f.name, [])
+        f.metadata = described.get(f.name)
+    return instances
+
+
+def srcsets(derivatives):
+    """Return [(mime type, srcset), ...] in <picture> source order"""
+    result = []
+    for fmt in FORMATS:
+        entries = sorted((width, url) for f, width, url in derivatives if f == fmt)
+        if entries:
+            srcset = ", ".join(f"{url} {width}w" for width, url in entries)
+            result.append((MIME_TYPES[fmt], srcset))
+    return result
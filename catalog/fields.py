@@ -0,0 +1,57 @@
+"""
+Image fields that never read the stored file to learn its dimensions.
+
+Django's ImageField fills width_field/height_field by opening the file on
+every instance load while they are empty, which with blob storage is a
+download per image. StoredImageField only measures uploads, locally and
+before they are stored; assigning the name of an already stored file clears
+the columns instead (catalog.jobs fills them in from the image's metadata).
+`.width`/`.height` are answered from the recorded columns.
+"""
+
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+
+
+class StoredImageFieldFile(ImageFieldFile):
+
+    @property
+    def stored_dimensions(self):
+        """(width, height) from the instance's columns, or None if not recorded"""
+        field = self.field
+        if not (field.width_field and field.height_field):
+            return None
+        width = getattr(self.instance, field.width_field)
+        height = getattr(self.instance, field.height_field)
+        return (width, height) if width and height else None
+
+    def __getstate__(self):
+        # Derivatives and metadata attached by catalog.derivatives.prefetch
+        # are kept when the instance is pickled into the cache
+        state = super().__getstate__()
+        for attr in ("derivatives", "metadata"):
+            if attr in self.__dict__:
+                state[attr] = self.__dict__[attr]
+        return state
+
+    def _get_image_dimensions(self):
+        if not hasattr(self, "_dimensions_cache") and self.stored_dimensions:
+            self._dimensions_cache = self.stored_dimensions
+        return super()._get_image_dimensions()
+
+
+class StoredImageField(models.ImageField):
+    attr_class = StoredImageFieldFile
+
+    def update_dimension_fields(self, instance, force=False, *args, **kwargs):
+        # Loading a row keeps whatever was recorded, only assignment measures
+        if not force or self.attname not in instance.__dict__:
+            return
+        # Cleared first so the previous image's columns aren't taken for this one
+        if self.width_field:
+            setattr(instance, self.width_field, None)
+        if self.height_field:
+            setattr(instance, self.height_field, None)
+        file = getattr(instance, self.attname)
+        if file and not file._committed:
+            super().update_dimension_fields(instance, force, *args, **kwargs)
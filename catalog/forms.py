@@ -1,4 +1,6 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from .images import probe
 from .models import Item
 
 
@@ -32,3 +34,17 @@ class ItemForm(forms.ModelForm):
             "representative_image": "The thumbnail image for the item",
             "hero_image": "The main banner image for the item",
         }
+
+    # New uploads are checked from their header before anything is stored, so
+    # images too large to decode are rejected up front
+    def _check_image(self, field):
+        image = self.cleaned_data.get(field)
+        if isinstance(image, UploadedFile):
+            probe(image)
+        return image
+
+    def clean_representative_image(self):
+        return self._check_image("representative_image")
+
+    def clean_hero_image(self):
+        return self._check_image("hero_image")
@@ -0,0 +1,176 @@
+"""
+Image processing for uploads.
+
+Each resizable Item image field has an ImageSpec: uploads over max_bytes are
+scaled to fit within width x height and re-encoded as JPEG.
+
+Decoding is kept proportional to the output rather than the upload: headers
+are probed first so oversized images are rejected before any pixel data is
+read, JPEGs are decoded at 1/2, 1/4 or 1/8 scale with draft mode, other
+formats are shrunk with reduce() before the final LANCZOS resample, and the
+encoded result is written to a spooled temporary file.
+"""
+
+import os
+import random
+import tempfile
+from collections import namedtuple
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+
+ImageSpec = namedtuple("ImageSpec", ["max_bytes", "width", "height", "quality"])
+
+IMAGE_SPECS = {
+    "hero_image": ImageSpec(max_bytes=600 * 1024, width=2560, height=1080, quality=90),
+    "representative_image": ImageSpec(
+        max_bytes=400 * 1024, width=800, height=600, quality=85
+    ),
+}
+
+# Uploads above this many pixels are rejected, override with MAX_UPLOAD_PIXELS
+MAX_UPLOAD_PIXELS = 64_000_000
+# Encoded output stays in memory up to this size, then spills to disk
+SPOOL_MAX_SIZE = 2 * 1024 * 1024
+
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def suffixed_name(name):
+    """Add a random 3-digit suffix to a filename, keeping its extension"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}-{random.randint(100, 999)}{ext}"
+
+
+def needs_resize(upload, spec):
+    return upload.size > spec.max_bytes
+
+
+def fit_within(width, height, target_width, target_height):
+    """Dimensions that fit the target box while keeping the aspect ratio"""
+    img_ratio = width / height
+    target_ratio = target_width / target_height
+
+    if img_ratio > target_ratio:
+        # Image is wider than target ratio, adjust height
+        return target_width, int(target_width / img_ratio)
+    # Image is taller than target ratio, adjust width
+    return int(target_height * img_ratio), target_height
+
+
+def _max_pixels():
+    return getattr(settings, "MAX_UPLOAD_PIXELS", MAX_UPLOAD_PIXELS)
+
+
+def _open_checked(file):
+    """Image.open (which only reads the header) with the pixel limit applied"""
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError:
+        raise ValidationError("This image is too large to process.")
+    except Exception:
+        raise ValidationError("Upload a valid image.")
+
+    width, height = image.size
+    if width * height > _max_pixels():
+        raise ValidationError(
+            f"This image is too large to process ({width}x{height} pixels)."
+        )
+    return image
+
+
+def _is_rotated(image):
+    try:
+        return image.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS
+    except Exception:
+        return False
+
+
+def oriented_size(image):
+    """Width and height as displayed, after the EXIF orientation is applied"""
+    width, height = image.size
+    return (height, width) if _is_rotated(image) else (width, height)
+
+
+def probe(file):
+    """
+    Check an upload from its header alone, raises ValidationError for files
+    that aren't images or are too large to decode. Returns (format, size).
+    """
+    file.seek(0)
+    try:
+        image = _open_checked(file)
+        return image.format, oriented_size(image)
+    finally:
+        file.seek(0)
+
+
+def open_reduced(file, target):
+    """
+    Decode an image at (close to) the size it is about to be resized to.
+
+    `target` is called with the displayed width and height from the header
+    and returns the final size. The returned image is oriented and exactly
+    that size.
+    """
+    image = _open_checked(file)
+    rotated = _is_rotated(image)
+    width, height = oriented_size(image)
+    final = tuple(max(1, side) for side in target(width, height))
+
+    # The same box in stored (pre-rotation) coordinates
+    box = (final[1], final[0]) if rotated else final
+
+    if image.format == "JPEG":
+        # libjpeg scales by 1/2, 1/4 or 1/8 while decoding, never below box
+        image.draft("RGB", box)
+
+    if image.mode in ("P", "1"):
+        # reduce() doesn't support palette or bilevel images
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    # Integer downscale keeping at least 2x the final size for the resample
+    factor = max(1, min(image.width // (2 * box[0]), image.height // (2 * box[1])))
+    if factor > 1:
+        image = image.reduce(factor)
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if image.size != final:
+        image = image.resize(final, Image.LANCZOS)
+    return image
+
+
+def encode(image, format, **params):
+    """Encode an image into a spooled temporary file, returned as a File"""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    image.save(output, format=format, **params)
+    size = output.tell()
+    output.seek(0)
+
+    encoded = File(output)
+    encoded.size = size
+    return encoded
+
+
+#/***************************************************************************************
+#*  REFERENCES
+#*  Title: Claude 3.7 Sonnet
+#*  Author: Anthropic
+#*  Date: Spring 2024
+#*  URL: https://claude.ai
+#*
+#*  Prompt used: How can I reduce the size of an image before uploading it to S3?
+#*  ---> told me to use pollow package
+
+#*
+#***************************************************************************************/
+def resize_image(file, spec):
+    """Resize an image file to the spec, returns the JPEG as a File"""
+    image = open_reduced(
+        file, lambda width, height: fit_within(width, height, spec.width, spec.height)
+    )
+    return encode(image, "JPEG", quality=spec.quality)
@@ -0,0 +1,184 @@
+"""
+Background image jobs.
+
+Large uploads are stored as-is and an ImageJob is queued instead of resizing
+inside the request. The process_image_jobs worker claims jobs with a
+conditional UPDATE, so several workers can share the table, resizes the
+original and swaps the result in only if the item still points at that
+original. Failures are retried with exponential backoff, and a job whose
+worker died is picked up again once its lease runs out.
+
+Once an image is final a "derivatives" job builds its responsive widths and
+formats (see catalog.derivatives).
+
+With IMAGE_JOBS_INLINE = True a job runs in-process as soon as the enqueuing
+transaction commits (used by the tests and local development). On Vercel,
+which has no worker process, a cron job calls the run_image_jobs view, which
+runs ready jobs for up to IMAGE_JOBS_CRON_SECONDS.
+"""
+
+import logging
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from . import derivatives
+from .images import IMAGE_SPECS, resize_image
+from .models import ImageJob, Item
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED = 0, 1, 2, 3
+LEASE = timedelta(minutes=10)
+RETRY_DELAY = timedelta(seconds=30)  # doubled after every failed attempt
+
+
+def _queue(**fields):
+    job = ImageJob.objects.create(**fields)
+    if getattr(settings, "IMAGE_JOBS_INLINE", False):
+        transaction.on_commit(lambda: run_pending(job_id=job.pk))
+    return job
+
+
+def enqueue(item, field):
+    """Queue a resize of the image currently stored in item.<field>"""
+    return _queue(
+        kind="resize", item=item, field=field, source=getattr(item, field).name
+    )
+
+
+def enqueue_derivatives(source, item=None, field=""):
+    """Queue building the responsive derivatives of a stored image"""
+    return _queue(kind="derivatives", item=item, field=field, source=source)
+
+
+def claim(job_id=None, now=None):
+    """Claim the next ready job (or the given one), returns None if there is none"""
+    now = now or timezone.now()
+    ready = ImageJob.objects.filter(
+        Q(status=PENDING, run_after__lte=now)
+        | Q(status=RUNNING, locked_at__lt=now - LEASE)
+    )
+    if job_id is not None:
+        ready = ready.filter(pk=job_id)
+
+    for job in ready.order_by("run_after", "id")[:10]:
+        # Only one worker can move a job out of the state it was read in
+        claimed = ImageJob.objects.filter(
+            pk=job.pk, status=job.status, attempts=job.attempts
+        ).update(status=RUNNING, locked_at=now, attempts=F("attempts") + 1)
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def _resized_name(source):
+    stem, _ = os.path.splitext(os.path.basename(source))
+    return f"{stem}-resized.jpg"
+
+
+def _is_current(item, job):
+    return item is not None and getattr(item, job.field).name == job.source
+
+
+def process(job):
+    return PROCESSORS[job.kind](job)
+
+
+def _resize(job):
+    """Resize the job's original and swap it into the item"""
+    item = Item.objects.filter(pk=job.item_id).first()
+    if not _is_current(item, job):
+        # Replaced or removed since the job was queued, nothing to do
+        return False
+
+    field = item._meta.get_field(job.field)
+    with field.storage.open(job.source) as original:
+        resized = resize_image(original, IMAGE_SPECS[job.field])
+    with resized:
+        new_name = field.storage.save(
+            field.generate_filename(item, _resized_name(job.source)), resized
+        )
+
+    with transaction.atomic():
+        item = Item.objects.select_for_update().filter(pk=job.item_id).first()
+        swapped = _is_current(item, job)
+        if swapped:
+            # The save releases the original, see catalog.blobs. If the item
+            # moved on, the resized blob is never referenced and gets collected
+            setattr(item, job.field, new_name)
+            item.save(update_fields=[job.field, "updated_at"])
+            enqueue_derivatives(new_name, item=item, field=job.field)
+    return swapped
+
+
+def _derivatives(job):
+    """Build the derivatives of an image that is still in use"""
+    if job.item_id is not None:
+        item = Item.objects.filter(pk=job.item_id).first()
+        if not _is_current(item, job):
+            return False
+    elif not default_storage.exists(job.source):
+        return False
+
+    derivatives.generate(job.source)
+
+    if job.item_id is not None:
+        # Images swapped in by name (resizes) get their dimensions from here
+        field = item._meta.get_field(job.field)
+        metadata = derivatives.metadata([job.source])[job.source]
+        setattr(item, field.width_field, metadata.width)
+        setattr(item, field.height_field, metadata.height)
+        # Saving refreshes the item's destination card with the new srcset
+        item.save(
+            update_fields=[field.width_field, field.height_field, "updated_at"]
+        )
+    return True
+
+
+PROCESSORS = {"resize": _resize, "derivatives": _derivatives}
+
+
+def run(job):
+    """Process a claimed job and record the outcome, returns True on success"""
+    try:
+        process(job)
+    except Exception as e:
+        logger.exception("Image job %s failed", job.pk)
+        if job.attempts >= job.max_attempts:
+            updates = {"status": FAILED}
+        else:
+            delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+            updates = {"status": PENDING, "run_after": timezone.now() + delay}
+        ImageJob.objects.filter(pk=job.pk).update(
+            locked_at=None, last_error=str(e), **updates
+        )
+        return False
+
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=DONE, locked_at=None, last_error=""
+    )
+    return True
+
+
+def run_pending(limit=None, job_id=None, seconds=None):
+    """
+    Claim and run ready jobs until there are none left, returns how many ran.
+    With `seconds`, no new job is started once that much time has passed.
+    """
+    deadline = None if seconds is None else time.monotonic() + seconds
+    count = 0
+    while limit is None or count < limit:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        job = claim(job_id=job_id)
+        if job is None:
+            break
+        run(job)
+        count += 1
+    return count
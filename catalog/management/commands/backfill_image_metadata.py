@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from catalog import derivatives
+from catalog.models import ImageMetadata, Item
+
+ITEM_FIELDS = ("hero_image", "representative_image")
+
+
+class Command(BaseCommand):
+    help = (
+        "Record dimensions, size and placeholders for stored images uploaded "
+        "before they were recorded on upload"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Measure every image again, not only the ones missing metadata",
+        )
+
+    def _measure(self, name, known):
+        """Metadata for a stored image, reading it only if it isn't known yet"""
+        if name not in known:
+            try:
+                known[name] = derivatives.measure(name)
+                self.measured += 1
+            except Exception as e:
+                self.stderr.write(f"Could not measure {name}: {e}")
+                known[name] = None
+        return known[name]
+
+    def handle(self, *args, **options):
+        self.measured = 0
+        known = {}
+        if not options["force"]:
+            known = {m.name: m for m in ImageMetadata.objects.all()}
+
+        updated = 0
+        for item in Item.objects.only(
+            "id",
+            *ITEM_FIELDS,
+            *(f"{field}_width" for field in ITEM_FIELDS),
+            *(f"{field}_height" for field in ITEM_FIELDS),
+        ):
+            changes = {}
+            for field in ITEM_FIELDS:
+                image = getattr(item, field)
+                if not image:
+                    continue
+                metadata = self._measure(image.name, known)
+                if metadata and (options["force"] or image.stored_dimensions is None):
+                    changes[f"{field}_width"] = metadata.width
+                    changes[f"{field}_height"] = metadata.height
+            if changes:
+                # update() leaves updated_at and the save signals alone
+                Item.objects.filter(pk=item.pk).update(**changes)
+                updated += 1
+
+        User = get_user_model()
+        users = (
+            User.objects.exclude(profile_picture="")
+            .exclude(profile_picture__isnull=True)
+            .only(
+                "id",
+                "profile_picture",
+                "profile_picture_width",
+                "profile_picture_height",
+            )
+        )
+        for user in users:
+            metadata = self._measure(user.profile_picture.name, known)
+            if metadata and (
+                options["force"] or user.profile_picture.stored_dimensions is None
+            ):
+                User.objects.filter(pk=user.pk).update(
+                    profile_picture_width=metadata.width,
+                    profile_picture_height=metadata.height,
+                )
+                updated += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Measured {self.measured} images, updated {updated} rows"
+            )
+        )
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from catalog import blobs
+
+
+class Command(BaseCommand):
+    help = "Delete stored blobs that no item or user has referenced for a while"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=int(blobs.GRACE.total_seconds()),
+            help="Seconds a blob must have been unreferenced before it is deleted",
+        )
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Recompute reference counts from the image fields first",
+        )
+
+    def handle(self, *args, **options):
+        if options["reconcile"]:
+            fixed = blobs.reconcile()
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} blobs"))
+
+        grace = timedelta(seconds=options["grace"])
+        total = 0
+        while True:
+            count = blobs.collect(grace=grace)
+            total += count
+            if count == 0:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} blobs"))
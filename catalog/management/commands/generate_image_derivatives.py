@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from catalog import jobs
+from catalog.models import ImageDerivative, ImageJob, Item
+
+
+class Command(BaseCommand):
+    help = "Queue responsive derivatives for stored images that don't have any yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--run",
+            action="store_true",
+            help="Run the queued jobs right away instead of leaving them to the worker",
+        )
+
+    def handle(self, *args, **options):
+        done = set(ImageDerivative.objects.values_list("source", flat=True).distinct())
+        queued = set(
+            ImageJob.objects.filter(kind="derivatives", status__in=[0, 1]).values_list(
+                "source", flat=True
+            )
+        )
+        skip = done | queued
+
+        count = 0
+        for item in Item.objects.only("id", "hero_image", "representative_image"):
+            for field in ("hero_image", "representative_image"):
+                name = getattr(item, field).name
+                if name and name not in skip:
+                    jobs.enqueue_derivatives(name, item=item, field=field)
+                    count += 1
+
+        pictures = (
+            get_user_model()
+            .objects.exclude(profile_picture="")
+            .exclude(profile_picture__isnull=True)
+            .values_list("profile_picture", flat=True)
+        )
+        for name in pictures:
+            if name not in skip:
+                jobs.enqueue_derivatives(name)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Queued {count} derivative jobs"))
+        if options["run"]:
+            ran = jobs.run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} image jobs"))
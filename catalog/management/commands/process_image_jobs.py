@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from catalog import blobs, jobs
+
+
+class Command(BaseCommand):
+    help = "Run the background worker that resizes uploaded item images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once there are no ready jobs instead of polling",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="Exit after running this many jobs",
+        )
+
+    def handle(self, *args, **options):
+        max_jobs = options["max_jobs"]
+        total = 0
+
+        while max_jobs is None or total < max_jobs:
+            limit = None if max_jobs is None else max_jobs - total
+            count = jobs.run_pending(limit=limit)
+            total += count
+            if count == 0:
+                # Idle, delete blobs nothing has referenced for a while
+                blobs.collect()
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} image jobs"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from catalog.models import Item
+
+
+class Command(BaseCommand):
+    help = "Recompute the review count, rating sum and histogram of every item"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of items written per UPDATE statement",
+        )
+
+    def handle(self, *args, **options):
+        count = Item.reconcile_review_aggregates(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {count} items"))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 00:10
+
+from django.db import migrations
+
+INDEX_NAME = "item_search_gin"
+
+
+def _search_index(Item):
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    # Must stay identical to core.search.search_vector() for the index to be used
+    return GinIndex(
+        SearchVector("title", weight="A", config="english")
+        + SearchVector("location", weight="B", config="english")
+        + SearchVector("description", weight="C", config="english"),
+        name=INDEX_NAME,
+    )
+
+
+def add_search_index(apps, schema_editor):
+    # Other backends search with the in-process inverted index in core.search
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Item = apps.get_model("catalog", "Item")
+    schema_editor.add_index(Item, _search_index(Item))
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Item = apps.get_model("catalog", "Item")
+    schema_editor.remove_index(Item, _search_index(Item))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0008_alter_item_created_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 23:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_item_search_gin"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(fields=["created_at", "id"], name="item_created_at_id"),
+        ),
+        migrations.AddIndex(
+            model_name="itemreview",
+            index=models.Index(
+                fields=["created_at", "id"], name="item_review_created_at_id"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="itemreview",
+            index=models.Index(
+                fields=["item", "created_at", "id"], name="item_review_item_created"
+            ),
+        ),
+    ]
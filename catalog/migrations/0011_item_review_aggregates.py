@@ -0,0 +1,96 @@
+# Generated by Django 5.2 on 2026-10-17 23:17
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    Item = apps.get_model("catalog", "Item")
+    ItemReview = apps.get_model("catalog", "ItemReview")
+
+    rows = (
+        ItemReview.objects.order_by()
+        .values("item_id")
+        .annotate(
+            review_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{
+                f"rating_{rating}_count": Count("id", filter=Q(rating=rating))
+                for rating in range(1, 6)
+            },
+        )
+    )
+    for row in rows:
+        item_id = row.pop("item_id")
+        row["rating_average"] = row["rating_sum"] / row["review_count"]
+        Item.objects.filter(pk=item_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0010_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="rating_average",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="itemreview",
+            name="rating",
+            field=models.IntegerField(
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(5),
+                ]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["rating_average", "id"], name="item_rating_average_id"
+            ),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-17 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0012_image_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imagejob",
+            name="kind",
+            field=models.CharField(
+                choices=[("resize", "Resize"), ("derivatives", "Derivatives")],
+                default="resize",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="imagejob",
+            name="field",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AlterField(
+            model_name="imagejob",
+            name="item",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="image_jobs",
+                to="catalog.item",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ImageDerivative",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=1024)),
+                ("width", models.PositiveIntegerField()),
+                ("format", models.CharField(max_length=10)),
+                ("name", models.CharField(max_length=1024)),
+                ("url", models.CharField(max_length=1024)),
+            ],
+            options={
+                "db_table": "image_derivative",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source", "width", "format"),
+                        name="image_derivative_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-17 23:33
+
+import catalog.models
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0013_image_derivatives"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="item",
+            name="hero_image",
+            field=models.ImageField(
+                blank=True,
+                help_text="The main banner image for the item",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to=catalog.models.item_image_path,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="item",
+            name="representative_image",
+            field=models.ImageField(
+                blank=True,
+                help_text="The thumbnail image for the item",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to=catalog.models.item_image_path,
+            ),
+        ),
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("name", models.CharField(max_length=1024, unique=True)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("released_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "blob",
+                "indexes": [
+                    models.Index(
+                        fields=["ref_count", "released_at"], name="blob_released"
+                    )
+                ],
+            },
+        ),
+    ]
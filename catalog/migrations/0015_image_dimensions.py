@@ -0,0 +1,84 @@
+# Generated by Django 5.2 on 2026-10-18 00:05
+
+import catalog.fields
+import catalog.models
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0014_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageMetadata",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=1024, unique=True)),
+                ("width", models.PositiveIntegerField()),
+                ("height", models.PositiveIntegerField()),
+                ("size", models.PositiveBigIntegerField(blank=True, null=True)),
+                ("placeholder", models.TextField(blank=True)),
+            ],
+            options={
+                "db_table": "image_metadata",
+            },
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="hero_image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="hero_image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="representative_image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="representative_image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="item",
+            name="hero_image",
+            field=catalog.fields.StoredImageField(
+                blank=True,
+                height_field="hero_image_height",
+                help_text="The main banner image for the item",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to=catalog.models.item_image_path,
+                width_field="hero_image_width",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="item",
+            name="representative_image",
+            field=catalog.fields.StoredImageField(
+                blank=True,
+                height_field="representative_image_height",
+                help_text="The thumbnail image for the item",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to=catalog.models.item_image_path,
+                width_field="representative_image_width",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    # Existing reviews count as last changed when they were written
+    ItemReview = apps.get_model("catalog", "ItemReview")
+    ItemReview.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0015_image_dimensions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="itemreview",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 01:20
+
+import catalog.fields
+import catalog.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0017_item_title_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="item",
+            name="hero_image",
+            field=catalog.fields.StoredImageField(
+                blank=True,
+                height_field="hero_image_height",
+                help_text="The main banner image for the item",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to="",
+                width_field="hero_image_width",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="item",
+            name="representative_image",
+            field=catalog.fields.StoredImageField(
+                blank=True,
+                height_field="representative_image_height",
+                help_text="The thumbnail image for the item",
+                null=True,
+                storage=catalog.storage.blob_storage,
+                upload_to="",
+                width_field="representative_image_width",
+            ),
+        ),
+    ]
@@ -1,12 +1,20 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings  # for referencing the AUTH_USER_MODEL
-from django.core.files.storage import default_storage
-from django.db.models.signals import pre_delete
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from .fields import StoredImageField
+from .storage import blob_storage
+
+RATING_VALUES = range(1, 6)
 
 
 def item_image_path(instance, filename):
-    # Create the path: items/<item_title>/<filename>
+    # No longer used, BlobStorage names files by their content (catalog.storage).
+    # Kept because old migrations import it
     return f"items/{instance.title}/{filename}"
 
 
@@ -23,22 +31,42 @@ class Item(models.Model):
     price_per_night = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True
     )
-    representative_image = models.ImageField(
-        upload_to=item_image_path,
+    representative_image = StoredImageField(
         blank=True,
         null=True,
-        storage=default_storage,
+        storage=blob_storage,
+        width_field="representative_image_width",
+        height_field="representative_image_height",
         help_text="The thumbnail image for the item",
     )
-    hero_image = models.ImageField(
-        upload_to=item_image_path,
+    hero_image = StoredImageField(
         blank=True,
         null=True,
-        storage=default_storage,
+        storage=blob_storage,
+        width_field="hero_image_width",
+        height_field="hero_image_height",
         help_text="The main banner image for the item",
     )
+    # Recorded on upload so .width/.height never download the image
+    representative_image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    representative_image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False
+    )
+    hero_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    hero_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Review aggregates, maintained incrementally by ItemReview
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     # If you want to track who created the item:
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -51,34 +79,234 @@ class Item(models.Model):
     def __str__(self):
         return self.title
 
-    def delete(self, *args, **kwargs):
-        # Delete the images from S3 before deleting the item
-        if self.representative_image:
-            self.representative_image.delete(save=False)
-        if self.hero_image:
-            self.hero_image.delete(save=False)
-        super().delete(*args, **kwargs)
+    @property
+    def rating_histogram(self):
+        """Number of reviews per star rating, 1 to 5"""
+        return {rating: getattr(self, f"rating_{rating}_count") for rating in RATING_VALUES}
+
+    @classmethod
+    def apply_rating(cls, item_id, rating, sign):
+        """
+        Add (sign=1) or remove (sign=-1) one review rating from the aggregates
+        with a single F-expression UPDATE, so concurrent reviews don't race
+        """
+        # SET expressions all see the row's old values
+        average = Cast(F("rating_sum") + sign * rating, FloatField()) / (
+            F("review_count") + sign
+        )
+        if sign < 0:
+            average = Case(When(review_count__lte=1, then=Value(0.0)), default=average)
+
+        updates = {
+            "review_count": F("review_count") + sign,
+            "rating_sum": F("rating_sum") + sign * rating,
+            "rating_average": average,
+        }
+        if rating in RATING_VALUES:
+            field = f"rating_{rating}_count"
+            updates[field] = F(field) + sign
+
+        cls.objects.filter(pk=item_id).update(**updates)
+
+    @classmethod
+    def reconcile_review_aggregates(cls, batch_size=500):
+        """
+        Recompute every item's review aggregates from ItemReview with one
+        grouped query, returns the number of items that were out of date
+        """
+        fields = [
+            "review_count",
+            "rating_sum",
+            "rating_average",
+            *(f"rating_{rating}_count" for rating in RATING_VALUES),
+        ]
+        counts = {
+            f"rating_{rating}_count": Count("id", filter=Q(rating=rating))
+            for rating in RATING_VALUES
+        }
+        totals = {
+            row.pop("item_id"): row
+            for row in ItemReview.objects.order_by()
+            .values("item_id")
+            .annotate(review_count=Count("id"), rating_sum=Sum("rating"), **counts)
+        }
+
+        stale = []
+        for item in cls.objects.only(*fields).order_by("id").iterator(chunk_size=2000):
+            expected = totals.get(item.pk, {})
+            review_count = expected.get("review_count", 0)
+            rating_sum = expected.get("rating_sum") or 0
+            values = {
+                "review_count": review_count,
+                "rating_sum": rating_sum,
+                "rating_average": rating_sum / review_count if review_count else 0,
+                **{name: expected.get(name, 0) for name in counts},
+            }
+            if any(getattr(item, name) != value for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(item, name, value)
+                stale.append(item)
+
+        cls.objects.bulk_update(stale, fields, batch_size=batch_size)
+        return len(stale)
 
     class Meta:
         db_table = "item"  # <--- Custom table name
+        indexes = [
+            # keyset pagination in the catalog API
+            models.Index(fields=["title", "id"], name="item_title_id"),
+            models.Index(fields=["created_at", "id"], name="item_created_at_id"),
+            models.Index(fields=["rating_average", "id"], name="item_rating_average_id"),
+        ]
+
 
+# Images are released when an item is deleted by the receivers in
+# catalog.blobs, the files go once nothing references them
 
-@receiver(pre_delete, sender=Item)
-def delete_item_images(sender, instance, **kwargs):
-    # This signal handler ensures images are deleted even if the delete() method is bypassed
-    if instance.representative_image:
-        instance.representative_image.delete(save=False)
-    if instance.hero_image:
-        instance.hero_image.delete(save=False)
+
+# A stored file, addressed by the sha256 of its content (see catalog.storage)
+class Blob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=1024, unique=True)  # storage name
+    size = models.PositiveBigIntegerField(default=0)
+    # Number of model fields pointing at this blob, kept by catalog.blobs
+    ref_count = models.PositiveIntegerField(default=0)
+    # When ref_count last dropped to zero, collected after a grace period
+    released_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = "blob"  # <--- Custom table name
+        indexes = [
+            models.Index(fields=["ref_count", "released_at"], name="blob_released"),
+        ]
+
+
+# Queued work on an uploaded image, processed by catalog.jobs
+class ImageJob(models.Model):
+    STATUS_CHOICES = (
+        (0, "Pending"),
+        (1, "Running"),
+        (2, "Done"),
+        (3, "Failed"),
+    )
+    KIND_CHOICES = (
+        ("resize", "Resize"),
+        ("derivatives", "Derivatives"),
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default="resize")
+    # Null for images that don't belong to an item, e.g. profile pictures
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="image_jobs",
+        null=True,
+        blank=True,
+    )
+    field = models.CharField(max_length=50, blank=True)  # e.g. hero_image
+    source = models.CharField(max_length=1024)  # storage name of the original
+    status = models.IntegerField(choices=STATUS_CHOICES, default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.source} ({self.get_status_display()})"
+
+    class Meta:
+        db_table = "image_job"  # <--- Custom table name
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="image_job_ready"),
+        ]
+
+
+# One resized copy of a stored image, see catalog.derivatives
+class ImageDerivative(models.Model):
+    source = models.CharField(max_length=1024)  # storage name of the original
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)  # webp or jpeg
+    name = models.CharField(max_length=1024)  # storage name of the derivative
+    url = models.CharField(max_length=1024)  # resolved once, at build time
+
+    def __str__(self):
+        return f"{self.source} @ {self.width}w {self.format}"
+
+    class Meta:
+        db_table = "image_derivative"  # <--- Custom table name
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "width", "format"], name="image_derivative_unique"
+            ),
+        ]
+
+
+# What templates need to lay out a stored image without reading it
+class ImageMetadata(models.Model):
+    name = models.CharField(max_length=1024, unique=True)  # storage name
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveBigIntegerField(null=True, blank=True)  # bytes
+    placeholder = models.TextField(blank=True)  # data: URI of a tiny preview
+
+    def __str__(self):
+        return f"{self.name} ({self.width}x{self.height})"
+
+    class Meta:
+        db_table = "image_metadata"  # <--- Custom table name
 
 
 class ItemReview(models.Model):
     # If you want separate reviews/ratings for Items
-    rating = models.IntegerField()  # e.g. 1–5
+    rating = models.IntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )  # e.g. 1–5
     comment = models.TextField(blank=True)
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="reviews")
     created_at = models.DateTimeField(auto_now_add=True)
+    # edits of a review change the item page's ETag (core.conditional)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # save override, keeps the item's review aggregates in the same transaction
+    def save(self, *args, **kwargs):
+        self.rating = int(self.rating)
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    ItemReview.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("item_id", "rating")
+                    .first()
+                )
+
+            super().save(*args, **kwargs)
+
+            if previous != (self.item_id, self.rating):
+                if previous is not None:
+                    Item.apply_rating(previous[0], previous[1], -1)
+                Item.apply_rating(self.item_id, self.rating, 1)
 
     class Meta:
         db_table = "item_review"  # <--- Custom table name
+        indexes = [
+            # keyset pagination in the catalog API
+            models.Index(fields=["created_at", "id"], name="item_review_created_at_id"),
+            models.Index(
+                fields=["item", "created_at", "id"], name="item_review_item_created"
+            ),
+        ]
+
+
+@receiver(post_delete, sender=ItemReview)
+def remove_review_rating(sender, instance, **kwargs):
+    # Runs inside the delete's transaction, and also covers queryset deletes
+    # from the admin and cascades
+    Item.apply_rating(instance.item_id, instance.rating, -1)
@@ -0,0 +1,118 @@
+"""
+Content-addressed media storage.
+
+Files are stored in default_storage under blobs/<aa>/<sha256><ext>, so the
+same bytes are only ever uploaded once and a stored name never depends on
+the title or user it belongs to. Each stored file has a Blob row whose
+ref_count catalog.blobs keeps in step with the models pointing at it.
+"""
+
+import hashlib
+import os
+from django.core.files.base import File
+from django.core.files.storage import Storage, default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = "blobs/"
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def blob_key(digest, ext):
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest}{ext.lower()}"
+
+
+def content_digest(content):
+    """sha256 hex digest and size of a file, read in chunks"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+@deconstructible
+class BlobStorage(Storage):
+    """
+    Storage for model file fields: save() returns the blob name for the
+    content, uploading it only if no blob with that hash exists. delete() is
+    a no-op for blobs, they are removed once nothing references them.
+    """
+
+    def save(self, name, content, max_length=None):
+        from .models import Blob
+
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest, size = content_digest(content)
+
+        # Reusing a blob also takes it off the garbage collector's list
+        if Blob.objects.filter(sha256=digest).update(released_at=None):
+            return Blob.objects.values_list("name", flat=True).get(sha256=digest)
+
+        content.seek(0)
+        stored = default_storage.save(
+            blob_key(digest, os.path.splitext(name or "")[1]), content
+        )
+        try:
+            with transaction.atomic():
+                # Unreferenced until a model field points at it
+                Blob.objects.create(
+                    sha256=digest, name=stored, size=size, released_at=timezone.now()
+                )
+        except IntegrityError:
+            # Another upload of the same content won the race
+            winner = Blob.objects.values_list("name", flat=True).get(sha256=digest)
+            if winner != stored:
+                default_storage.delete(stored)
+            return winner
+        return stored
+
+    def delete(self, name):
+        # References are released by catalog.blobs when a model stops using a
+        # blob, only files from before content addressing are deleted directly
+        if not is_blob(name):
+            default_storage.delete(name)
+
+    def _open(self, name, mode="rb"):
+        return default_storage.open(name, mode)
+
+    def exists(self, name):
+        return default_storage.exists(name)
+
+    def url(self, name):
+        return default_storage.url(name)
+
+    def size(self, name):
+        return default_storage.size(name)
+
+    def path(self, name):
+        return default_storage.path(name)
+
+    def listdir(self, path):
+        return default_storage.listdir(path)
+
+
+def blob_storage():
+    return BlobStorage()
+
+
+def delete_stored(names):
+    """
+    Delete files from default_storage, in batches when the backend supports
+    it (VercelBlobStorage.delete_many) and one by one otherwise
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+    delete_many = getattr(default_storage, "delete_many", None)
+    if delete_many is not None:
+        delete_many(names)
+    else:
+        for name in names:
+            default_storage.delete(name)
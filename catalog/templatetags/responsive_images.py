@@ -0,0 +1,77 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+from catalog import derivatives as image_derivatives
+
+register = template.Library()
+
+
+def _source_url(image):
+    # Either a stored file or an already resolved URL (destination cards)
+    if isinstance(image, str):
+        return image
+    try:
+        return image.url
+    except Exception:
+        return ""
+
+
+def _layout_attrs(image, metadata, attrs):
+    """width/height and a blur-up placeholder, from recorded metadata only"""
+    extra = {}
+    if metadata is not None:
+        dimensions = (metadata.width, metadata.height)
+    else:
+        dimensions = getattr(image, "stored_dimensions", None)
+    if dimensions and "width" not in attrs and "height" not in attrs:
+        extra["width"], extra["height"] = dimensions
+    if metadata is not None and metadata.placeholder:
+        style = f'background-size:cover;background-image:url("{metadata.placeholder}")'
+        extra["style"] = f"{style};{attrs['style']}" if attrs.get("style") else style
+    return extra
+
+
+@register.simple_tag
+def responsive_image(image, sizes="100vw", derivatives=None, metadata=None, **attrs):
+    """
+    Render an image as a <picture> with WebP and JPEG srcsets, e.g.
+
+        {% responsive_image item.hero_image sizes="100vw" alt=item.title class="img-fluid" %}
+
+    Derivatives and metadata (width/height and the blur-up placeholder)
+    come from the arguments, from catalog.derivatives.prefetch, or from a
+    query each for this image. Without derivatives the plain image is
+    rendered.
+    """
+    name = getattr(image, "name", None)
+    if derivatives is None:
+        derivatives = getattr(image, "derivatives", None)
+    if derivatives is None and name:
+        derivatives = image_derivatives.lookup([name])[name]
+    if metadata is None:
+        metadata = getattr(image, "metadata", None)
+    if metadata is None and name and not hasattr(image, "metadata"):
+        metadata = image_derivatives.metadata([name]).get(name)
+    attrs = {**attrs, **_layout_attrs(image, metadata, attrs)}
+
+    sources = image_derivatives.srcsets(derivatives or [])
+    if not sources:
+        return format_html("<img{}>", flatatt({"src": _source_url(image), **attrs}))
+
+    # The last source is the JPEG ladder, every browser gets that on the <img>
+    *alternatives, (_, fallback) = sources
+    img = format_html(
+        "<img{}>",
+        flatatt(
+            {"src": _source_url(image), "srcset": fallback, "sizes": sizes, **attrs}
+        ),
+    )
+    return format_html(
+        "<picture>{}{}</picture>",
+        format_html_join(
+            "",
+            '<source type="{}" srcset="{}" sizes="{}">',
+            ((mime, srcset, sizes) for mime, srcset in alternatives),
+        ),
+        img,
+    )
@@ -1,20 +1,22 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
 from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 from .models import Item, ItemReview
 from .forms import ItemForm
-from collection.models import CollectionItems
+from collection.models import Collection, CollectionItems
+from core import caching
+from core.caching import object_tag
+from core.conditional import conditional_page, item_watermark
+from core.page_cache import cache_anonymous_page, tag_page
 from loans.models import Loan
-from datetime import datetime
-from PIL import Image
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
-import sys
-import os
-import random
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from datetime import date, datetime, timedelta
+import hmac
+from loans import availability
+from . import blobs, derivatives, jobs
+from .images import IMAGE_SPECS, needs_resize, suffixed_name
 
 # Create your views here.
 
@@ -24,7 +26,7 @@ def catalog_list(request):
     return render(request, "catalog.html", {"items": items})
 
 
-def item_detail(request, item_title):
+def _item_detail_data(item_title):
     # Get the item by title, returning a 404 if not found
     item = get_object_or_404(Item, title=item_title)
 
@@ -36,11 +38,42 @@ def item_detail(request, item_title):
         ci.collection.visibility == 1 for ci in collection_items
     )
 
+    # Reviews are only loaded when the stored count says there are any
+    reviews = []
+    if item.review_count:
+        reviews = list(item.reviews.select_related("creator").order_by("-created_at"))
+        derivatives.prefetch([review.creator for review in reviews], "profile_picture")
+    derivatives.prefetch([item], "hero_image", "representative_image")
+    collection_ids = [ci.collection_id for ci in collection_items]
+    return item, is_in_private_collection, reviews, collection_ids
+
+
+@conditional_page(item_watermark)
+@cache_anonymous_page
+def item_detail(request, item_title):
+    # Prefetched derivatives stay attached to the cached images
+    item, is_in_private_collection, reviews, collection_ids = caching.cached(
+        "item-detail",
+        (Item, ItemReview, Collection, CollectionItems),
+        lambda: _item_detail_data(item_title),
+        item_title,
+    )
+    # Reviews, loans and memberships of the item bump its tag too
+    tag_page(
+        request,
+        object_tag(Item, item.id),
+        *(object_tag(Collection, pk) for pk in collection_ids),
+    )
+
     # Render the item detail template with the item and collection info
     return render(
         request,
         "catalog/item_detail.html",
-        {"item": item, "is_in_private_collection": is_in_private_collection},
+        {
+            "item": item,
+            "is_in_private_collection": is_in_private_collection,
+            "reviews": reviews,
+        },
     )
 
 
@@ -65,10 +98,8 @@ def delete_review(request, review_id):
 def booking_view(request, item_title):
     item = get_object_or_404(Item, title=item_title)
 
-    # Get all approved loans for this item
-    existing_loans = Loan.objects.filter(
-        item=item, status=1  # Approved status
-    ).values_list("start_date", "end_date")
+    # Merged interval index of approved loans for this item
+    index = availability.get_index(item.id)
 
     #/***************************************************************************************
     #*  REFERENCES
@@ -81,15 +112,7 @@ def booking_view(request, item_title):
     #*
     #***************************************************************************************/
     # Convert dates to strings for JavaScript
-    disabled_dates = []
-    for start_date, end_date in existing_loans:
-        if start_date and end_date:
-            disabled_dates.append(
-                {
-                    "from": start_date.strftime("%Y-%m-%d"),
-                    "to": end_date.strftime("%Y-%m-%d"),
-                }
-            )
+    disabled_dates = _format_ranges(index.intervals)
 
     if request.method == "POST":
         # Get form data
@@ -105,6 +128,17 @@ def booking_view(request, item_title):
             messages.error(request, "Invalid date format")
             return redirect("catalog:booking", item_title=item_title)
 
+        if end_date < start_date:
+            messages.error(request, "Check-out date cannot be before check-in date")
+            return redirect("catalog:booking", item_title=item_title)
+
+        # Reject bookings that conflict with approved loans up front
+        if index.overlaps(start_date, end_date):
+            messages.error(
+                request, "These dates are no longer available. Please choose other dates."
+            )
+            return redirect("catalog:booking", item_title=item_title)
+
         # Create new loan
         loan = Loan.objects.create(
             item=item,
@@ -128,6 +162,70 @@ def booking_view(request, item_title):
     )
 
 
+def availability_view(request, item_title):
+    """
+    JSON list of booked date ranges for an item within one month
+    """
+    item = get_object_or_404(Item, title=item_title)
+
+    # Month window, e.g. ?month=2025-05, defaults to the current month
+    month = request.GET.get("month")
+    try:
+        if month:
+            window_start = datetime.strptime(month, "%Y-%m").date()
+        else:
+            window_start = date.today().replace(day=1)
+        next_month = (window_start + timedelta(days=32)).replace(day=1)
+    except (ValueError, OverflowError):
+        # OverflowError: December 9999 has no following month
+        return JsonResponse(
+            {"success": False, "message": "Invalid month, expected YYYY-MM"}, status=400
+        )
+    window_end = next_month - timedelta(days=1)
+
+    index = availability.get_index(item.id)
+    return JsonResponse(
+        {
+            "success": True,
+            "item": item.title,
+            "from": window_start.strftime("%Y-%m-%d"),
+            "to": window_end.strftime("%Y-%m-%d"),
+            "booked": _format_ranges(index.ranges_between(window_start, window_end)),
+        }
+    )
+
+
+def _format_ranges(ranges):
+    return [
+        {"from": start.strftime("%Y-%m-%d"), "to": end.strftime("%Y-%m-%d")}
+        for start, end in ranges
+    ]
+
+
+def _prepare_uploads(files):
+    """
+    Give uploaded item images a random suffix and return the fields whose
+    upload is large enough to need resizing
+    """
+    to_resize = []
+    for field, spec in IMAGE_SPECS.items():
+        if field in files:
+            upload = files[field]
+            upload.name = suffixed_name(upload.name)
+            if needs_resize(upload, spec):
+                to_resize.append(field)
+    return to_resize
+
+
+def _queue_image_jobs(item, files, to_resize):
+    # Large uploads get their derivatives once the resize has been swapped in
+    for field in IMAGE_SPECS:
+        if field in to_resize:
+            jobs.enqueue(item, field)
+        elif field in files:
+            jobs.enqueue_derivatives(getattr(item, field).name, item=item, field=field)
+
+
 @login_required
 def create_item(request):
     if not request.user.role == 1:  # Check if user is a librarian
@@ -138,132 +236,14 @@ def create_item(request):
         form = ItemForm(request.POST, request.FILES)
         if form.is_valid():
             item = form.save(commit=False)
-            
-            # Process image files before saving
-            from PIL import Image
-            from io import BytesIO
-            from django.core.files.uploadedfile import InMemoryUploadedFile
-            import sys
-            
-
-            #/***************************************************************************************
-            #*  REFERENCES
-            #*  Title: Claude 3.7 Sonnet
-            #*  Author: Anthropic
-            #*  Date: Spring 2024
-            #*  URL: https://claude.ai
-            #*
-            #*  Prompt used: How can I reduce the size of an image before uploading it to S3?
-            #*  ---> told me to use pollow package
-
-            #*
-            #***************************************************************************************/
-
-
-            # Process hero_image if present
-            if 'hero_image' in request.FILES:
-                hero_image = request.FILES['hero_image']
-                # Maximum acceptable size for hero image: 600KB
-                max_hero_size = 600 * 1024  # 600KB in bytes
-                
-                # Generate random 3-digit number for filename
-                random_suffix = f"{random.randint(100, 999)}"
-                
-                # Only resize if file exceeds maximum size
-                if hero_image.size > max_hero_size:
-                    hero_img = Image.open(hero_image)
-                    # Target dimensions for hero image
-                    target_width, target_height = 2560, 1080
-                    
-                    # Calculate new dimensions while maintaining aspect ratio
-                    img_ratio = hero_img.width / hero_img.height
-                    target_ratio = target_width / target_height
-                    
-                    if img_ratio > target_ratio:
-                        # Image is wider than target ratio, adjust height
-                        new_width = target_width
-                        new_height = int(target_width / img_ratio)
-                    else:
-                        # Image is taller than target ratio, adjust width
-                        new_height = target_height
-                        new_width = int(target_height * img_ratio)
-                    
-                    # Resize image
-                    hero_img = hero_img.resize((new_width, new_height), Image.LANCZOS)
-                    
-                    # Create output buffer
-                    output = BytesIO()
-                    # Save resized image
-                    hero_img.save(output, format='JPEG', quality=90)
-                    output.seek(0)
-                    
-                    # Replace original file with resized version
-                    item.hero_image = InMemoryUploadedFile(
-                        output, 
-                        'ImageField',
-                        f"{hero_image.name.split('.')[0]}-{random_suffix}.jpg",
-                        'image/jpeg',
-                        sys.getsizeof(output),
-                        None
-                    )
-                else:
-                    # If no resizing needed, still add random suffix to filename
-                    name_parts = os.path.splitext(hero_image.name)
-                    hero_image.name = f"{name_parts[0]}-{random_suffix}{name_parts[1]}"
-            
-            # Process representative_image if present
-            if 'representative_image' in request.FILES:
-                rep_image = request.FILES['representative_image']
-                # Maximum acceptable size for representative image: 200KB
-                max_rep_size = 400 * 1024  # 200KB in bytes
-                
-                # Generate random 3-digit number for filename
-                random_suffix = f"{random.randint(100, 999)}"
-                
-                # Only resize if file exceeds maximum size
-                if rep_image.size > max_rep_size:
-                    rep_img = Image.open(rep_image)
-                    # Target dimensions for representative image
-                    target_width, target_height = 800, 600
-                    
-                    # Calculate new dimensions while maintaining aspect ratio
-                    img_ratio = rep_img.width / rep_img.height
-                    target_ratio = target_width / target_height
-                    
-                    if img_ratio > target_ratio:
-                        # Image is wider than target ratio, adjust height
-                        new_width = target_width
-                        new_height = int(target_width / img_ratio)
-                    else:
-                        # Image is taller than target ratio, adjust width
-                        new_height = target_height
-                        new_width = int(target_height * img_ratio)
-                    
-                    # Resize image
-                    rep_img = rep_img.resize((new_width, new_height), Image.LANCZOS)
-                    
-                    # Create output buffer
-                    output = BytesIO()
-                    # Save resized image
-                    rep_img.save(output, format='JPEG', quality=85)
-                    output.seek(0)
-                    
-                    # Replace original file with resized version
-                    item.representative_image = InMemoryUploadedFile(
-                        output, 
-                        'ImageField',
-                        f"{rep_image.name.split('.')[0]}-{random_suffix}.jpg",
-                        'image/jpeg',
-                        sys.getsizeof(output),
-                        None
-                    )
-                else:
-                    # If no resizing needed, still add random suffix to filename
-                    name_parts = os.path.splitext(rep_image.name)
-                    rep_image.name = f"{name_parts[0]}-{random_suffix}{name_parts[1]}"
-            
+
+            # Store the originals as uploaded, large ones are resized by the
+            # image worker afterwards
+            to_resize = _prepare_uploads(request.FILES)
+
             item.created_by = request.user
             item.save()
+            _queue_image_jobs(item, request.FILES, to_resize)
             messages.success(request, "Item created successfully!")
             return JsonResponse({"success": True})
         else:
@@ -282,169 +262,19 @@ def update_item(request):
         item_id = request.POST.get("item_id")
         try:
             item = Item.objects.get(id=item_id)
-            old_title = item.title
-            old_hero_image_path = item.hero_image.name if item.hero_image else None
-            old_rep_image_path = item.representative_image.name if item.representative_image else None
-            
+
             form = ItemForm(request.POST, request.FILES, instance=item)
             if form.is_valid():
                 updated_item = form.save(commit=False)
-                
-                # Process images if they're uploaded
-                from PIL import Image
-                from io import BytesIO
-                from django.core.files.uploadedfile import InMemoryUploadedFile
-                import sys
-                
-                # Process hero_image if new one is uploaded
-                if 'hero_image' in request.FILES:
-                    # Delete old hero image from storage if it exists
-                    if old_hero_image_path and default_storage.exists(old_hero_image_path):
-                        default_storage.delete(old_hero_image_path)
-                        
-                    hero_image = request.FILES['hero_image']
-                    # Maximum acceptable size for hero image: 600KB
-                    max_hero_size = 600 * 1024  # 600KB in bytes
-                    
-                    # Generate random 3-digit number for filename
-                    random_suffix = f"{random.randint(100, 999)}"
-                    
-                    # Only resize if file exceeds maximum size
-                    if hero_image.size > max_hero_size:
-                        hero_img = Image.open(hero_image)
-                        # Target dimensions for hero image
-                        target_width, target_height = 2560, 1080
-                        
-                        # Calculate new dimensions while maintaining aspect ratio
-                        img_ratio = hero_img.width / hero_img.height
-                        target_ratio = target_width / target_height
-                        
-                        if img_ratio > target_ratio:
-                            # Image is wider than target ratio, adjust height
-                            new_width = target_width
-                            new_height = int(target_width / img_ratio)
-                        else:
-                            # Image is taller than target ratio, adjust width
-                            new_height = target_height
-                            new_width = int(target_height * img_ratio)
-                        
-                        # Resize image
-                        hero_img = hero_img.resize((new_width, new_height), Image.LANCZOS)
-                        
-                        # Create output buffer
-                        output = BytesIO()
-                        # Save resized image
-                        hero_img.save(output, format='JPEG', quality=90)
-                        output.seek(0)
-                        
-                        # Replace original file with resized version
-                        updated_item.hero_image = InMemoryUploadedFile(
-                            output, 
-                            'ImageField',
-                            f"{hero_image.name.split('.')[0]}-{random_suffix}.jpg",
-                            'image/jpeg',
-                            sys.getsizeof(output),
-                            None
-                        )
-                    else:
-                        # If no resizing needed, still add random suffix to filename
-                        name_parts = os.path.splitext(hero_image.name)
-                        hero_image.name = f"{name_parts[0]}-{random_suffix}{name_parts[1]}"
-                
-                # Process representative_image if new one is uploaded
-                if 'representative_image' in request.FILES:
-                    # Delete old representative image from storage if it exists
-                    if old_rep_image_path and default_storage.exists(old_rep_image_path):
-                        default_storage.delete(old_rep_image_path)
-                        
-                    rep_image = request.FILES['representative_image']
-                    # Maximum acceptable size for representative image: 400KB
-                    max_rep_size = 400 * 1024  # 400KB in bytes
-                    
-                    # Generate random 3-digit number for filename
-                    random_suffix = f"{random.randint(100, 999)}"
-                    
-                    # Only resize if file exceeds maximum size
-                    if rep_image.size > max_rep_size:
-                        rep_img = Image.open(rep_image)
-                        # Target dimensions for representative image
-                        target_width, target_height = 800, 600
-                        
-                        # Calculate new dimensions while maintaining aspect ratio
-                        img_ratio = rep_img.width / rep_img.height
-                        target_ratio = target_width / target_height
-                        
-                        if img_ratio > target_ratio:
-                            # Image is wider than target ratio, adjust height
-                            new_width = target_width
-                            new_height = int(target_width / img_ratio)
-                        else:
-                            # Image is taller than target ratio, adjust width
-                            new_height = target_height
-                            new_width = int(target_height * img_ratio)
-                        
-                        # Resize image
-                        rep_img = rep_img.resize((new_width, new_height), Image.LANCZOS)
-                        
-                        # Create output buffer
-                        output = BytesIO()
-                        # Save resized image
-                        rep_img.save(output, format='JPEG', quality=85)
-                        output.seek(0)
-                        
-                        # Replace original file with resized version
-                        updated_item.representative_image = InMemoryUploadedFile(
-                            output, 
-                            'ImageField',
-                            f"{rep_image.name.split('.')[0]}-{random_suffix}.jpg",
-                            'image/jpeg',
-                            sys.getsizeof(output),
-                            None
-                        )
-                    else:
-                        # If no resizing needed, still add random suffix to filename
-                        name_parts = os.path.splitext(rep_image.name)
-                        rep_image.name = f"{name_parts[0]}-{random_suffix}{name_parts[1]}"
-                
-                # Save the item first to get the new file paths
+                to_resize = _prepare_uploads(request.FILES)
+
+                # Images are stored by content hash, so a title change is only
+                # a metadata update, and replaced images are released (and
+                # deleted once unused) by catalog.blobs when the item is saved
                 updated_item.save()
-                
-                # Handle title change - need to update file paths if title changed
-                if old_title != updated_item.title and (old_hero_image_path or old_rep_image_path):
-                    # Helper function to copy file to new path
-                    def copy_file_to_new_path(old_path, new_path):
-                        if old_path and default_storage.exists(old_path):
-                            # Read the old file
-                            file_content = default_storage.open(old_path).read()
-                            # Save to new path
-                            default_storage.save(new_path, ContentFile(file_content))
-                            # Delete the old file
-                            default_storage.delete(old_path)
-                    
-                    # Handle hero image
-                    if old_hero_image_path and updated_item.hero_image:
-                        # New path would already be correct in updated_item.hero_image.name
-                        # Only need to copy if we didn't upload a new image
-                        if 'hero_image' not in request.FILES:
-                            old_filename = os.path.basename(old_hero_image_path)
-                            new_path = f"items/{updated_item.title}/{old_filename}"
-                            copy_file_to_new_path(old_hero_image_path, new_path)
-                            # Update the path in the model
-                            updated_item.hero_image.name = new_path
-                    
-                    # Handle representative image
-                    if old_rep_image_path and updated_item.representative_image:
-                        # Only need to copy if we didn't upload a new image
-                        if 'representative_image' not in request.FILES:
-                            old_filename = os.path.basename(old_rep_image_path)
-                            new_path = f"items/{updated_item.title}/{old_filename}"
-                            copy_file_to_new_path(old_rep_image_path, new_path)
-                            # Update the path in the model
-                            updated_item.representative_image.name = new_path
-                    
-                    # Save again to update file paths
-                    updated_item.save()
-                
+
+                _queue_image_jobs(updated_item, request.FILES, to_resize)
+
                 messages.success(request, "Item updated successfully!")
                 return JsonResponse({"success": True})
             else:
@@ -496,6 +326,14 @@ def add_review(request, item_id):
             messages.error(request, "Please provide both a rating and comment.")
             return redirect("catalog:item_detail", item_title=item.title)
 
+        try:
+            rating = int(rating)
+        except ValueError:
+            rating = None
+        if rating not in range(1, 6):
+            messages.error(request, "Rating must be between 1 and 5.")
+            return redirect("catalog:item_detail", item_title=item.title)
+
         # Check if user already has a review for this item
         existing_review = ItemReview.objects.filter(
             item=item, creator=request.user
@@ -517,3 +355,20 @@ def add_review(request, item_id):
 
     # If not POST, redirect to item detail page
     return redirect("catalog:item_detail", item_title=item.title)
+
+
+@require_GET
+def run_image_jobs(request):
+    """
+    Run ready image jobs for a limited time, called by the Vercel cron
+    (see vercel.json), which sends CRON_SECRET as a bearer token
+    """
+    secret = settings.CRON_SECRET
+    given = request.headers.get("Authorization", "")
+    if not secret or not hmac.compare_digest(given, f"Bearer {secret}"):
+        return JsonResponse({"success": False, "message": "Forbidden"}, status=403)
+
+    ran = jobs.run_pending(seconds=settings.IMAGE_JOBS_CRON_SECONDS)
+    # Like the worker when it's idle, delete blobs unreferenced for a while
+    collected = blobs.collect()
+    return JsonResponse({"success": True, "ran": ran, "collected": collected})
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CollectionConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "collection"
+
+    def ready(self):
+        # register the authorization cache invalidation receivers
+        from . import authorization  # noqa: F401
@@ -0,0 +1,64 @@
+"""
+Collection authorization lookups.
+
+A user's authorized collection ids are loaded as a set with one query, memoized
+on the request and cached across requests until a CollectionAuthorizedUser row
+for that user is created or deleted. The cache must be shared, see core.checks.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CollectionAuthorizedUser
+
+CACHE_TIMEOUT = 60 * 60  # 1 hour, invalidation normally happens long before
+
+
+def _cache_key(user_id):
+    return f"collection-auth:{user_id}"
+
+
+def get_authorized_collection_ids(user, request=None):
+    """
+    Return the ids of the collections the user has been explicitly authorized for
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    # Per-request memo, so repeated lookups while rendering one page are free
+    memo = getattr(request, "_authorized_collection_ids", None)
+    if memo is not None and user.pk in memo:
+        return memo[user.pk]
+
+    key = _cache_key(user.pk)
+    collection_ids = cache.get(key)
+    if collection_ids is None:
+        collection_ids = frozenset(
+            CollectionAuthorizedUser.objects.filter(user_id=user.pk).values_list(
+                "collection_id", flat=True
+            )
+        )
+        cache.set(key, collection_ids, CACHE_TIMEOUT)
+
+    if request is not None:
+        if memo is None:
+            memo = request._authorized_collection_ids = {}
+        memo[user.pk] = collection_ids
+
+    return collection_ids
+
+
+def invalidate_authorized_collections(user_id):
+    """Drop the cached authorized collection ids for a user"""
+    key = _cache_key(user_id)
+    cache.delete(key)
+    # Drop it again once the change is visible to other connections, so a read
+    # racing the open transaction can't cache the old set for the full timeout
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(post_save, sender=CollectionAuthorizedUser)
+@receiver(post_delete, sender=CollectionAuthorizedUser)
+def invalidate_on_authorized_user_change(sender, instance, **kwargs):
+    invalidate_authorized_collections(instance.user_id)
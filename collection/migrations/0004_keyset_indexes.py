@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 23:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collection", "0001_squashed_0003_collection_is_region"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="collection",
+            index=models.Index(fields=["title", "id"], name="collection_title_id"),
+        ),
+        migrations.AddIndex(
+            model_name="collection",
+            index=models.Index(
+                fields=["created_at", "id"], name="collection_created_at_id"
+            ),
+        ),
+    ]
@@ -55,6 +55,11 @@ class Collection(models.Model):
 
     class Meta:
         db_table = "collection"  # <--- Custom table name
+        indexes = [
+            # keyset pagination in the catalog API
+            models.Index(fields=["title", "id"], name="collection_title_id"),
+            models.Index(fields=["created_at", "id"], name="collection_created_at_id"),
+        ]
 
 
 # many-to-many "through" table linking Collections to Items
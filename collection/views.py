@@ -2,13 +2,20 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import Collection, CollectionItems
+from catalog import derivatives
 from catalog.models import Item
+from core import caching
+from core.caching import object_tag, set_tag
+from core.conditional import conditional_page, collection_watermark
+from core.page_cache import cache_anonymous_page, tag_page
 from django.db.models import Case, When, Value, IntegerField
 from django.http import JsonResponse
+import logging
 
-# Create your views here.
+logger = logging.getLogger(__name__)
 
 
+@cache_anonymous_page
 def collection_list(request):
     #/***************************************************************************************
     #*  REFERENCES
@@ -33,9 +40,32 @@ def collection_list(request):
         )
     ).order_by('display_order')
 
+    # Creators and item titles are shown for every collection, load them up
+    # front and keep the whole list until a collection or membership changes
+    collections = caching.cached(
+        "collection-list",
+        (Collection, CollectionItems, Item),
+        lambda: list(
+            collections.select_related("creator").prefetch_related(
+                "collectionitems_set__item"
+            )
+        ),
+    )
+    tag_page(
+        request,
+        set_tag(Collection),
+        set_tag(CollectionItems),
+        *(object_tag(Collection, collection.id) for collection in collections),
+        *(
+            object_tag(Item, membership.item_id)
+            for collection in collections
+            for membership in collection.collectionitems_set.all()
+        ),
+    )
     return render(request, "collections/list.html", {"collections": collections})
 
 
+@conditional_page(collection_watermark)
 def collection_detail(request, collection_id):
     collection = get_object_or_404(Collection, id=collection_id)
 
@@ -59,6 +89,10 @@ def collection_detail(request, collection_id):
         if request.user == collection.creator or request.user.role == 1:
             is_creator = True
 
+    # Items with their image derivatives, loaded up front for the grid
+    memberships = list(collection.collectionitems_set.select_related("item"))
+    derivatives.prefetch([ci.item for ci in memberships], "representative_image")
+
     # Check if this is an AJAX request
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return render(
@@ -66,6 +100,7 @@ def collection_detail(request, collection_id):
             "collections/detail.html",
             {
                 "collection": collection,
+                "memberships": memberships,
                 "available_items": available_items,
                 "is_creator": is_creator,
             },
@@ -76,6 +111,7 @@ def collection_detail(request, collection_id):
         "collections/detail.html",
         {
             "collection": collection,
+            "memberships": memberships,
             "available_items": available_items,
             "is_creator": is_creator,
         },
@@ -206,26 +242,13 @@ def remove_item(request, collection_id, item_id):
 def add_items(request, collection_id):
     collection = get_object_or_404(Collection, id=collection_id)
 
-    #/***************************************************************************************
-    #*  REFERENCES
-    #*  Title: Claude 3.7 Sonnet
-    #*  Author: Anthropic
-    #*  Date: Spring 2024
-    #*  URL: https://claude.ai
-    #*
-    #*  Prompt used: Created print statements as logging to help debug the code at one point
-    #*
-    #***************************************************************************************/
-    print(f"Collection: {collection}")
-    print(f"Request: {request}")
-    print(f"Using AJAX: {request.headers.get('X-Requested-With') == 'XMLHttpRequest'}")
-    print(f"User: {request.user}")
-    print(f"User Role: {request.user.role}")
-    print(f"User is Collection Creator: {request.user == collection.creator}")
-    print(f"User is Authenticated: {request.user.is_authenticated}")
-    print("Running add_items() in collection/views.py")
-
-
+    logger.debug(
+        "add_items collection=%s user=%s role=%s ajax=%s",
+        collection.pk,
+        request.user.pk,
+        request.user.role,
+        request.headers.get("X-Requested-With") == "XMLHttpRequest",
+    )
 
     # Check if user is the creator of the collection
     if request.user != collection.creator and request.user.role != 1:
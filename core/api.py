@@ -0,0 +1,429 @@
+"""
+Read-only JSON catalog API, version 1.
+
+List endpoints use keyset pagination: the opaque cursor holds the sort value
+and id of the last row returned, so each page is one indexed range scan no
+matter how far a client has scrolled. ?fields= picks the serialized fields and
+only their columns are fetched, and every response carries an ETag.
+"""
+
+import base64
+import hashlib
+import json
+from django.db.models import BooleanField, F, Func, Q, Value
+from django.core.files.storage import default_storage
+from django.http import JsonResponse, Http404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from catalog.models import Item, ItemReview
+from collection.models import Collection
+from collection.authorization import get_authorized_collection_ids
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class APIError(Exception):
+    pass
+
+
+class Field:
+    """A serialized field, the columns it needs and how to read it"""
+
+    def __init__(self, columns, getter, related=None, image=None):
+        self.columns = columns
+        self.getter = getter
+        self.related = related
+        self.image = image  # attribute holding an image whose URL is served
+
+
+class Resource:
+    def __init__(self, fields, list_fields, orderings, default_order):
+        self.fields = fields
+        self.list_fields = list_fields  # defaults for list views
+        self.orderings = orderings  # name -> (sort field, descending)
+        self.default_order = default_order
+
+    def parse_fields(self, value, default):
+        if not value:
+            return default
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise APIError(f"Unknown field(s): {', '.join(unknown)}")
+        return names
+
+    def select(self, queryset, names, extra_columns=()):
+        """Restrict the queryset to the columns and joins the fields need"""
+        columns = {"id", *extra_columns}
+        related = set()
+        for name in names:
+            field = self.fields[name]
+            columns.update(field.columns)
+            if field.related:
+                related.add(field.related)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def serialize(self, obj, names):
+        return {name: self.fields[name].getter(obj) for name in names}
+
+    def prefetch_images(self, objs, names):
+        """Look up the URLs of the selected images of a page in one query"""
+        prefetch_urls = getattr(default_storage, "prefetch_urls", None)
+        images = [self.fields[name].image for name in names if self.fields[name].image]
+        if prefetch_urls and images:
+            prefetch_urls(
+                getattr(obj, image).name
+                for obj in objs
+                for image in images
+                if getattr(obj, image)
+            )
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _image_url(image):
+    try:
+        return image.url if image else None
+    except Exception:
+        return None
+
+
+def _card_value(attribute):
+    def getter(item):
+        try:
+            return getattr(item.destination_card, attribute)
+        except Item.destination_card.RelatedObjectDoesNotExist:
+            return None
+
+    return getter
+
+
+ITEMS = Resource(
+    fields={
+        "id": Field(("id",), lambda i: i.id),
+        "title": Field(("title",), lambda i: i.title),
+        "status": Field(("status",), lambda i: i.status),
+        "location": Field(("location",), lambda i: i.location),
+        "description": Field(("description",), lambda i: i.description),
+        "price_per_night": Field(
+            ("price_per_night",),
+            lambda i: str(i.price_per_night) if i.price_per_night is not None else None,
+        ),
+        "representative_image": Field(
+            ("representative_image",),
+            lambda i: _image_url(i.representative_image),
+            image="representative_image",
+        ),
+        "hero_image": Field(
+            ("hero_image",), lambda i: _image_url(i.hero_image), image="hero_image"
+        ),
+        "created_at": Field(("created_at",), lambda i: _iso(i.created_at)),
+        "updated_at": Field(("updated_at",), lambda i: _iso(i.updated_at)),
+        "url": Field(
+            ("title",),
+            lambda i: reverse("item_detail", kwargs={"item_title": i.title}),
+        ),
+        "region": Field(
+            ("destination_card__region",),
+            _card_value("region"),
+            related="destination_card",
+        ),
+        "collection_ids": Field(
+            ("destination_card__collection_ids",),
+            _card_value("collection_ids"),
+            related="destination_card",
+        ),
+        "image_derivatives": Field(
+            ("destination_card__image_derivatives",),
+            _card_value("image_derivatives"),
+            related="destination_card",
+        ),
+        "review_count": Field(("review_count",), lambda i: i.review_count),
+        "rating_average": Field(("rating_average",), lambda i: i.rating_average),
+        "rating_histogram": Field(
+            tuple(f"rating_{rating}_count" for rating in range(1, 6)),
+            lambda i: i.rating_histogram,
+        ),
+    },
+    list_fields=[
+        "id",
+        "title",
+        "status",
+        "location",
+        "price_per_night",
+        "representative_image",
+        "url",
+    ],
+    orderings={
+        "title": ("title", False),
+        "created_at": ("created_at", False),
+        "-created_at": ("created_at", True),
+        "rating": ("rating_average", False),
+        "-rating": ("rating_average", True),
+    },
+    default_order="title",
+)
+
+COLLECTIONS = Resource(
+    fields={
+        "id": Field(("id",), lambda c: c.id),
+        "title": Field(("title",), lambda c: c.title),
+        "description": Field(("description",), lambda c: c.description),
+        "visibility": Field(("visibility",), lambda c: c.visibility),
+        "is_region": Field(("is_region",), lambda c: c.is_region),
+        "creator": Field(
+            ("creator__username",), lambda c: c.creator.username, related="creator"
+        ),
+        "created_at": Field(("created_at",), lambda c: _iso(c.created_at)),
+        "updated_at": Field(("updated_at",), lambda c: _iso(c.updated_at)),
+        "url": Field(
+            ("id",),
+            lambda c: reverse("collection:detail", kwargs={"collection_id": c.id}),
+        ),
+    },
+    list_fields=["id", "title", "visibility", "is_region", "url"],
+    orderings={
+        "title": ("title", False),
+        "created_at": ("created_at", False),
+        "-created_at": ("created_at", True),
+    },
+    default_order="title",
+)
+
+REVIEWS = Resource(
+    fields={
+        "id": Field(("id",), lambda r: r.id),
+        "item": Field(("item_id",), lambda r: r.item_id),
+        "item_title": Field(("item__title",), lambda r: r.item.title, related="item"),
+        "rating": Field(("rating",), lambda r: r.rating),
+        "comment": Field(("comment",), lambda r: r.comment),
+        "creator": Field(
+            ("creator__username",), lambda r: r.creator.username, related="creator"
+        ),
+        "created_at": Field(("created_at",), lambda r: _iso(r.created_at)),
+    },
+    list_fields=["id", "item", "rating", "comment", "creator", "created_at"],
+    orderings={
+        "created_at": ("created_at", False),
+        "-created_at": ("created_at", True),
+    },
+    default_order="-created_at",
+)
+
+
+def _is_librarian(user):
+    return user.is_authenticated and user.role == 1
+
+
+def _visible_items(request):
+    # Same rule as the destinations page, private collection items stay
+    # hidden from everyone but librarians
+    if _is_librarian(request.user):
+        return Item.objects.all()
+    return Item.objects.exclude(destination_card__is_private=True)
+
+
+def _visible_collections(request):
+    if _is_librarian(request.user):
+        return Collection.objects.all()
+    authorized = get_authorized_collection_ids(request.user, request)
+    return Collection.objects.filter(Q(visibility=0) | Q(id__in=authorized))
+
+
+def _visible_reviews(request):
+    if _is_librarian(request.user):
+        return ItemReview.objects.all()
+    return ItemReview.objects.exclude(item__destination_card__is_private=True)
+
+
+def _ordering(field, descending):
+    # Explicit null placement matches PostgreSQL's defaults, so a plain
+    # (field, id) index serves both directions
+    if descending:
+        return [F(field).desc(nulls_first=True), F("id").desc()]
+    return [F(field).asc(nulls_last=True), F("id").asc()]
+
+
+class RowAfter(Func):
+    """
+    (field, id) > (value, pk), or < when descending: a row-value comparison
+    the database can use as the start of an index range scan, where the
+    equivalent OR of column comparisons makes it filter every earlier row
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, field, value, pk, descending):
+        self.operator = "<" if descending else ">"
+        super().__init__(F(field), F("id"), value, Value(pk))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sqls, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sqls.append(sql)
+            params.extend(expression_params)
+        return f"({sqls[0]}, {sqls[1]}) {self.operator} ({sqls[2]}, {sqls[3]})", params
+
+
+def _after(model, field, descending, value, pk):
+    """Rows strictly after (value, pk) in the ordering above"""
+    model_field = model._meta.get_field(field)
+    if value is not None:
+        after = RowAfter(field, Value(value, output_field=model_field), pk, descending)
+        if not model_field.null:
+            return after
+        after = Q(after)
+
+    # Nulls come first in descending order and last in ascending order
+    if descending:
+        if value is None:
+            return Q(**{f"{field}__isnull": True, "id__lt": pk}) | Q(
+                **{f"{field}__isnull": False}
+            )
+        return after
+
+    if value is None:
+        return Q(**{f"{field}__isnull": True, "id__gt": pk})
+    return after | Q(**{f"{field}__isnull": True})
+
+
+def _encode_cursor(value, pk):
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    raw = json.dumps([value, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, field):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        if field == "created_at" and value is not None:
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError
+        return value, int(pk)
+    except (ValueError, TypeError):
+        raise APIError("Invalid cursor")
+
+
+def _response(request, data, status=200):
+    response = JsonResponse(data, status=status)
+    if status == 200:
+        etag = f'"{hashlib.md5(response.content).hexdigest()}"'
+        response["ETag"] = etag
+        # Visibility depends on who is asking
+        patch_vary_headers(response, ["Cookie"])
+        response = get_conditional_response(request, etag=etag, response=response)
+    return response
+
+
+def _list(request, resource, queryset):
+    try:
+        fields = resource.parse_fields(request.GET.get("fields"), resource.list_fields)
+        order = request.GET.get("order", resource.default_order)
+        if order not in resource.orderings:
+            raise APIError(f"Unknown order: {order}")
+        sort_field, descending = resource.orderings[order]
+
+        try:
+            limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise APIError("Invalid limit")
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        cursor = request.GET.get("cursor")
+        if cursor:
+            queryset = queryset.filter(
+                _after(
+                    queryset.model,
+                    sort_field,
+                    descending,
+                    *_decode_cursor(cursor, sort_field),
+                )
+            )
+    except APIError as e:
+        return _response(request, {"success": False, "message": str(e)}, status=400)
+
+    queryset = resource.select(queryset, fields, extra_columns=[sort_field])
+    rows = list(queryset.order_by(*_ordering(sort_field, descending))[: limit + 1])
+
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    resource.prefetch_images(rows, fields)
+
+    next_cursor = None
+    next_url = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = _encode_cursor(getattr(last, sort_field), last.pk)
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        next_url = f"{request.path}?{params.urlencode()}"
+
+    return _response(
+        request,
+        {
+            "success": True,
+            "results": [resource.serialize(row, fields) for row in rows],
+            "next_cursor": next_cursor,
+            "next": next_url,
+        },
+    )
+
+
+def _detail(request, resource, queryset, pk):
+    try:
+        fields = resource.parse_fields(request.GET.get("fields"), list(resource.fields))
+    except APIError as e:
+        return _response(request, {"success": False, "message": str(e)}, status=400)
+
+    obj = resource.select(queryset, fields).filter(pk=pk).first()
+    if obj is None:
+        raise Http404("Not found")
+    resource.prefetch_images([obj], fields)
+    return _response(request, {"success": True, "result": resource.serialize(obj, fields)})
+
+
+def item_list(request):
+    return _list(request, ITEMS, _visible_items(request))
+
+
+def item_detail(request, item_id):
+    return _detail(request, ITEMS, _visible_items(request), item_id)
+
+
+def collection_list(request):
+    return _list(request, COLLECTIONS, _visible_collections(request))
+
+
+def collection_detail(request, collection_id):
+    return _detail(request, COLLECTIONS, _visible_collections(request), collection_id)
+
+
+def review_list(request):
+    reviews = _visible_reviews(request)
+    item_id = request.GET.get("item")
+    if item_id:
+        if not item_id.isdigit():
+            return _response(
+                request, {"success": False, "message": "Invalid item"}, status=400
+            )
+        reviews = reviews.filter(item_id=item_id)
+    return _list(request, REVIEWS, reviews)
+
+
+def review_detail(request, review_id):
+    return _detail(request, REVIEWS, _visible_reviews(request), review_id)
+
+
+def item_cursor(title, item_id):
+    """Cursor continuing the item list (ordered by title) after the given item"""
+    return _encode_cursor(title, item_id)
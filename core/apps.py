@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # register the search index receivers
+        from . import search  # noqa: F401
+
+        # and the cache version receivers
+        from . import caching  # noqa: F401
+
+        # and the deploy checks
+        from . import checks  # noqa: F401
@@ -0,0 +1,172 @@
+"""
+Tag-versioned caching of view data.
+
+Every tag has a version token in the cache, replaced by a new random one when
+something it covers changes. cached() keys a value by the tokens of the tags
+it was built from, so a change makes every dependent key unreachable at once
+and nothing has to be deleted. Such a key is never stale, which is what lets
+the in-process tier of the default cache (cache_backends.TieredCache) serve
+it without asking the shared one.
+
+Saving or deleting an instance of a model in TRACKED_MODELS bumps:
+
+    model_tag(Item)        "catalog.item", on any change to any item
+    object_tag(Item, 5)    "catalog.item:5", on changes to item 5 or to the
+                           reviews, loans and memberships that belong to it
+    set_tag(Item)          "catalog.item:set", when an item is added or removed
+
+Model tags are for values built from a whole table, object and set tags let
+core.page_cache purge only the pages that show what changed.
+
+Tokens are replaced rather than incremented so two processes bumping at the
+same time can't both land on the same value. A change replaces the token
+straight away (for reads in the same transaction) and, inside a transaction,
+once more after commit, so a process that rebuilt from the old rows in
+between doesn't keep them under the new token.
+"""
+
+import hashlib
+import random
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from catalog.models import Item, ItemReview
+from collection.models import Collection, CollectionItems
+from loans.models import Loan
+
+TIMEOUT = 60 * 10
+
+_missing = object()
+
+
+def model_tag(model):
+    return model._meta.label_lower
+
+
+def object_tag(model, pk):
+    return f"{model._meta.label_lower}:{pk}"
+
+
+def set_tag(model):
+    return f"{model._meta.label_lower}:set"
+
+
+# model -> the objects an instance belongs to, as [(model, pk), ...]
+TRACKED_MODELS = {
+    Item: lambda item: [(Item, item.pk)],
+    ItemReview: lambda review: [(Item, review.item_id)],
+    Loan: lambda loan: [(Item, loan.item_id)],
+    Collection: lambda collection: [(Collection, collection.pk)],
+    CollectionItems: lambda membership: [
+        (Item, membership.item_id),
+        (Collection, membership.collection_id),
+    ],
+}
+
+
+def _version_key(tag):
+    return f"version:{tag}"
+
+
+def _token():
+    return random.getrandbits(62)
+
+
+def versions(*tags):
+    """The current version tokens of the given tags, in one cache read"""
+    keys = [_version_key(tag) for tag in tags]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # First use, or evicted: a random start can't match an old key
+            cache.add(key, _token(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*tags):
+    """Invalidate everything cached under the given tags"""
+    cache.set_many({_version_key(tag): _token() for tag in tags}, None)
+
+
+class BumpQueue:
+    """
+    Tags to bump once the current transaction commits. Every change bumps
+    its tags right away too, the queue only makes sure each tag is bumped
+    once more after the commit, however many changes there were.
+    """
+
+    def __init__(self):
+        self.tags = set()
+
+    def __call__(self):
+        tags, self.tags = self.tags, set()
+        bump(*tags)
+
+    @classmethod
+    def add(cls, *tags):
+        bump(*tags)
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            return
+        queue = next(
+            (f for _, f, _ in connection.run_on_commit if isinstance(f, cls)), None
+        )
+        if queue is None:
+            queue = cls()
+            transaction.on_commit(queue)
+        queue.tags.update(tags)
+
+
+def changed_tags(sender, instance, added_or_removed):
+    """The tags a change to an instance of a tracked model invalidates"""
+    tags = {model_tag(sender)}
+    tags.update(
+        object_tag(model, pk)
+        for model, pk in TRACKED_MODELS[sender](instance)
+        if pk is not None
+    )
+    if added_or_removed:
+        tags.add(set_tag(sender))
+    return tags
+
+
+def _saved(sender, instance, created=False, **kwargs):
+    BumpQueue.add(*changed_tags(sender, instance, created))
+
+
+def _deleted(sender, instance, **kwargs):
+    BumpQueue.add(*changed_tags(sender, instance, True))
+
+
+for _model in TRACKED_MODELS:
+    post_save.connect(_saved, sender=_model, dispatch_uid="caching")
+    post_delete.connect(_deleted, sender=_model, dispatch_uid="caching")
+
+
+def cache_key(name, models, *parts):
+    """The key for a value built from the given models and arguments"""
+    tags = [model_tag(model) for model in models]
+    tokens = ".".join(str(token) for token in versions(*tags))
+    # Arguments are hashed so titles with spaces etc. make valid keys
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return f"view:{name}:{tokens}:{digest}"
+
+
+def cached(name, models, build, *parts, timeout=TIMEOUT):
+    """
+    Return build(), cached until any of `models` changes. `parts` are the
+    arguments the value depends on besides those models, e.g. a page number.
+    """
+    key = cache_key(name, models, *parts)
+    value = cache.get(key, _missing)
+    if value is _missing:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+def stats():
+    """Hit and miss counters of the default cache, if it keeps any"""
+    get_stats = getattr(cache, "stats", None)
+    return get_stats() if get_stats else {}
@@ -0,0 +1,47 @@
+"""
+System checks for settings the rest of core relies on.
+
+Several caches are invalidated with cache.delete or by bumping a version
+counter: collection authorization (collection.authorization), loan
+availability (loans.availability) and the in-process search index
+(core.search). Other processes only see those changes through a shared
+default cache. With a process-local one (see PROCESS_LOCAL_CACHES) they keep
+serving revoked access, stale availability or a stale index until the
+entries time out, which check_shared_cache warns about under --deploy.
+"""
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries only the process (or machine) that wrote them sees
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+)
+
+
+def _shared_backend(alias="default"):
+    """The backend that holds an alias's entries for every process"""
+    config = settings.CACHES.get(alias, {})
+    backend = config.get("BACKEND", "")
+    if backend == "cache_backends.TieredCache":
+        return _shared_backend(config.get("LOCATION"))
+    return backend
+
+
+@register("caches", deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = _shared_backend()
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            Warning(
+                f"The default cache ({backend}) is not shared between processes.",
+                hint=(
+                    "Revoked collection access, loan availability and search "
+                    "results stay stale in other processes until their cache "
+                    "timeouts. Use a shared backend, see CACHES in settings."
+                ),
+                id="core.W001",
+            )
+        ]
+    return []
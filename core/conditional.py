@@ -0,0 +1,200 @@
+"""
+Conditional GET for pages built from items and collections.
+
+conditional_page(watermark) asks a watermark function for the page's
+validators before the view runs. Watermarks come from one or two aggregate
+queries: the newest updated_at (and review and loan timestamps) of what the
+page shows, plus counts, so a deletion changes the ETag too. Memberships
+have no timestamp, so they are marked by their count, newest pk and the
+sums of their item and collection ids, which an add, a removal or a swap
+changes. Pages that offer items from all collections also mark the
+memberships of private collections, so making any collection private or
+public changes their ETag. A request whose If-None-Match or If-Modified-Since still matches gets a 304 without the view
+or its templates running, otherwise the response carries ETag and
+Last-Modified.
+
+The ETag also covers who is asking, since the navigation and forms on these
+pages differ per user. Requests with pending flash messages are always
+answered in full, so the messages get shown.
+"""
+
+import hashlib
+from datetime import timezone as dt_timezone
+from functools import wraps
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from catalog.models import Item, ItemReview
+from collection.models import Collection, CollectionItems
+from loans.models import Loan
+
+
+def _subquery(queryset, group, aggregate):
+    """A correlated scalar subquery of one aggregate over queryset"""
+    return Subquery(
+        queryset.order_by().values(group).annotate(value=aggregate).values("value")
+    )
+
+
+def _watermark(values, timestamps):
+    """(last modified, parts) from a row of aggregates"""
+    timestamps = [t for t in timestamps if t is not None]
+    return (max(timestamps) if timestamps else None), values
+
+
+def item_watermark(item_title):
+    """The item, its reviews, loans and collections"""
+    memberships = CollectionItems.objects.filter(item=OuterRef("pk"))
+    reviews = ItemReview.objects.filter(item=OuterRef("pk"))
+    loans = Loan.objects.filter(item=OuterRef("pk"))
+    row = (
+        Item.objects.filter(title=item_title)
+        .annotate(
+            last_review=_subquery(reviews, "item", Max("updated_at")),
+            loan_count=_subquery(loans, "item", Count("pk")),
+            last_loan=_subquery(loans, "item", Max("requested_at")),
+            collection_count=_subquery(memberships, "item", Count("pk")),
+            last_membership=_subquery(memberships, "item", Max("pk")),
+            collection_sum=_subquery(memberships, "item", Sum("collection_id")),
+            last_collection=_subquery(
+                memberships, "item", Max("collection__updated_at")
+            ),
+        )
+        .values_list(
+            "pk",
+            "updated_at",
+            "review_count",
+            "rating_sum",
+            "last_review",
+            "loan_count",
+            "last_loan",
+            "collection_count",
+            "last_membership",
+            "collection_sum",
+            "last_collection",
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    return _watermark(row, (row[1], row[4], row[6], row[10]))
+
+
+def _items_row():
+    # Every item and membership, for pages that pick from all of them.
+    # Memberships of private collections hide items from other pages, so
+    # they are marked apart, which also catches a visibility change
+    private = Q(collectionitems__collection__visibility=1)
+    row = Item.objects.aggregate(
+        items=Count("pk", distinct=True),
+        memberships=Count("collectionitems"),
+        last_membership=Max("collectionitems__pk"),
+        item_sum=Sum("collectionitems__item_id"),
+        collection_sum=Sum("collectionitems__collection_id"),
+        private_memberships=Count("collectionitems", filter=private),
+        private_item_sum=Sum("collectionitems__item_id", filter=private),
+        last_item=Max("updated_at"),
+    )
+    marks = (
+        row["items"],
+        row["memberships"],
+        row["last_membership"],
+        row["item_sum"],
+        row["collection_sum"],
+        row["private_memberships"],
+        row["private_item_sum"],
+    )
+    return marks, row["last_item"]
+
+
+def home_watermark():
+    """Items, memberships and collections, which decide the featured items"""
+    marks, last_item = _items_row()
+    collections = Collection.objects.aggregate(
+        count=Count("pk"), last=Max("updated_at")
+    )
+    return _watermark(
+        marks + (last_item, collections["count"], collections["last"]),
+        (last_item, collections["last"]),
+    )
+
+
+def collection_watermark(collection_id):
+    """The collection, its items, and the items that could be added to it"""
+    memberships = CollectionItems.objects.filter(collection=OuterRef("pk"))
+    row = (
+        Collection.objects.filter(pk=collection_id)
+        .annotate(
+            item_count=_subquery(memberships, "collection", Count("pk")),
+            last_membership=_subquery(memberships, "collection", Max("pk")),
+            item_sum=_subquery(memberships, "collection", Sum("item_id")),
+            last_item=_subquery(memberships, "collection", Max("item__updated_at")),
+        )
+        .values_list(
+            "pk", "updated_at", "item_count", "last_membership", "item_sum", "last_item"
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    marks, last_any_item = _items_row()
+    return _watermark(
+        row + marks + (last_any_item,),
+        (row[1], row[5], last_any_item),
+    )
+
+
+def _etag(request, parts):
+    user = request.user
+    # The role decides the librarian links in the navigation
+    user = (user.pk, user.role) if user.is_authenticated else None
+    digest = hashlib.md5(repr((user, parts)).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def _timestamp(dt):
+    if dt is None:
+        return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, dt_timezone.utc)
+    return int(dt.timestamp())
+
+
+def conditional_page(watermark):
+    """
+    Answer revalidations of a page with a 304 when watermark(*view args)
+    hasn't changed. A watermark of None (nothing found) runs the view.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or len(get_messages(request)):
+                return view(request, *args, **kwargs)
+
+            mark = watermark(*args, **kwargs)
+            if mark is None:
+                return view(request, *args, **kwargs)
+            last_modified, parts = mark
+            etag = _etag(request, parts)
+            last_modified = _timestamp(last_modified)
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                patch_vary_headers(response, ("Cookie",))
+                response["ETag"] = etag
+                if last_modified is not None:
+                    response["Last-Modified"] = http_date(last_modified)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,58 @@
+from django.contrib.staticfiles.management.commands import collectstatic
+from storage_backends import UPLOAD_WORKERS
+
+
+class Command(collectstatic.Command):
+    help = (
+        "Collect static files into blob storage incrementally: files whose "
+        "hash is already uploaded are skipped, the rest are uploaded in parallel"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--upload-workers",
+            type=int,
+            default=UPLOAD_WORKERS,
+            help="Number of files uploaded at the same time",
+        )
+
+    def set_options(self, **options):
+        super().set_options(**options)
+        self.upload_workers = options["upload_workers"]
+        self.pending = []
+        self.incremental = False
+
+    def copy_file(self, path, prefixed_path, source_storage):
+        if not self.incremental:
+            return super().copy_file(path, prefixed_path, source_storage)
+
+        # Queued and uploaded together once every finder has been walked
+        if prefixed_path in self.copied_files:
+            return self.log("Skipping '%s' (already copied earlier)" % path)
+        self.pending.append((prefixed_path, source_storage.path(path)))
+        self.copied_files.append(prefixed_path)
+
+    def collect(self):
+        # Without a blob storage this behaves exactly like collectstatic
+        self.incremental = hasattr(self.storage, "upload_many") and not self.symlink
+        collected = super().collect()
+        if not self.incremental:
+            return collected
+
+        names = [name for name, _ in self.pending]
+        if self.dry_run:
+            self.log("Pretending to upload %s files" % len(names), level=1)
+            return collected
+
+        uploaded, unchanged = self.storage.upload_many(
+            self.pending, workers=self.upload_workers
+        )
+        for name in uploaded:
+            self.log("Uploaded '%s'" % name, level=2)
+        manifested = self.storage.write_manifest(names)
+        self.log("Wrote %s URLs to the blob manifest" % manifested, level=1)
+
+        collected["modified"] = uploaded
+        collected["unmodified"] = unchanged
+        return collected
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.models import DestinationCard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the destination card read model for every item in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of cards written per INSERT statement",
+        )
+
+    def handle(self, *args, **options):
+        count = DestinationCard.rebuild_all(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} destination cards"))
@@ -0,0 +1,23 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Vercel Blob metadata index from the paginated blob listing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Also delete index rows for paths that are no longer in the store",
+        )
+
+    def handle(self, *args, **options):
+        sync_index = getattr(default_storage, "sync_index", None)
+        if sync_index is None:
+            raise CommandError("The default storage doesn't keep a blob index")
+
+        written, pruned = sync_index(prune=options["prune"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {written} blobs, pruned {pruned}")
+        )
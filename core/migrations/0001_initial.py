@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 23:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("catalog", "0008_alter_item_created_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DestinationCard",
+            fields=[
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="destination_card",
+                        serialize=False,
+                        to="catalog.item",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("description", models.TextField(blank=True)),
+                (
+                    "price",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                ("representative_image", models.CharField(blank=True, max_length=1024)),
+                ("region", models.CharField(default="asia", max_length=255)),
+                ("collection_ids", models.JSONField(blank=True, default=list)),
+                ("is_private", models.BooleanField(default=False)),
+            ],
+            options={
+                "db_table": "destination_card",
+                "indexes": [
+                    models.Index(
+                        fields=["is_private", "item"], name="destination_card_listing"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0010_keyset_indexes"),
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="destinationcard",
+            index=models.Index(
+                fields=["is_private", "name", "item"], name="destination_card_by_name"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_destination_card_by_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="destinationcard",
+            name="image_derivatives",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-17 23:42
+
+from django.db import migrations, models
+
+
+def import_json_cache(apps, schema_editor):
+    # Carry over the URLs VercelBlobStorage kept in .vercel_blob_cache.json
+    from storage_backends import load_json_cache
+
+    BlobURL = apps.get_model("core", "BlobURL")
+    BlobURL.objects.bulk_create(
+        [BlobURL(name=name, url=url) for name, url in load_json_cache().items()],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_destination_card_image_derivatives"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BlobURL",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=1024, unique=True)),
+                ("url", models.URLField(max_length=2048)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "blob_url",
+            },
+        ),
+        migrations.RunPython(import_json_cache, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_blob_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bloburl",
+            name="content_type",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="bloburl",
+            name="size",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="bloburl",
+            name="uploaded_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 23:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_blob_metadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bloburl",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -1,3 +1,212 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from catalog import derivatives
+from catalog.models import Item
+from collection.models import Collection, CollectionItems
 
-# Create your models here.
+DEFAULT_REGION = "asia"
+DEFAULT_DESTINATION_IMAGE = "images/default-destination.jpg"
+
+
+def resolve_image_url(item):
+    """Return the representative image URL for an item, or the default image"""
+    try:
+        if item.representative_image and hasattr(item.representative_image, "url"):
+            return item.representative_image.url
+    except Exception:
+        # In case of any errors with the image, use default
+        pass
+    return DEFAULT_DESTINATION_IMAGE
+
+
+# Denormalized "destination card" read model, one row per item.
+# Kept up to date by the signal receivers below so the destinations page can
+# render from a single indexed query instead of one query per item.
+class DestinationCard(models.Model):
+
+    # parameters
+    item = models.OneToOneField(
+        Item,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="destination_card",
+    )
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    representative_image = models.CharField(max_length=1024, blank=True)
+    # [[format, width, url], ...] of the representative image, for its srcset
+    image_derivatives = models.JSONField(default=list, blank=True)
+    region = models.CharField(max_length=255, default=DEFAULT_REGION)
+    collection_ids = models.JSONField(default=list, blank=True)
+    is_private = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_item(cls, item, collections, image_derivatives=()):
+        """Build an unsaved card for an item from the collections it belongs to"""
+        region_collection = next((c for c in collections if c.is_region), None)
+
+        return cls(
+            item=item,
+            name=item.title,
+            description=item.description or "",
+            price=item.price_per_night or 0,
+            representative_image=resolve_image_url(item),
+            image_derivatives=list(image_derivatives),
+            region=(
+                region_collection.title.lower() if region_collection else DEFAULT_REGION
+            ),
+            collection_ids=[c.id for c in collections],
+            is_private=any(c.visibility == 1 for c in collections),
+        )
+
+    @classmethod
+    def build_cards(cls, items):
+        """Build unsaved cards for the given items with a single membership query"""
+        items = list(items)
+        collections_by_item = {item.pk: [] for item in items}
+
+        memberships = (
+            CollectionItems.objects.filter(item_id__in=collections_by_item.keys())
+            .select_related("collection")
+            .order_by("id")
+        )
+        for ci in memberships:
+            collections_by_item[ci.item_id].append(ci.collection)
+
+        found = derivatives.lookup(item.representative_image.name for item in items)
+        return [
+            cls.from_item(
+                item,
+                collections_by_item[item.pk],
+                found.get(item.representative_image.name, ()),
+            )
+            for item in items
+        ]
+
+    @classmethod
+    def refresh_for_items(cls, item_ids):
+        """Recompute and upsert the cards for the given item ids"""
+        item_ids = set(item_ids)
+        if not item_ids:
+            return
+
+        cards = cls.build_cards(Item.objects.filter(id__in=item_ids))
+        cls.objects.bulk_create(
+            cards,
+            update_conflicts=True,
+            unique_fields=["item"],
+            update_fields=[
+                "name",
+                "description",
+                "price",
+                "representative_image",
+                "image_derivatives",
+                "region",
+                "collection_ids",
+                "is_private",
+            ],
+        )
+
+    @classmethod
+    def rebuild_all(cls, batch_size=500):
+        """Rebuild the whole table in bulk, returns the number of cards written"""
+        cards = cls.build_cards(Item.objects.all().order_by("id"))
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(cards, batch_size=batch_size)
+        return len(cards)
+
+    # table name
+    class Meta:
+        db_table = "destination_card"
+        indexes = [
+            models.Index(fields=["is_private", "item"], name="destination_card_listing"),
+            models.Index(
+                fields=["is_private", "name", "item"], name="destination_card_by_name"
+            ),
+        ]
+
+
+# Where storage_backends.VercelBlobStorage uploaded each path, and what it
+# stored there. The unique index serves the single-row upserts, the bulk
+# url() lookups and size()/exists().
+class BlobURL(models.Model):
+
+    # parameters
+    name = models.CharField(max_length=1024, unique=True)
+    url = models.URLField(max_length=2048)
+    # Null for rows imported from .vercel_blob_cache.json until the next sync
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    # sha256 of the content, lets collectstatic_blobs skip unchanged files
+    sha256 = models.CharField(max_length=64, blank=True)
+    uploaded_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    # table name
+    class Meta:
+        db_table = "blob_url"
+
+
+def _is_cascade_from(origin, model):
+    # origin is the instance or queryset that started a delete (Django >= 4.1)
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(post_save, sender=Item)
+def refresh_card_for_item(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    DestinationCard.refresh_for_items([instance.pk])
+
+
+@receiver(post_save, sender=Collection)
+def refresh_cards_for_collection(sender, instance, raw=False, **kwargs):
+    # Title, visibility or region changes affect every item in the collection
+    if raw:
+        return
+    DestinationCard.refresh_for_items(
+        instance.collectionitems_set.values_list("item_id", flat=True)
+    )
+
+
+@receiver(pre_delete, sender=Collection)
+def remember_collection_items(sender, instance, **kwargs):
+    # Memberships are gone by post_delete, so remember which cards to refresh
+    instance._destination_card_item_ids = list(
+        instance.collectionitems_set.values_list("item_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Collection)
+def refresh_cards_after_collection_delete(sender, instance, **kwargs):
+    DestinationCard.refresh_for_items(
+        getattr(instance, "_destination_card_item_ids", [])
+    )
+
+
+@receiver(post_save, sender=CollectionItems)
+def refresh_card_for_membership(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    DestinationCard.refresh_for_items([instance.item_id])
+
+
+@receiver(post_delete, sender=CollectionItems)
+def refresh_card_after_membership_delete(sender, instance, origin=None, **kwargs):
+    # Cascades from an Item delete drop the card itself, and cascades from a
+    # Collection delete are refreshed in one batch by its post_delete receiver
+    if _is_cascade_from(origin, Item) or _is_cascade_from(origin, Collection):
+        return
+    DestinationCard.refresh_for_items([instance.item_id])
@@ -0,0 +1,101 @@
+"""
+Full-page cache for anonymous visitors.
+
+Views wrapped in cache_anonymous_page answer GET and HEAD requests that carry
+no session or messages cookie from the default cache, keyed by host, path and
+query string. While rendering, the view names what its page shows with
+tag_page() (core.caching tags, e.g. one per item), and the page is stored
+with the version tokens those tags had. A hit whose tokens have moved on is
+a miss, so a change to one item only purges the pages tagged with it.
+
+Cacheable responses also get Cache-Control: public with an s-maxage for the
+Vercel edge, Vary: Cookie so a visitor with a session never gets them, and
+their tags in Surrogate-Key. Responses that set a cookie (a CSRF token, a
+session) or aren't a plain 200 are never cached.
+"""
+
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from .caching import versions
+
+PAGE_TIMEOUT = 60 * 10
+# What the edge may serve without asking, and serve stale while it revalidates
+EDGE_MAX_AGE = 60
+EDGE_STALE_WHILE_REVALIDATE = 300
+# Cookies that mean the page may be personal
+PRIVATE_COOKIES = (settings.SESSION_COOKIE_NAME, "messages")
+
+
+def is_anonymous_request(request):
+    return request.method in ("GET", "HEAD") and not any(
+        name in request.COOKIES for name in PRIVATE_COOKIES
+    )
+
+
+def tag_page(request, *tags):
+    """Record tags (see core.caching) for the page being rendered"""
+    page_tags = getattr(request, "_page_tags", None)
+    if page_tags is not None:
+        page_tags.update(tags)
+
+
+def _page_key(request):
+    digest = hashlib.sha1(
+        f"{request.get_host()}{request.get_full_path()}".encode()
+    ).hexdigest()
+    return f"page:{digest}"
+
+
+def _is_cacheable_response(request, response):
+    session = getattr(request, "session", None)
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header("Cache-Control")
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        and not (session is not None and session.modified)
+    )
+
+
+def _make_public(response, tags):
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=0,
+        s_maxage=EDGE_MAX_AGE,
+        stale_while_revalidate=EDGE_STALE_WHILE_REVALIDATE,
+    )
+    patch_vary_headers(response, ("Cookie",))
+    response["Surrogate-Key"] = " ".join(tags)
+
+
+def cache_anonymous_page(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_anonymous_request(request):
+            return view(request, *args, **kwargs)
+
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            tags, tokens, response = entry
+            if versions(*tags) == tokens:
+                response["X-Page-Cache"] = "HIT"
+                return response
+
+        request._page_tags = set()
+        response = view(request, *args, **kwargs)
+        if not _is_cacheable_response(request, response):
+            return response
+
+        tags = sorted(request._page_tags)
+        _make_public(response, tags)
+        cache.set(key, (tags, versions(*tags), response), PAGE_TIMEOUT)
+        response["X-Page-Cache"] = "MISS"
+        return response
+
+    return wrapper
@@ -0,0 +1,30 @@
+"""
+Query budgets: the most SQL queries each page may run, by URL name.
+
+core.tests.QueryBudgetTests renders every page listed here, with a cold
+cache, over a seeded dataset and again after the dataset has grown. A page
+fails if it runs more queries than its budget, or if its count grew with
+the data, which is what an N+1 (a query per row, e.g.
+collection.collectionitems_set.all inside a loop) looks like.
+
+Queries the shared cache tier makes on its own table don't count. A new
+page should get a budget here; raising one should come with a reason.
+"""
+
+QUERY_BUDGETS = {
+    "core:home": 4,
+    "core:destinations": 2,
+    "core:experiences": 6,
+    "core:librarian_dashboard": 11,
+    "accounts:user_profile": 10,
+    "collection:list": 5,
+    "collection:detail": 8,
+    "item_detail": 6,
+    # With VercelBlobStorage, checked by VercelBlobTransportTests
+    "core:api_item_list": 2,
+}
+
+
+def budget_for(url_name):
+    """The query budget of a URL name, or None if it has none"""
+    return QUERY_BUDGETS.get(url_name)
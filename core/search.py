@@ -0,0 +1,277 @@
+"""
+Destination search over Item.title, location and description.
+
+On PostgreSQL items are matched against a weighted SearchVector backed by the
+item_search_gin expression index and ordered by SearchRank. Other backends use
+an in-process inverted index that Item signals keep in sync and that is rebuilt
+when another process bumps the shared version counter in the cache. The
+cache must be shared, see core.checks.
+"""
+
+import math
+import random
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from catalog.models import Item
+from .models import DestinationCard
+
+# Same relative weights PostgreSQL's ts_rank gives to A, B and C labels
+FIELD_WEIGHTS = (("title", 1.0), ("location", 0.4), ("description", 0.2))
+SEARCH_CONFIG = "english"
+VERSION_KEY = "destination-search:version"
+
+# Prefix matching is limited so a one or two letter query can't expand to
+# most of the vocabulary
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_TERMS = 50
+
+# Matched ids are checked against the card filters this many at a time
+FILTER_BATCH_SIZE = 500
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def use_postgres():
+    return connection.vendor == "postgresql"
+
+
+def search_vector(prefix=""):
+    """Weighted vector over the item text fields, must match item_search_gin"""
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector(f"{prefix}title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(f"{prefix}location", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(f"{prefix}description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+class InvertedIndex:
+    """Term -> {item_id: weight} postings with AND queries and prefix matching"""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}  # item_id -> terms, so an item can be removed
+        self._vocabulary = None  # sorted terms, built lazily for prefix lookups
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, item_id, title="", location="", description=""):
+        self.remove(item_id)
+
+        weights = defaultdict(float)
+        for (field, weight), text in zip(FIELD_WEIGHTS, (title, location, description)):
+            for term in tokenize(text):
+                weights[term] += weight
+
+        for term, weight in weights.items():
+            self.postings[term][item_id] = weight
+        self.documents[item_id] = tuple(weights)
+        self._vocabulary = None
+
+    def remove(self, item_id):
+        terms = self.documents.pop(item_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(item_id, None)
+            if not postings:
+                del self.postings[term]
+        self._vocabulary = None
+
+    def _expand(self, prefix):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+
+        terms = []
+        i = bisect_left(vocabulary, prefix)
+        while (
+            i < len(vocabulary)
+            and vocabulary[i].startswith(prefix)
+            and len(terms) < MAX_PREFIX_TERMS
+        ):
+            terms.append(vocabulary[i])
+            i += 1
+        return terms
+
+    def search(self, query):
+        """Return {item_id: score} for the items matching every query term"""
+        terms = tokenize(query)
+        total = len(self.documents)
+        scores = None
+
+        for position, term in enumerate(terms):
+            # The last term also matches as a prefix, for search-as-you-type
+            is_last = position == len(terms) - 1
+            if is_last and len(term) >= MIN_PREFIX_LENGTH:
+                candidates = self._expand(term)
+            else:
+                candidates = [term]
+
+            term_scores = {}
+            for candidate in candidates:
+                postings = self.postings.get(candidate, {})
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for item_id, weight in postings.items():
+                    term_scores[item_id] = term_scores.get(item_id, 0) + weight * idf
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {i: s + term_scores[i] for i, s in scores.items() if i in term_scores}
+            if not scores:
+                return {}
+
+        return scores or {}
+
+
+# The index for this process, and the shared version it was built at
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Random start, so a cleared cache never matches a stale local index
+        cache.add(VERSION_KEY, random.randrange(1 << 30), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        return _current_version()
+
+
+def get_index():
+    """Return this process's inverted index, rebuilding it if it is stale"""
+    global _index, _index_version
+
+    version = _current_version()
+    with _index_lock:
+        if _index is None or _index_version != version:
+            index = InvertedIndex()
+            rows = Item.objects.values_list("id", "title", "location", "description")
+            for row in rows.iterator(chunk_size=2000):
+                index.add(*row)
+            _index, _index_version = index, version
+        return _index
+
+
+def _apply(change):
+    """Apply a change to the local index and tell other processes to rebuild"""
+    global _index_version
+
+    with _index_lock:
+        version = _bump_version()
+        # Only patch in place if nobody else changed the index in the meantime
+        if _index is not None and version == (_index_version or 0) + 1:
+            change(_index)
+            _index_version = version
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, raw=False, **kwargs):
+    if raw or use_postgres():
+        return
+    _apply(
+        lambda index: index.add(
+            instance.pk, instance.title, instance.location, instance.description
+        )
+    )
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance, **kwargs):
+    if use_postgres():
+        return
+    _apply(lambda index: index.remove(instance.pk))
+
+
+class SearchResults:
+    """Ranked destination cards, paginated without loading every match"""
+
+    def __init__(self, object_list, scores=None):
+        # Either a ranked queryset (PostgreSQL) or a ranked list of item ids
+        self.object_list = object_list
+        self.scores = scores
+
+    def page(self, number, per_page):
+        """Return the page and its [(card, score), ...] results"""
+        page = Paginator(self.object_list, per_page).get_page(number)
+
+        if self.scores is None:
+            results = [(card, getattr(card, "score", None)) for card in page.object_list]
+        else:
+            cards = DestinationCard.objects.in_bulk(list(page.object_list))
+            results = [
+                (cards[item_id], self.scores[item_id])
+                for item_id in page.object_list
+                if item_id in cards
+            ]
+        return page, results
+
+
+def search_destinations(
+    query="",
+    private=False,
+    region=None,
+    collection_id=None,
+    min_price=None,
+    max_price=None,
+):
+    """Search destination cards, best matches first"""
+    cards = DestinationCard.objects.filter(is_private=private)
+    if region:
+        cards = cards.filter(region=region.lower())
+    if collection_id:
+        cards = cards.filter(item__collectionitems__collection_id=collection_id)
+    if min_price is not None:
+        cards = cards.filter(price__gte=min_price)
+    if max_price is not None:
+        cards = cards.filter(price__lte=max_price)
+
+    if not tokenize(query):
+        return SearchResults(cards.order_by("name", "item_id"))
+
+    if use_postgres():
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        vector = search_vector(prefix="item__")
+        search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+        ranked = (
+            cards.annotate(search=vector, score=SearchRank(vector, search_query))
+            .filter(search=search_query)
+            .order_by("-score", "name", "item_id")
+        )
+        return SearchResults(ranked)
+
+    scores = get_index().search(query)
+    # Only the matches are looked up, not every card the filters allow
+    hits = sorted(scores, key=lambda i: (-scores[i], i))
+    allowed = set()
+    for start in range(0, len(hits), FILTER_BATCH_SIZE):
+        batch = hits[start : start + FILTER_BATCH_SIZE]
+        allowed.update(cards.filter(item_id__in=batch).values_list("item_id", flat=True))
+    ranked = [i for i in hits if i in allowed]
+    return SearchResults(ranked, scores)
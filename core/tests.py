@@ -1,12 +1,36 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from collection.models import Collection, CollectionItems
-from catalog.models import Item
+from collection.models import Collection, CollectionItems, CollectionAuthorizedUser
+from collection.authorization import get_authorized_collection_ids
+from catalog.models import Item, ItemReview
+from core.models import DestinationCard
+from core.search import InvertedIndex
+from core.query_budgets import budget_for
+from access_request.models import AccessRequest
+from loans.models import Loan
+from django.core.management import call_command
+from io import StringIO
+from datetime import timedelta
+from django.utils import timezone
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+
+
+def app_queries(context):
+    """Captured queries other than the shared cache tier's own"""
+    return [
+        query["sql"]
+        for query in context.captured_queries
+        if "hootel_cache" not in query["sql"] and "SAVEPOINT" not in query["sql"]
+    ]
 
 class SearchFunctionalityTests(TestCase):
     
     def setUp(self):
+        cache.clear()
         self.client = Client()
         User = get_user_model()
         
@@ -40,3 +64,1406 @@ class SearchFunctionalityTests(TestCase):
     
     def test_placeholder(self):
         self.assertTrue(True)
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get(reverse("core:search"), {"q": "view"})
+        names = [r["name"] for r in response.json()["results"]]
+        self.assertEqual(set(names), {"Beach House in Miami", "Luxury Apartment"})
+
+        response = self.client.get(reverse("core:search"), {"q": "cabin"})
+        results = response.json()["results"]
+        self.assertEqual(results[0]["name"], "Mountain Cabin")
+
+    def test_search_matches_location_and_prefix(self):
+        response = self.client.get(reverse("core:search"), {"q": "denv"})
+        names = [r["name"] for r in response.json()["results"]]
+        self.assertEqual(names, ["Mountain Cabin"])
+
+    def test_search_requires_every_term(self):
+        response = self.client.get(reverse("core:search"), {"q": "beach mountains"})
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_search_follows_item_changes(self):
+        self.item2.description = "Cozy chalet near the ski slopes"
+        self.item2.save()
+        response = self.client.get(reverse("core:search"), {"q": "chalet"})
+        self.assertEqual(response.json()["count"], 1)
+
+        self.item2.delete()
+        response = self.client.get(reverse("core:search"), {"q": "chalet"})
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_search_filters_and_pagination(self):
+        region = Collection.objects.create(
+            title="Americas", creator=self.librarian, is_region=True
+        )
+        CollectionItems.objects.create(collection=region, item=self.item1)
+        self.item3.price_per_night = 500
+        self.item3.save()
+
+        response = self.client.get(reverse("core:search"), {"region": "Americas"})
+        self.assertEqual([r["name"] for r in response.json()["results"]], ["Beach House in Miami"])
+
+        response = self.client.get(reverse("core:search"), {"collection": region.id, "q": "beach"})
+        self.assertEqual(response.json()["count"], 1)
+
+        response = self.client.get(reverse("core:search"), {"min_price": "100"})
+        self.assertEqual([r["name"] for r in response.json()["results"]], ["Luxury Apartment"])
+
+        response = self.client.get(reverse("core:search"), {"page_size": 2, "page": 2})
+        data = response.json()
+        self.assertEqual((data["count"], data["num_pages"], len(data["results"])), (3, 2, 1))
+
+        response = self.client.get(reverse("core:search"), {"min_price": "cheap"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_hides_private_items(self):
+        private = Collection.objects.create(
+            title="Private", creator=self.librarian, visibility=1
+        )
+        CollectionItems.objects.create(collection=private, item=self.item1)
+
+        response = self.client.get(reverse("core:search"), {"q": "beach"})
+        self.assertEqual(response.json()["count"], 0)
+
+        response = self.client.get(reverse("core:search"), {"q": "beach", "scope": "experiences"})
+        self.assertEqual(response.status_code, 403)
+
+        self.client.login(username="testlibrarian", password="testpassword")
+        response = self.client.get(reverse("core:search"), {"q": "beach", "scope": "experiences"})
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_search_only_looks_up_matching_cards(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.search import search_destinations
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = search_destinations("cabin")
+        self.assertEqual(results.object_list, [self.item2.pk])
+        sql = [q for q in app_queries(ctx) if "destination_card" in q]
+        self.assertEqual(len(sql), 1)
+        self.assertIn(f"IN ({self.item2.pk})", sql[0])
+
+    def test_inverted_index(self):
+        index = InvertedIndex()
+        index.add(1, "Beach House", "Miami", "Ocean view")
+        index.add(2, "Beach Cabin", "Maine", "")
+        index.add(3, "Mountain Lodge", "Denver", "Beach volleyball")
+
+        scores = index.search("beach")
+        self.assertEqual(set(scores), {1, 2, 3})
+        self.assertLess(scores[3], scores[1])
+
+        index.remove(2)
+        self.assertEqual(set(index.search("bea")), {1, 3})
+        self.assertEqual(set(index.search("beach oce")), {1})
+
+
+class DestinationCardTests(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        User = get_user_model()
+
+        self.librarian = User.objects.create_user(
+            username="testlibrarian",
+            email="librarian@example.com",
+            password="testpassword",
+            role=1
+        )
+
+        self.item = Item.objects.create(
+            title="Beach House in Miami",
+            status=0,
+            location="Miami, FL",
+            description="Beautiful beach house with ocean view",
+            price_per_night=250
+        )
+
+        self.region = Collection.objects.create(
+            title="Americas",
+            creator=self.librarian,
+            visibility=0,
+            is_region=True
+        )
+
+    def test_card_created_with_item(self):
+        card = DestinationCard.objects.get(item=self.item)
+        self.assertEqual(card.name, "Beach House in Miami")
+        self.assertEqual(card.price, 250)
+        self.assertEqual(card.region, "asia")
+        self.assertEqual(card.collection_ids, [])
+        self.assertFalse(card.is_private)
+
+    def test_card_follows_collection_membership(self):
+        CollectionItems.objects.create(collection=self.region, item=self.item)
+        card = DestinationCard.objects.get(item=self.item)
+        self.assertEqual(card.region, "americas")
+        self.assertEqual(card.collection_ids, [self.region.id])
+
+        self.region.title = "North America"
+        self.region.save()
+        self.assertEqual(DestinationCard.objects.get(item=self.item).region, "north america")
+
+        self.region.delete()
+        card = DestinationCard.objects.get(item=self.item)
+        self.assertEqual(card.region, "asia")
+        self.assertEqual(card.collection_ids, [])
+
+    def test_card_marks_private_items(self):
+        private = Collection.objects.create(
+            title="Private", creator=self.librarian, visibility=1
+        )
+        membership = CollectionItems.objects.create(collection=private, item=self.item)
+        self.assertTrue(DestinationCard.objects.get(item=self.item).is_private)
+
+        membership.delete()
+        self.assertFalse(DestinationCard.objects.get(item=self.item).is_private)
+
+    def test_card_deleted_with_item(self):
+        CollectionItems.objects.create(collection=self.region, item=self.item)
+        self.item.delete()
+        self.assertFalse(DestinationCard.objects.exists())
+
+    def test_rebuild_command(self):
+        DestinationCard.objects.all().delete()
+        call_command("rebuild_destination_cards", stdout=StringIO())
+        self.assertEqual(DestinationCard.objects.count(), Item.objects.count())
+
+    def test_destinations_query_count_is_constant(self):
+        for i in range(10):
+            item = Item.objects.create(title=f"Hotel {i}", status=0)
+            CollectionItems.objects.create(collection=self.region, item=item)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("core:destinations"))
+        self.assertEqual(len(app_queries(ctx)), 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["destinations"]), 11)
+
+        # Until a shown item, a collection or a membership changes the page
+        # is served whole, only the tag versions are read
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("core:destinations"))
+        self.assertEqual(response["X-Page-Cache"], "HIT")
+        self.assertContains(response, "Hotel 9")
+
+
+class ExperiencesAuthorizationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        User = get_user_model()
+
+        self.librarian = User.objects.create_user(
+            username="testlibrarian",
+            email="librarian@example.com",
+            password="testpassword",
+            role=1
+        )
+
+        self.patron = User.objects.create_user(
+            username="testpatron",
+            email="patron@example.com",
+            password="testpassword",
+            role=0
+        )
+
+        self.private = Collection.objects.create(
+            title="Private Collection",
+            creator=self.librarian,
+            visibility=1
+        )
+
+        self.item = Item.objects.create(title="Hidden Villa", status=0)
+        CollectionItems.objects.create(collection=self.private, item=self.item)
+
+    def test_authorized_ids_cached_and_invalidated(self):
+        self.assertEqual(get_authorized_collection_ids(self.patron), frozenset())
+
+        auth = CollectionAuthorizedUser.objects.create(
+            collection=self.private, user=self.patron
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            ids = get_authorized_collection_ids(self.patron)
+        self.assertEqual(len(app_queries(ctx)), 1)
+        self.assertEqual(ids, {self.private.id})
+        with self.assertNumQueries(0):
+            get_authorized_collection_ids(self.patron)
+
+        auth.delete()
+        self.assertEqual(get_authorized_collection_ids(self.patron), frozenset())
+
+    def test_revoke_collection_access_invalidates(self):
+        auth = CollectionAuthorizedUser.objects.create(
+            collection=self.private, user=self.patron
+        )
+        self.assertIn(self.private.id, get_authorized_collection_ids(self.patron))
+
+        self.client.login(username="testlibrarian", password="testpassword")
+        self.client.post(reverse("core:revoke_collection_access", args=[auth.id]))
+        self.assertNotIn(self.private.id, get_authorized_collection_ids(self.patron))
+
+    def test_experiences_query_count_is_constant(self):
+        self.client.login(username="testpatron", password="testpassword")
+        CollectionAuthorizedUser.objects.create(collection=self.private, user=self.patron)
+
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse("core:experiences"))
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries)
+
+        baseline = count_queries()
+
+        User = get_user_model()
+        for i in range(5):
+            collection = Collection.objects.create(
+                title=f"Private {i}", creator=self.librarian, visibility=1
+            )
+            item = Item.objects.create(title=f"Villa {i}", status=0)
+            CollectionItems.objects.create(collection=collection, item=item)
+            user = User.objects.create_user(username=f"guest{i}", password="testpassword")
+            CollectionAuthorizedUser.objects.create(collection=collection, user=user)
+
+        self.assertEqual(count_queries(), baseline)
+
+        response = self.client.get(reverse("core:experiences"))
+        destination = next(
+            d for d in response.context["destinations"] if d["name"] == "Hidden Villa"
+        )
+        self.assertTrue(destination["is_authorized_for_user"])
+
+
+class CatalogAPITests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        User = get_user_model()
+
+        self.librarian = User.objects.create_user(
+            username="testlibrarian",
+            email="librarian@example.com",
+            password="testpassword",
+            role=1
+        )
+
+        for i in range(7):
+            Item.objects.create(
+                title=f"Hotel {i:02d}",
+                status=0,
+                description="A long description",
+                created_at=timezone.now() - timedelta(days=i) if i % 3 else None,
+            )
+
+        self.private = Collection.objects.create(
+            title="Private", creator=self.librarian, visibility=1
+        )
+        self.hidden = Item.objects.create(title="Hidden Villa", status=0)
+        CollectionItems.objects.create(collection=self.private, item=self.hidden)
+
+    def _walk(self, url, params):
+        results = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            results.extend(data["results"])
+            url, params = data["next"], {}
+        return results
+
+    def test_items_ordered_by_rating(self):
+        patron = get_user_model().objects.create_user(
+            username="rater", email="rater@example.com", password="testpassword", role=0
+        )
+        for i, rating in [(1, 5), (2, 3), (4, 5), (5, 1)]:
+            ItemReview.objects.create(
+                rating=rating, comment="", creator=patron, item=Item.objects.get(title=f"Hotel {i:02d}")
+            )
+
+        results = self._walk(
+            reverse("core:api_item_list"),
+            {"limit": 2, "order": "-rating", "fields": "title,review_count,rating_average"},
+        )
+        self.assertEqual(
+            [r["title"] for r in results[:4]],
+            ["Hotel 04", "Hotel 01", "Hotel 02", "Hotel 05"],
+        )
+        self.assertEqual(results[0]["review_count"], 1)
+        self.assertEqual(results[0]["rating_average"], 5.0)
+        self.assertEqual(len(results), 7)
+
+    def test_items_keyset_pagination_by_title(self):
+        results = self._walk(reverse("core:api_item_list"), {"limit": 3})
+        self.assertEqual([r["title"] for r in results], [f"Hotel {i:02d}" for i in range(7)])
+        self.assertNotIn("description", results[0])
+
+    def test_items_keyset_pagination_by_created_at(self):
+        # Newest first with undated items leading, like PostgreSQL's DESC
+        items = Item.objects.exclude(id=self.hidden.id)
+        undated = sorted((i.id for i in items if i.created_at is None), reverse=True)
+        dated = [
+            i.id
+            for i in sorted(
+                (i for i in items if i.created_at is not None),
+                key=lambda i: (i.created_at, i.id),
+                reverse=True,
+            )
+        ]
+        expected = undated + dated
+        results = self._walk(
+            reverse("core:api_item_list"), {"limit": 2, "order": "-created_at", "fields": "id"}
+        )
+        self.assertEqual([r["id"] for r in results], expected)
+
+        results = self._walk(
+            reverse("core:api_item_list"), {"limit": 2, "order": "created_at", "fields": "id"}
+        )
+        self.assertEqual([r["id"] for r in results], expected[::-1])
+
+    def test_field_selection(self):
+        response = self.client.get(
+            reverse("core:api_item_list"), {"fields": "title,description,region"}
+        )
+        result = response.json()["results"][0]
+        self.assertEqual(set(result), {"title", "description", "region"})
+        self.assertEqual(result["region"], "asia")
+
+        response = self.client.get(reverse("core:api_item_list"), {"fields": "secret"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_cost_is_flat(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("core:api_item_list"), {"limit": 2})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(response.json()["next"])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        # One row-value bound, which an index on (title, id) can seek to
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertIn('("item"."title", "item"."id") >', sql)
+        self.assertNotIn(" OR ", sql)
+
+    def test_etag(self):
+        response = self.client.get(reverse("core:api_collection_list"))
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.client.get(reverse("core:api_collection_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_private_items_and_collections_hidden(self):
+        titles = [r["title"] for r in self._walk(reverse("core:api_item_list"), {})]
+        self.assertNotIn("Hidden Villa", titles)
+        self.assertEqual(self._walk(reverse("core:api_collection_list"), {}), [])
+
+        response = self.client.get(reverse("core:api_item_detail", args=[self.hidden.id]))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.login(username="testlibrarian", password="testpassword")
+        collections = self._walk(reverse("core:api_collection_list"), {})
+        self.assertEqual([c["title"] for c in collections], ["Private"])
+        titles = [r["title"] for r in self._walk(reverse("core:api_item_list"), {})]
+        self.assertIn("Hidden Villa", titles)
+        response = self.client.get(reverse("core:api_item_detail", args=[self.hidden.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_reviews_for_item(self):
+        item = Item.objects.get(title="Hotel 00")
+        for rating in (3, 5):
+            ItemReview.objects.create(
+                item=item, creator=self.librarian, rating=rating, comment="Nice"
+            )
+        ItemReview.objects.create(
+            item=self.hidden, creator=self.librarian, rating=1, comment="Hidden"
+        )
+
+        results = self._walk(reverse("core:api_review_list"), {"limit": 1})
+        self.assertEqual([r["rating"] for r in results], [5, 3])
+
+        response = self.client.get(reverse("core:api_review_list"), {"item": self.hidden.id})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_destinations_page_links_next_page(self):
+        for i in range(30):
+            Item.objects.create(title=f"Resort {i:02d}", status=0)
+
+        response = self.client.get(reverse("core:destinations"))
+        self.assertEqual(len(response.context["destinations"]), 24)
+
+        rendered = [d.name for d in response.context["destinations"]]
+        results = self._walk(response.context["next_url"], {})
+        self.assertEqual(len(rendered) + len(results), 37)
+        self.assertNotIn(results[0]["title"], rendered)
+
+
+class VercelBlobTransportTests(TestCase):
+
+    def setUp(self):
+        import os
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+        import storage_backends
+
+        self.mock = mock
+        self.backend = storage_backends
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = override_settings(
+            BASE_DIR=cache_dir.name, VERCEL_BLOB_API_URL="https://blob.test"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        env = mock.patch.dict(os.environ, {"VERCEL_BLOB_READ_WRITE_TOKEN": "token"})
+        env.start()
+        self.addCleanup(env.stop)
+
+        sleep = mock.patch("storage_backends.time.sleep")
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+        storage_backends.reset_blob_stats()
+        self.storage = storage_backends.VercelBlobStorage()
+
+    def _response(self, status, body=None, headers=None):
+        response = self.mock.Mock(status_code=status, headers=headers or {})
+        response.json.return_value = body or {}
+        response.text = str(body)
+        return response
+
+    def test_operations_share_one_pooled_session(self):
+        self.assertIs(self.backend.get_session(), self.backend.get_session())
+        adapter = self.backend.get_session().get_adapter("https://blob.test")
+        self.assertEqual(adapter._pool_maxsize, self.backend.POOL_SIZE)
+
+    def test_server_errors_and_rate_limits_are_retried(self):
+        from django.core.files.base import ContentFile
+
+        stored = {"url": "https://blob.test/a.txt", "pathname": "a.txt"}
+        responses = [
+            self._response(503),
+            self._response(429, headers={"Retry-After": "2"}),
+            self._response(200, stored),
+        ]
+        with self.mock.patch.object(
+            self.backend.get_session(), "request", side_effect=responses
+        ) as request:
+            self.assertEqual(self.storage.save("a.txt", ContentFile(b"hi")), "a.txt")
+
+        self.assertEqual(request.call_count, 3)
+        method, url = request.call_args.args
+        self.assertEqual((method, url), ("PUT", "https://blob.test/a.txt"))
+        self.assertEqual(request.call_args.kwargs["timeout"], self.backend.DEFAULT_TIMEOUTS["upload"])
+        self.assertEqual(request.call_args.kwargs["headers"]["Authorization"], "Bearer token")
+        # Backoff grows, and Retry-After is honoured
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(self.sleep.call_args_list[1].args, (2,))
+
+        stats = self.backend.blob_stats()
+        self.assertEqual(
+            (stats["upload.requests"], stats["upload.retries"], stats["upload.errors"]),
+            (3, 2, 2),
+        )
+
+    def test_client_errors_and_exhausted_retries_fail(self):
+        import requests
+
+        with self.mock.patch.object(
+            self.backend.get_session(), "request", return_value=self._response(404)
+        ) as request:
+            from core.models import BlobURL
+
+            BlobURL.objects.create(name="missing.txt", url="https://blob.test/missing.txt", size=10)
+            with self.assertRaises(FileNotFoundError), self.storage.open("missing.txt") as f:
+                f.read()
+        self.assertEqual(request.call_count, 1)
+
+        with self.mock.patch.object(
+            self.backend.get_session(), "request", side_effect=requests.ConnectionError
+        ) as request:
+            with self.assertRaises(requests.ConnectionError):
+                self.storage.sync_index()
+        self.assertEqual(request.call_count, self.backend.MAX_RETRIES + 1)
+        self.assertEqual(self.backend.blob_stats()["list.errors"], self.backend.MAX_RETRIES + 1)
+
+    def test_urls_are_stored_in_the_table_and_shared(self):
+        from core.models import BlobURL
+        from django.core.files.base import ContentFile
+
+        stored = {"url": "https://blob.test/x/a_b.txt", "pathname": "x/a_b.txt"}
+        with self.mock.patch.object(
+            self.backend.get_session(), "request", return_value=self._response(200, stored)
+        ):
+            self.storage.save("x/a b.txt", ContentFile(b"one"))
+            # Saving the path again updates the row in place
+            self.storage.save("x/a b.txt", ContentFile(b"two"))
+        self.assertEqual(BlobURL.objects.get(url=stored["url"]).name, "x/a_b.txt")
+
+        # A fresh instance (another process) reads it from the table
+        other = self.backend.VercelBlobStorage()
+        self.assertTrue(other.exists("x/a b.txt"))
+        self.assertEqual(other.url("x/a b.txt"), stored["url"])
+
+        with self.mock.patch.object(
+            self.backend.get_session(), "request", return_value=self._response(200)
+        ):
+            other.delete("x/a b.txt")
+        self.assertFalse(BlobURL.objects.filter(url=stored["url"]).exists())
+        self.assertFalse(self.storage.exists("x/a b.txt"))
+
+    def test_prefetch_urls_loads_a_page_in_one_query(self):
+        from core.models import BlobURL
+
+        BlobURL.objects.bulk_create(
+            [BlobURL(name=f"img/{i}.jpg", url=f"https://blob.test/img/{i}.jpg") for i in range(5)]
+        )
+        names = [f"img/{i}.jpg" for i in range(5)]
+        with self.assertNumQueries(1):
+            self.storage.prefetch_urls(names)
+            urls = [self.storage.url(name) for name in names]
+        self.assertEqual(urls[3], "https://blob.test/img/3.jpg")
+
+    def test_old_json_cache_is_imported_with_clean_names(self):
+        import json
+        from django.conf import settings
+
+        with open(f"{settings.BASE_DIR}/.vercel_blob_cache.json", "w") as f:
+            json.dump(
+                {"items/My Hotel/a.jpg": "https://blob.test/1", "items/My_Hotel/a.jpg": "https://blob.test/1"},
+                f,
+            )
+        self.assertEqual(
+            self.backend.load_json_cache(), {"items/My_Hotel/a.jpg": "https://blob.test/1"}
+        )
+
+    def test_size_and_exists_come_from_the_index(self):
+        from core.models import BlobURL
+
+        BlobURL.objects.create(name="img/known.jpg", url="https://blob.test/k.jpg", size=1234)
+        BlobURL.objects.create(name="img/legacy.jpg", url="https://blob.test/l.jpg")
+
+        with self.mock.patch.object(self.backend.get_session(), "request") as request:
+            self.assertEqual(self.storage.size("img/known.jpg"), 1234)
+            self.assertTrue(self.storage.exists("img/known.jpg"))
+            self.assertFalse(self.storage.exists("img/missing.jpg"))
+            with self.assertRaises(FileNotFoundError):
+                self.storage.size("img/missing.jpg")
+        request.assert_not_called()
+
+        # Imported rows without a size ask the blob once
+        head = self._response(200, headers={"Content-Length": "99"})
+        with self.mock.patch.object(
+            self.backend.get_session(), "request", return_value=head
+        ) as request:
+            self.assertEqual(self.storage.size("img/legacy.jpg"), 99)
+            self.assertEqual(self.storage.size("img/legacy.jpg"), 99)
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(request.call_args.args, ("HEAD", "https://blob.test/l.jpg"))
+
+    def test_sync_follows_the_listing_cursor(self):
+        from core.models import BlobURL
+
+        BlobURL.objects.all().delete()
+        BlobURL.objects.create(name="gone.jpg", url="https://blob.test/gone.jpg")
+        pages = [
+            self._response(200, {
+                "blobs": [{"pathname": "a.jpg", "url": "https://blob.test/a.jpg", "size": 1,
+                           "uploadedAt": "2026-01-02T03:04:05.000Z"}],
+                "cursor": "next", "hasMore": True,
+            }),
+            self._response(200, {
+                "blobs": [{"pathname": "b.css", "url": "https://blob.test/b.css", "size": 2}],
+                "hasMore": False,
+            }),
+        ]
+        with self.mock.patch.object(
+            self.backend.get_session(), "request", side_effect=pages
+        ) as request:
+            self.assertEqual(self.storage.sync_index(prune=True), (2, 1))
+
+        self.assertEqual(request.call_args.kwargs["params"], {"limit": 1000, "cursor": "next"})
+        self.assertEqual(
+            sorted(BlobURL.objects.values_list("name", "size", "content_type")),
+            [("a.jpg", 1, "image/jpeg"), ("b.css", 2, "text/css")],
+        )
+        self.assertEqual(BlobURL.objects.get(name="a.jpg").uploaded_at.year, 2026)
+
+    def test_sync_command_needs_an_indexed_storage(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaises(CommandError):
+            call_command("sync_blob_index", stdout=StringIO())
+
+    def _fake_put(self, method, url, **kwargs):
+        for _ in kwargs.get("data") or ():
+            pass  # send the streamed body
+        pathname = url.split("/", 3)[3]
+        return self._response(200, {"url": f"https://blob.test/{pathname}", "pathname": pathname})
+
+    def test_collectstatic_blobs_only_uploads_changed_files(self):
+        import os
+        import tempfile
+        from django.test import override_settings
+
+        static_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(static_dir.cleanup)
+        for name, data in (("a.css", b"a"), ("b.js", b"b"), ("img/c.svg", b"c")):
+            os.makedirs(os.path.dirname(os.path.join(static_dir.name, name)), exist_ok=True)
+            with open(os.path.join(static_dir.name, name), "wb") as f:
+                f.write(data)
+
+        storages = {
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "storage_backends.VercelBlobStorage"},
+        }
+        manifest_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(manifest_dir.cleanup)
+        manifest = os.path.join(manifest_dir.name, "blob-manifest.json")
+        with override_settings(
+            STORAGES=storages,
+            STATICFILES_DIRS=[static_dir.name],
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            VERCEL_BLOB_MANIFEST=manifest,
+        ), self.mock.patch.object(
+            self.backend.get_session(), "request", side_effect=self._fake_put
+        ) as request:
+            out = StringIO()
+            call_command("collectstatic_blobs", interactive=False, verbosity=1, stdout=out)
+            self.assertIn("3 static files copied", out.getvalue())
+            self.assertEqual(request.call_count, 3)
+
+            # Nothing changed, nothing is uploaded
+            call_command("collectstatic_blobs", interactive=False, verbosity=1, stdout=out)
+            self.assertEqual(request.call_count, 3)
+
+            with open(os.path.join(static_dir.name, "b.js"), "wb") as f:
+                f.write(b"changed")
+            out = StringIO()
+            call_command("collectstatic_blobs", interactive=False, verbosity=1, stdout=out)
+            self.assertIn("1 static file copied, 2 unmodified", out.getvalue())
+            self.assertEqual(request.call_args.args, ("PUT", "https://blob.test/b.js"))
+
+            # The new hash was stored, so the changed file isn't uploaded again
+            call_command("collectstatic_blobs", interactive=False, verbosity=1, stdout=out)
+            self.assertEqual(request.call_count, 4)
+
+            # Rows from before hashes were kept get theirs on the next upload
+            from core.models import BlobURL
+
+            BlobURL.objects.filter(name="a.css").update(sha256="")
+            call_command("collectstatic_blobs", interactive=False, verbosity=1, stdout=out)
+            self.assertEqual(request.call_count, 5)
+            self.assertNotEqual(BlobURL.objects.get(name="a.css").sha256, "")
+            call_command("collectstatic_blobs", interactive=False, verbosity=1, stdout=out)
+            self.assertEqual(request.call_count, 5)
+
+            # A new process resolves static URLs from the manifest alone
+            storage = self.backend.VercelBlobStorage()
+            with self.assertNumQueries(0):
+                self.assertEqual(storage.url("img/c.svg"), "https://blob.test/img/c.svg")
+
+    def test_manifest_is_not_written_to_static_root(self):
+        from pathlib import Path
+        from django.conf import settings
+
+        path = self.backend._manifest_path()
+        # Shipped with the function, not served with the static files
+        self.assertEqual(path.parent, Path(self.backend.__file__).resolve().parent)
+        self.assertNotIn(Path(settings.STATIC_ROOT).resolve(), path.parents)
+
+    def test_api_page_looks_up_image_urls_in_one_query(self):
+        from django.core.files.storage import default_storage
+        from django.test import override_settings
+        from core.models import BlobURL
+
+        def add_items(first, count):
+            for i in range(first, first + count):
+                name = f"blobs/{i:02x}/{i:064x}.jpg"
+                BlobURL.objects.create(name=name, url=f"https://blob.test/{i}.jpg")
+                Item.objects.create(
+                    title=f"Blob Villa {i:02d}", status=0, representative_image=name
+                )
+
+        storages = {
+            "default": {"BACKEND": "storage_backends.VercelBlobStorage"},
+            "staticfiles": {
+                "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+            },
+        }
+        url = reverse("core:api_item_list")
+        params = {"fields": "title,representative_image", "limit": 30}
+        counts = []
+        with override_settings(STORAGES=storages):
+            for first, count in ((0, 5), (5, 20)):
+                add_items(first, count)
+                # Cold URL memo, as in a new process
+                default_storage._path_to_url.clear()
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url, params)
+                results = response.json()["results"]
+                self.assertTrue(all(r["representative_image"] for r in results))
+                counts.append(len(app_queries(ctx)))
+        # The items, then every URL of the page at once
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[0], budget_for("core:api_item_list"))
+
+
+class VercelBlobStreamingTests(TestCase):
+
+    def setUp(self):
+        import os
+        from unittest import mock
+        from django.test import override_settings
+        from fake_blob_server import FakeBlobServer
+        import storage_backends
+
+        self.server = FakeBlobServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(
+            VERCEL_BLOB_API_URL=self.server.url,
+            VERCEL_BLOB_MULTIPART_THRESHOLD=1024 * 1024,
+            VERCEL_BLOB_MULTIPART_PART_SIZE=256 * 1024,
+            VERCEL_BLOB_CACHE_MAX_BYTES=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        env = mock.patch.dict(os.environ, {"VERCEL_BLOB_READ_WRITE_TOKEN": "token"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.storage = storage_backends.VercelBlobStorage()
+
+    def _file(self, size):
+        import os
+        import tempfile
+        from django.core.files import File
+
+        data = os.urandom(size)
+        f = tempfile.TemporaryFile()
+        f.write(data)
+        f.seek(0)
+        self.addCleanup(f.close)
+
+        # Record how much is read at once
+        reads = []
+        read = f.read
+        f.read = lambda n=-1: reads.append(n) or read(n)
+        return data, File(f, name="upload.bin"), reads
+
+    def test_small_uploads_are_streamed_in_one_put(self):
+        import hashlib
+        from core.models import BlobURL
+
+        data, upload, reads = self._file(600 * 1024)
+        name = self.storage.save("media/small.bin", upload)
+
+        self.assertEqual(self.server.blobs[name], data)
+        self.assertEqual([method for method, _, _ in self.server.log], ["PUT"])
+        self.assertEqual(self.server.log[0][2]["Content-Length"], str(len(data)))
+        self.assertTrue(reads and all(0 < n <= 256 * 1024 for n in reads))
+        row = BlobURL.objects.get(name=name)
+        self.assertEqual((row.size, row.sha256), (len(data), hashlib.sha256(data).hexdigest()))
+
+    def test_large_uploads_use_multipart_one_part_at_a_time(self):
+        data, upload, reads = self._file(3 * 1024 * 1024 + 5)
+        name = self.storage.save("media/large.bin", upload)
+
+        self.assertEqual(self.server.blobs[name], data)
+        actions = [headers.get("x-mpu-action") for _, _, headers in self.server.log]
+        self.assertEqual(actions, ["create"] + ["upload"] * 13 + ["complete"])
+        self.assertTrue(all(0 < n <= 256 * 1024 for n in reads))
+
+    def test_open_reads_lazily_by_range(self):
+        data, upload, _ = self._file(2 * 1024 * 1024)
+        name = self.storage.save("media/read.bin", upload)
+        self.server.log.clear()
+
+        with self.storage.open(name) as f:
+            self.assertEqual(f.size, len(data))
+            self.assertEqual(self.server.log, [])
+
+            # Sequential reads share one streamed request
+            self.assertEqual(f.read(10), data[:10])
+            self.assertEqual(f.read(100_000), data[10:100_010])
+            f.seek(1_500_000)
+            self.assertEqual(f.read(16), data[1_500_000:1_500_016])
+            f.seek(0)
+            self.assertEqual(f.read(), data)
+
+        self.assertEqual(
+            [headers["Range"] for _, _, headers in self.server.log],
+            ["bytes=0-", "bytes=1500000-", "bytes=0-"],
+        )
+
+    def test_open_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            self.storage.open("media/nothing.bin")
+        self.assertEqual(self.server.log, [])
+
+    def test_delete_many_sends_urls_in_batches(self):
+        from core.models import BlobURL
+        from django.core.files.base import ContentFile
+
+        names = [self.storage.save(f"media/{i}.txt", ContentFile(b"x")) for i in range(5)]
+        self.server.log.clear()
+
+        self.storage.delete_many(names + ["media/unknown.txt"], batch_size=2)
+        self.assertEqual(
+            [(method, path) for method, path, _ in self.server.log], [("DELETE", "/delete")] * 3
+        )
+        self.assertEqual(self.server.blobs, {})
+        self.assertFalse(BlobURL.objects.filter(name__in=names).exists())
+
+    def test_fake_server_injects_errors_and_pages_listings(self):
+        from unittest import mock
+        from django.core.files.base import ContentFile
+
+        names = [self.storage.save(f"media/{i}.txt", ContentFile(b"x")) for i in range(5)]
+        self.assertEqual(
+            sorted(blob["pathname"] for blob in self.storage.listing(limit=2)), sorted(names)
+        )
+        self.assertEqual(sum(1 for _, path, _ in self.server.log if path == "/list"), 3)
+
+        self.server.fail(503, times=2, method="PUT")
+        with mock.patch("storage_backends.time.sleep") as sleep:
+            self.storage.save("media/retried.txt", ContentFile(b"y"))
+            self.assertEqual(sleep.call_count, 2)
+
+            self.server.error_rate = 1
+            with self.assertRaises(Exception):
+                self.storage.save("media/failed.txt", ContentFile(b"z"))
+        self.assertIn("media/retried.txt", self.server.blobs)
+        self.assertNotIn("media/failed.txt", self.server.blobs)
+
+
+class BlobDiskCacheTests(TestCase):
+
+    def setUp(self):
+        import os
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+        from fake_blob_server import FakeBlobServer
+        import storage_backends
+
+        self.server = FakeBlobServer().start()
+        self.addCleanup(self.server.stop)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        settings_override = override_settings(
+            VERCEL_BLOB_API_URL=self.server.url,
+            VERCEL_BLOB_CACHE_DIR=self.cache_dir.name,
+            VERCEL_BLOB_CACHE_MAX_BYTES=3500,
+            VERCEL_BLOB_CACHE_MAX_ENTRY_BYTES=1500,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        env = mock.patch.dict(os.environ, {"VERCEL_BLOB_READ_WRITE_TOKEN": "token"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.backend = storage_backends
+        self.storage = storage_backends.VercelBlobStorage()
+
+    def _save(self, name, data):
+        from django.core.files.base import ContentFile
+
+        return self.storage.save(name, ContentFile(data))
+
+    def _read(self, name):
+        with self.storage.open(name) as f:
+            return f.read()
+
+    def _cached_files(self):
+        import os
+
+        return sorted(
+            name for _, _, files in os.walk(self.cache_dir.name) for name in files
+        )
+
+    def test_repeated_reads_come_from_disk(self):
+        name = self._save("media/a.bin", b"a" * 1000)
+        self.server.log.clear()
+        self.backend.reset_blob_stats()
+
+        self.assertEqual(self._read(name), b"a" * 1000)
+        self.assertEqual(self._read(name), b"a" * 1000)
+
+        etags = [headers.get("If-None-Match") for _, _, headers in self.server.log]
+        self.assertIsNone(etags[0])
+        self.assertIsNotNone(etags[1])
+        stats = self.backend.blob_stats()
+        self.assertEqual((stats["cache.hits"], stats["cache.misses"]), (1, 1))
+        self.assertEqual(len(self._cached_files()), 1)
+
+    def test_bodies_without_length_stop_caching_past_the_limit(self):
+        from blob_cache import BlobDiskCache
+
+        class Response:
+            status_code = 200
+            headers = {"ETag": '"big"'}  # no Content-Length, e.g. chunked
+
+            def iter_content(self, size):
+                return iter([b"x" * 1000] * 3)
+
+            def close(self):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.close()
+
+        cache = BlobDiskCache(self.cache_dir.name, 3500, 1500)
+        f, hit = cache.open("https://blob.test/big.bin", lambda headers: Response())
+        with f:
+            self.assertEqual(f.read(), b"x" * 3000)
+        self.assertFalse(hit)
+        self.assertEqual(self._cached_files(), [])
+
+    def test_changed_blob_replaces_cached_copy(self):
+        name = self._save("media/a.bin", b"old" * 100)
+        self._read(name)
+        self.server.blobs[name] = b"new" * 100
+
+        self.assertEqual(self._read(name), b"new" * 100)
+        self.assertEqual(len(self._cached_files()), 1)
+
+    def test_least_recently_used_are_evicted(self):
+        import os
+
+        names = [self._save(f"media/{c}.bin", c.encode() * 1000) for c in "abcd"]
+        for name in names[:3]:
+            self._read(name)
+        # a, b, c cached in that order, then a is used again
+        cache = self.storage.cache
+        for i, name in enumerate(names[:3]):
+            path, _ = cache._entry(*cache._location(self.storage.url(name)))
+            os.utime(path, (100 + i, 100 + i))
+        self._read(names[0])
+        self._read(names[3])
+
+        cached = {
+            name
+            for name in names
+            if cache._entry(*cache._location(self.storage.url(name)))[0]
+        }
+        self.assertEqual(cached, {names[0], names[2], names[3]})
+
+    def test_large_files_bypass_the_cache(self):
+        name = self._save("media/big.bin", b"x" * 2000)
+        self.assertEqual(self._read(name), b"x" * 2000)
+        self.assertEqual(self._cached_files(), [])
+
+
+class TieredCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache.reset_stats()
+
+    def test_reads_fall_through_the_tiers(self):
+        from django.core.cache import caches
+
+        cache.set("tiered:value", {"a": 1})
+        self.assertEqual(cache.get("tiered:value"), {"a": 1})
+        self.assertEqual(cache.get("tiered:missing"), None)
+
+        # Another process's tier: only the shared copy is there
+        cache.clear_local()
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.get("tiered:value"), {"a": 1})
+        with self.assertNumQueries(0):
+            value = cache.get("tiered:value")
+        value["a"] = 2  # callers get copies
+        self.assertEqual(cache.get("tiered:value"), {"a": 1})
+
+        # Counters are always read from the shared tier
+        cache.set("tiered:counter", 1)
+        caches["shared"].incr("tiered:counter")
+        self.assertEqual(cache.get("tiered:counter"), 2)
+
+        stats = cache.stats()
+        self.assertEqual(
+            (stats["local_hits"], stats["shared_hits"], stats["misses"]), (3, 2, 1)
+        )
+
+    def test_cached_values_follow_model_versions(self):
+        from core import caching
+        from loans.models import Loan
+
+        builds = []
+
+        def build():
+            builds.append(1)
+            return Item.objects.count()
+
+        def lookup():
+            return caching.cached("test-count", (Item, Loan), build)
+
+        self.assertEqual(lookup(), 0)
+        self.assertEqual(lookup(), 0)
+        self.assertEqual(len(builds), 1)
+
+        item = Item.objects.create(title="Versioned", status=0)
+        self.assertEqual(lookup(), 1)
+        self.assertEqual(len(builds), 2)
+
+        User = get_user_model()
+        user = User.objects.create_user(username="versioned", password="x")
+        Loan.objects.create(item=item, requester=user)
+        lookup()
+        self.assertEqual(len(builds), 3)
+
+        # Unrelated models don't invalidate it
+        Collection.objects.create(title="Elsewhere", creator=user)
+        lookup()
+        self.assertEqual(len(builds), 3)
+
+        item.delete()
+        self.assertEqual(lookup(), 0)
+
+    def test_item_detail_is_cached_until_a_review(self):
+        User = get_user_model()
+        user = User.objects.create_user(username="reviewer", password="x")
+        item = Item.objects.create(title="Cached Villa", status=0)
+        url = reverse("item_detail", kwargs={"item_title": item.title})
+
+        self.assertEqual(self.client.get(url).context["reviews"], [])
+        ItemReview.objects.create(item=item, creator=user, rating=5, comment="Great")
+        reviews = self.client.get(url).context["reviews"]
+        self.assertEqual([r.comment for r in reviews], ["Great"])
+
+    def test_stats_view_is_for_librarians(self):
+        User = get_user_model()
+        User.objects.create_user(username="statslibrarian", password="x", role=1)
+        User.objects.create_user(username="statspatron", password="x")
+
+        self.client.login(username="statspatron", password="x")
+        self.assertEqual(self.client.get(reverse("core:cache_stats")).status_code, 302)
+
+        self.client.login(username="statslibrarian", password="x")
+        response = self.client.get(reverse("core:cache_stats"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hit_rate", response.json()["cache"])
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="pagecache", password="x")
+        self.item = Item.objects.create(title="Page Villa", status=0)
+        self.other = Item.objects.create(title="Other Villa", status=0)
+        self.url = reverse("item_detail", kwargs={"item_title": self.item.title})
+
+    def test_anonymous_pages_are_cached_and_purged_by_tag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertIn("s-maxage=60", response["Cache-Control"])
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+        self.assertIn(f"catalog.item:{self.item.pk}", response["Surrogate-Key"].split())
+
+        self.assertEqual(self.client.get(self.url)["X-Page-Cache"], "HIT")
+        # Query strings are part of the key
+        self.assertEqual(self.client.get(self.url + "?ref=1")["X-Page-Cache"], "MISS")
+
+        # Changing another item leaves the page alone, this item purges it
+        self.other.save()
+        self.assertEqual(self.client.get(self.url)["X-Page-Cache"], "HIT")
+        ItemReview.objects.create(item=self.item, creator=self.user, rating=4, comment="Nice")
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertContains(response, "Nice")
+
+    def test_listing_is_purged_when_a_shown_item_changes(self):
+        region = Collection.objects.create(
+            title="Region", creator=self.user, is_region=True
+        )
+        CollectionItems.objects.create(collection=region, item=self.item)
+        url = reverse("core:destinations")
+
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "HIT")
+
+        self.item.description = "Now with a pool"
+        self.item.save()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertContains(response, "Now with a pool")
+
+    def test_logged_in_visitors_bypass_the_cache(self):
+        self.client.get(self.url)
+        self.client.login(username="pagecache", password="x")
+        response = self.client.get(self.url)
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertNotIn("s-maxage", response.get("Cache-Control", ""))
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="revalidate", password="x")
+        self.item = Item.objects.create(title="Etag Villa", status=0)
+        self.collection = Collection.objects.create(title="Etag Trip", creator=self.user)
+        CollectionItems.objects.create(collection=self.collection, item=self.item)
+        self.item_url = reverse("item_detail", kwargs={"item_title": self.item.title})
+        self.collection_url = reverse(
+            "collection:detail", args=[self.collection.pk]
+        )
+
+    def revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, app_queries(ctx)
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in (self.item_url, self.collection_url, reverse("core:home")):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Last-Modified", response)
+            self.assertIn("Cookie", response["Vary"])
+
+            not_modified, queries = self.revalidate(url, response["ETag"])
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified.content, b"")
+            self.assertEqual(not_modified.templates, [])
+            # Only the watermark aggregates
+            self.assertLessEqual(len(queries), 2)
+
+    def test_reviews_and_membership_changes_change_the_etag(self):
+        etag = self.client.get(self.item_url)["ETag"]
+        ItemReview.objects.create(item=self.item, creator=self.user, rating=5, comment="Great")
+        response, _ = self.revalidate(self.item_url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Great")
+
+        etag = response["ETag"]
+        CollectionItems.objects.filter(collection=self.collection).delete()
+        self.assertEqual(self.revalidate(self.item_url, etag)[0].status_code, 200)
+
+        etag = self.client.get(self.collection_url)["ETag"]
+        self.item.description = "Renovated"
+        self.item.save()
+        self.assertEqual(self.revalidate(self.collection_url, etag)[0].status_code, 200)
+
+    def test_editing_a_review_changes_the_etag(self):
+        review = ItemReview.objects.create(
+            item=self.item, creator=self.user, rating=4, comment="Quiet"
+        )
+        etag = self.client.get(self.item_url)["ETag"]
+        # Same rating, so the item's review aggregates don't move
+        review.comment = "Quiet, with a view"
+        review.save()
+        response, _ = self.revalidate(self.item_url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Quiet, with a view")
+
+    def test_swapping_a_membership_changes_the_etag(self):
+        other = Item.objects.create(title="Etag Cabin", status=0)
+        urls = (self.collection_url, reverse("core:home"), self.item_url)
+        # Same count, and no item or collection timestamp moves
+        Item.objects.filter(pk__in=[self.item.pk, other.pk]).update(
+            updated_at=self.item.updated_at
+        )
+        etags = [self.client.get(url)["ETag"] for url in urls]
+        CollectionItems.objects.filter(collection=self.collection).delete()
+        CollectionItems.objects.create(collection=self.collection, item=other)
+        for url, etag in zip(urls, etags):
+            with self.subTest(url):
+                self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+    def test_other_collections_visibility_changes_the_etag(self):
+        other = Collection.objects.create(title="Etag Hideaways", creator=self.user)
+        hidden = Item.objects.create(title="Etag Hut", status=0)
+        CollectionItems.objects.create(collection=other, item=hidden)
+        # Items that can be added are only offered to the creator
+        self.client.login(username="revalidate", password="x")
+        response = self.client.get(self.collection_url)
+        self.assertContains(response, "Etag Hut")
+
+        # Without touching updated_at, as a queryset update does
+        Collection.objects.filter(pk=other.pk).update(visibility=1)
+        response, _ = self.revalidate(self.collection_url, response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Etag Hut")
+
+    def test_etag_depends_on_the_user(self):
+        anonymous = self.client.get(self.item_url)["ETag"]
+        self.client.login(username="revalidate", password="x")
+        response, _ = self.revalidate(self.item_url, anonymous)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], anonymous)
+
+    def test_missing_pages_still_404(self):
+        url = reverse("item_detail", kwargs={"item_title": "Nowhere"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"anything"')
+        self.assertEqual(response.status_code, 404)
+
+
+class RequestTimingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Item.objects.create(title="Timed Villa", status=0)
+
+    @override_settings(SLOW_REQUEST_SAMPLE_RATE=0)
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs("instrumentation", "INFO") as logs:
+            response = self.client.get(reverse("core:home"))
+
+        timing = response["Server-Timing"]
+        for name in ("db;dur=", "tpl;dur=", "blob;dur=", "total;dur="):
+            self.assertIn(name, timing)
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["path"], reverse("core:home"))
+        self.assertEqual(line["status"], 200)
+        self.assertGreater(line["db_queries"], 0)
+        self.assertGreater(line["tpl_ms"], 0)
+        self.assertIn(f'desc="{line["db_queries"]} queries"', timing)
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_slow_sampled_requests_log_their_queries(self):
+        with self.assertLogs("instrumentation", "WARNING") as logs:
+            self.client.get(reverse("core:home"))
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertTrue(line["slow"])
+        self.assertEqual(len(line["queries"]), line["db_queries"])
+        origins = [query["origin"] or "" for query in line["queries"]]
+        self.assertTrue(any(origin.startswith("core") for origin in origins))
+
+
+class QueryBudgetTests(TestCase):
+    """Pages stay within core.query_budgets and don't grow with the data"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.librarian = User.objects.create_user(
+            username="budgetlibrarian", password="x", role=1
+        )
+        self.patron = User.objects.create_user(username="budgetpatron", password="x")
+        self.visitor = User.objects.create_user(username="budgetvisitor", password="x")
+        self.region = Collection.objects.create(
+            title="Budget Region", creator=self.librarian, is_region=True
+        )
+        self.private = Collection.objects.create(
+            title="Budget Private", creator=self.librarian, visibility=1
+        )
+        CollectionAuthorizedUser.objects.create(collection=self.private, user=self.patron)
+        self.seeded = 0
+        self.seed(2)
+        self.item = Item.objects.filter(collectionitems__collection=self.region).first()
+
+    def seed(self, n):
+        """n more of everything the budgeted pages list"""
+        User = get_user_model()
+        for _ in range(n):
+            self.seeded += 1
+            i = self.seeded
+            public = Item.objects.create(title=f"Budget Villa {i}", status=0)
+            private = Item.objects.create(title=f"Budget Suite {i}", status=0)
+            CollectionItems.objects.create(collection=self.region, item=public)
+            CollectionItems.objects.create(collection=self.private, item=private)
+
+            other = User.objects.create_user(username=f"budgetguest{i}", password="x")
+            own = Collection.objects.create(title=f"Budget Trip {i}", creator=self.patron)
+            CollectionItems.objects.create(collection=own, item=public)
+            shared = Collection.objects.create(title=f"Guest Trip {i}", creator=other)
+            CollectionItems.objects.create(collection=shared, item=public)
+            CollectionAuthorizedUser.objects.create(collection=self.private, user=other)
+            AccessRequest.objects.create(user=other, collection=self.private)
+
+            for reviewer in (self.patron, other):
+                ItemReview.objects.create(
+                    item=public, creator=reviewer, rating=4, comment="Lovely"
+                )
+            Loan.objects.create(item=public, requester=self.patron)
+            Loan.objects.create(item=private, requester=other)
+
+    def pages(self):
+        """(description, URL name, URL, user to log in as)"""
+        profile = "accounts:user_profile"
+        return [
+            ("home", "core:home", reverse("core:home"), None),
+            ("destinations", "core:destinations", reverse("core:destinations"), None),
+            ("experiences", "core:experiences", reverse("core:experiences"), self.patron),
+            (
+                "dashboard",
+                "core:librarian_dashboard",
+                reverse("core:librarian_dashboard"),
+                self.librarian,
+            ),
+            ("own profile", profile, reverse(profile, args=["budgetpatron"]), self.patron),
+            ("other profile", profile, reverse(profile, args=["budgetpatron"]), self.visitor),
+            ("collections", "collection:list", reverse("collection:list"), self.patron),
+            (
+                "collection",
+                "collection:detail",
+                reverse("collection:detail", args=[self.region.pk]),
+                self.librarian,
+            ),
+            (
+                "item",
+                "item_detail",
+                reverse("item_detail", args=[self.item.title]),
+                self.patron,
+            ),
+        ]
+
+    def query_counts(self):
+        counts = {}
+        for description, url_name, url, user in self.pages():
+            self.client.logout()
+            if user is not None:
+                self.client.force_login(user)
+            # Cold, so cached pages and values are built from the database
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, description)
+            counts[description] = (url_name, len(app_queries(ctx)), app_queries(ctx))
+        return counts
+
+    def test_pages_stay_within_budget(self):
+        for description, (url_name, count, queries) in self.query_counts().items():
+            budget = budget_for(url_name)
+            self.assertIsNotNone(budget, f"{url_name} has no query budget")
+            with self.subTest(description):
+                self.assertLessEqual(
+                    count, budget, f"{description}: {count} queries\n" + "\n".join(queries)
+                )
+
+    def test_query_counts_dont_grow_with_the_data(self):
+        before = self.query_counts()
+        self.seed(3)
+        after = self.query_counts()
+        for description, (_, count, queries) in after.items():
+            with self.subTest(description):
+                self.assertEqual(
+                    count,
+                    before[description][1],
+                    f"{description}: grew to {count} queries\n" + "\n".join(queries),
+                )
+
+
+class SharedCacheCheckTests(TestCase):
+
+    def test_process_local_cache_is_reported(self):
+        from core.checks import check_shared_cache
+
+        self.assertEqual(check_shared_cache(None), [])
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        tiered = {"BACKEND": "cache_backends.TieredCache", "LOCATION": "shared"}
+        for caches in ({"default": local}, {"default": tiered, "shared": local}):
+            with override_settings(CACHES=caches):
+                self.assertEqual(
+                    [w.id for w in check_shared_cache(None)], ["core.W001"]
+                )
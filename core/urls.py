@@ -1,5 +1,5 @@
 from django.urls import path, include
-from . import views
+from . import views, api
 
 app_name = "core"
 
@@ -7,10 +7,22 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("destinations/", views.destinations, name="destinations"),
     path("experiences/", views.experiences, name="experiences"),
+    path("destinations/search/", views.search, name="search"),
+    path("api/v1/items/", api.item_list, name="api_item_list"),
+    path("api/v1/items/<int:item_id>/", api.item_detail, name="api_item_detail"),
+    path("api/v1/collections/", api.collection_list, name="api_collection_list"),
+    path(
+        "api/v1/collections/<int:collection_id>/",
+        api.collection_detail,
+        name="api_collection_detail",
+    ),
+    path("api/v1/reviews/", api.review_list, name="api_review_list"),
+    path("api/v1/reviews/<int:review_id>/", api.review_detail, name="api_review_detail"),
     path("about/team/", views.about, name="about"),
     path("about/sources/", views.sources, name="sources"),
     path("accounts/", include("accounts.urls")),
     path("librarian-dashboard/", views.librarian_dashboard, name="librarian_dashboard"),
+    path("cache-stats/", views.cache_stats, name="cache_stats"),
     path(
         "access-request/<str:action>/<int:request_id>/",
         views.handle_access_request,
@@ -1,14 +1,34 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import TemplateView
 from django.http import JsonResponse
+from django.core.exceptions import ValidationError
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required, user_passes_test
 from catalog.models import Item
-from collection.models import Collection, CollectionItems, CollectionAuthorizedUser
+from collection.models import Collection, CollectionAuthorizedUser, CollectionItems
 from access_request.models import AccessRequest
 from django.contrib.auth import get_user_model
 import json
 from loans.models import Loan
+from collection.authorization import get_authorized_collection_ids
+from .models import DestinationCard
+from .search import search_destinations
+from decimal import Decimal, InvalidOperation
+from django.urls import reverse
+from django.utils.http import urlencode
+from . import api, caching
+from .caching import model_tag, object_tag, set_tag
+from .conditional import conditional_page, home_watermark
+from .page_cache import cache_anonymous_page, tag_page
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+DESTINATIONS_PAGE_SIZE = 24
+DESTINATIONS_API_FIELDS = (
+    "title,description,price_per_night,representative_image,image_derivatives,"
+    "region,collection_ids,url"
+)
 
 #/***************************************************************************************
 #*  REFERENCES
@@ -26,10 +46,8 @@ def handler500(request):
     return render(request, "core/500.html", status=500)
 
 
-def home(request):
-    """
-    Homepage view.
-    """
+def _home_sections():
+    """Featured destinations and experiences for the homepage"""
 
     # Get items that belong to region collections
     region_items = Item.objects.filter(
@@ -84,6 +102,29 @@ def home(request):
             }
         )
 
+    return featured_destinations, experiences
+
+
+@conditional_page(home_watermark)
+@cache_anonymous_page
+def home(request):
+    """
+    Homepage view.
+    """
+    featured_destinations, experiences = caching.cached(
+        "home", (Item, Collection, CollectionItems), _home_sections
+    )
+    # Region memberships and collections decide which items are shown
+    tag_page(
+        request,
+        set_tag(CollectionItems),
+        model_tag(Collection),
+        *(
+            object_tag(Item, item["id"])
+            for item in featured_destinations + experiences
+        ),
+    )
+
     context = {
         "page_title": "Tel Resorts, Hotels & Residences – Explore Luxury Destinations",
         "featured_destinations": featured_destinations,
@@ -92,68 +133,61 @@ def home(request):
     return render(request, "core/home.html", context)
 
 
-def destinations(request):
-    """
-    Destinations page view.
-    """
-    # Get all items from the catalog
-    items = Item.objects.all()
-
-    # Get all collections
-    collections = Collection.objects.all()
-
-    # Map items to destination format
-    destinations = []
-    for item in items:
-        # Get collections this item belongs to
-        item_collections = CollectionItems.objects.filter(item=item).select_related(
-            "collection"
-        )
+def _destinations_page():
+    """The first page of public destination cards, its next link and the collections"""
+    # Cards are precomputed per item, skip items that are in private collections.
+    # Only the first page is rendered, the slider loads the rest from the API
+    destinations = list(
+        DestinationCard.objects.filter(is_private=False).order_by("name", "item_id")[
+            : DESTINATIONS_PAGE_SIZE + 1
+        ]
+    )
 
-        # Check if the item is in any private collections
-        is_in_private_collection = any(
-            ci.collection.visibility == 1 for ci in item_collections
+    next_url = None
+    if len(destinations) > DESTINATIONS_PAGE_SIZE:
+        destinations = destinations[:DESTINATIONS_PAGE_SIZE]
+        last = destinations[-1]
+        next_url = "{}?{}".format(
+            reverse("core:api_item_list"),
+            urlencode(
+                {
+                    "fields": DESTINATIONS_API_FIELDS,
+                    "limit": DESTINATIONS_PAGE_SIZE,
+                    "cursor": api.item_cursor(last.name, last.item_id),
+                }
+            ),
         )
 
-        # Skip items that are in private collections
-        if is_in_private_collection:
-            continue
-
-        collection_ids = [ci.collection.id for ci in item_collections]
-
-        # Find the region collection this item belongs to
-        region_collection = next(
-            (ci.collection for ci in item_collections if ci.collection.is_region), None
-        )
+    # Get all collections
+    collections = list(Collection.objects.all())
 
-        # Set region based on collection, default to 'asia' if no region collection found
-        region = region_collection.title.lower() if region_collection else "asia"
+    return destinations, next_url, collections
 
-        # Handle image - use a safe default
-        try:
-            if item.representative_image and hasattr(item.representative_image, "url"):
-                image_path = item.representative_image.url
-            else:
-                image_path = "images/default-destination.jpg"
-        except Exception:
-            # In case of any errors with the image, use default
-            image_path = "images/default-destination.jpg"
 
-        destinations.append(
-            {
-                "name": item.title,
-                "description": item.description or "",
-                "price": item.price_per_night or 0,
-                "representative_image": image_path,
-                "region": region,
-                "collection_ids": collection_ids,
-            }
-        )
+@cache_anonymous_page
+def destinations(request):
+    """
+    Destinations page view.
+    """
+    # Cards are rebuilt from items, collections and memberships, so those
+    # models' versions cover them
+    destinations, next_url, collections = caching.cached(
+        "destinations", (Item, Collection, CollectionItems), _destinations_page
+    )
+    tag_page(
+        request,
+        set_tag(Item),
+        set_tag(Collection),
+        set_tag(CollectionItems),
+        *(object_tag(Item, card.item_id) for card in destinations),
+        *(object_tag(Collection, collection.id) for collection in collections),
+    )
 
     context = {
         "page_title": "Destinations | Tel Resorts",
         "destinations": destinations,
         "collections": collections,
+        "next_url": next_url,
     }
     return render(request, "core/destinations.html", context)
 
@@ -164,29 +198,32 @@ def experiences(request):
     """
     Experiences page view.
     """
-    # Get all items from the catalog
-    items = Item.objects.all()
-
     # Get all collections
     collections = Collection.objects.all()
 
+    # Collections the user is explicitly authorized for, as one cached set
+    authorized_ids = get_authorized_collection_ids(request.user, request)
+    is_librarian_user = request.user.is_authenticated and request.user.role == 1
+
+    # Get authorized users for all private collections in one query
+    authorized_users_by_collection = {}
+    auth_users = CollectionAuthorizedUser.objects.filter(
+        collection__visibility=1
+    ).values_list("collection_id", "user_id", "user__username")
+    for collection_id, user_id, username in auth_users:
+        authorized_users_by_collection.setdefault(collection_id, []).append(
+            {"id": user_id, "username": username}
+        )
+
     # Add authorization status to collections
     collections_with_auth = []
     for collection in collections:
-        is_auth = False
-        if request.user.is_authenticated:
-            is_auth = CollectionAuthorizedUser.objects.filter(
-                collection=collection, user=request.user
-            ).exists()
-
-            if request.user.role == 1:
-                is_auth = True
-        
+        is_auth = collection.id in authorized_ids or is_librarian_user
+
         # Get authorized users for this collection
         authorized_users = []
         if collection.visibility == 1:  # Private collection
-            auth_users = CollectionAuthorizedUser.objects.filter(collection=collection)
-            authorized_users = [{'id': au.user.id, 'username': au.user.username} for au in auth_users]
+            authorized_users = authorized_users_by_collection.get(collection.id, [])
 
         collections_with_auth.append(
             {
@@ -200,65 +237,28 @@ def experiences(request):
             }
         )
 
-    # Map items to destination format
-    destinations = []
-    for item in items:
-        # Get collections this item belongs to
-        item_collections = CollectionItems.objects.filter(item=item).select_related(
-            "collection"
-        )
-
-        # Check if the item is in any private collections
-        is_in_private_collection = any(
-            ci.collection.visibility == 1 for ci in item_collections
-        )
-
-        # Skip items that are not in private collections
-        if not is_in_private_collection:
-            continue
-
-        collection_ids = [ci.collection.id for ci in item_collections]
+    # Only include items in private collections
+    cards = DestinationCard.objects.filter(is_private=True).order_by("item_id")
 
+    # Map cards to destination format
+    destinations = []
+    for card in cards:
         # special to experiences
         #
-        # Check if user is authorized for any of the collections
-        is_authorized = False
-        if request.user.is_authenticated:
-            # Check if user is authorized for any of this item's collections
-            authorized_collections = CollectionAuthorizedUser.objects.filter(
-                collection__id__in=collection_ids, user=request.user
-            ).exists()
-            is_authorized = authorized_collections
+        # Check if user is authorized for any of this item's collections
+        is_authorized = not authorized_ids.isdisjoint(card.collection_ids)
         #
         #
         # end special to experiences
 
-        # Find the region collection this item belongs to
-        region_collection = next(
-            (ci.collection for ci in item_collections if ci.collection.is_region), None
-        )
-
-        # Set region based on collection, default to 'asia' if no region collection found
-        region = region_collection.title.lower() if region_collection else "asia"
-
-        # Handle image - use a safe default
-        try:
-            if item.representative_image and hasattr(item.representative_image, "url"):
-                image_path = item.representative_image.url
-            else:
-                image_path = "images/default-destination.jpg"
-        except Exception:
-            # In case of any errors with the image, use default
-            image_path = "images/default-destination.jpg"
-
         destinations.append(
             {
-                "name": item.title,
-                "description": item.description or "",
-                "price": item.price_per_night or 0,
-                "representative_image": image_path,
-                "region": region,
-                "collection_ids": collection_ids,
+                "name": card.name,
+                "description": card.description,
+                "price": card.price,
+                "representative_image": card.representative_image,
+                "region": card.region,
+                "collection_ids": card.collection_ids,
                 "has_private_collection": True,  # Since we only include items with private collections
                 "is_authorized_for_user": is_authorized,  # Add authorization flag
             }
@@ -272,6 +272,62 @@ def experiences(request):
     return render(request, "core/experiences.html", context)
 
 
+def search(request):
+    """
+    Ranked, paginated JSON search over destinations.
+    """
+    query = request.GET.get("q", "").strip()
+
+    # experiences searches items in private collections, for logged in users only
+    private = request.GET.get("scope") == "experiences"
+    if private and not request.user.is_authenticated:
+        return JsonResponse({"success": False, "message": "Login required"}, status=403)
+
+    try:
+        collection_id = int(request.GET["collection"]) if request.GET.get("collection") else None
+        min_price = Decimal(request.GET["min_price"]) if request.GET.get("min_price") else None
+        max_price = Decimal(request.GET["max_price"]) if request.GET.get("max_price") else None
+        page_size = min(int(request.GET.get("page_size", SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE)
+    except (ValueError, InvalidOperation):
+        return JsonResponse({"success": False, "message": "Invalid filter value"}, status=400)
+
+    results = search_destinations(
+        query,
+        private=private,
+        region=request.GET.get("region"),
+        collection_id=collection_id,
+        min_price=min_price,
+        max_price=max_price,
+    )
+    page, ranked = results.page(request.GET.get("page", 1), max(page_size, 1))
+
+    return JsonResponse(
+        {
+            "success": True,
+            "query": query,
+            "count": page.paginator.count,
+            "page": page.number,
+            "num_pages": page.paginator.num_pages,
+            "has_next": page.has_next(),
+            "results": [
+                {
+                    "id": card.item_id,
+                    "name": card.name,
+                    "description": card.description,
+                    "price": str(card.price),
+                    "representative_image": card.representative_image,
+                    "image_derivatives": card.image_derivatives,
+                    "region": card.region,
+                    "collection_ids": card.collection_ids,
+                    "url": reverse("item_detail", kwargs={"item_title": card.name}),
+                    "score": score,
+                }
+                for card, score in ranked
+            ],
+        }
+    )
+
+
 def about(request):
     """
     About page view.
@@ -297,6 +353,15 @@ def is_librarian(user):
 
 
 
+@login_required
+@user_passes_test(is_librarian)
+def cache_stats(request):
+    """
+    Hit and miss counters of this process's cache tiers, as JSON.
+    """
+    return JsonResponse({"success": True, "cache": caching.stats()})
+
+
 @login_required
 @user_passes_test(is_librarian)
 def librarian_dashboard(request):
@@ -378,16 +443,13 @@ def handle_loan_action(request, action, loan_id):
         loan = get_object_or_404(Loan, id=loan_id)
 
         if action == "approve":
-
-            #deny all other loans for this item that overlap in time
-            Loan.objects.filter(
-                item=loan.item,
-                start_date__lte=loan.end_date,
-                end_date__gte=loan.start_date
-            ).update(status=2)
-
-            loan.status = 1  # Approved
-            loan.save()
+            # Locks the item and denies overlapping pending loans in one transaction
+            try:
+                loan.approve()
+            except ValidationError as e:
+                return JsonResponse(
+                    {"success": False, "message": e.messages[0]}, status=409
+                )
 
             message = "Loan approved successfully"
 
@@ -0,0 +1,278 @@
+"""
+A local stand-in for the Vercel Blob API, for tests and benchmarks.
+
+    with FakeBlobServer() as server:
+        # point VERCEL_BLOB_API_URL at server.url
+        ...
+
+It speaks the subset of the API storage_backends.VercelBlobStorage uses:
+PUT /<pathname>, the multipart /mpu actions, GET /list with a cursor, and
+DELETE (or POST) /delete. Blobs are served back from the same server with
+Range and ETag support. Every request is recorded in server.log.
+
+Faults can be injected: `latency` delays every response, `error_rate`
+fails that fraction of requests with a 503, and fail() queues specific
+error responses for the next matching requests.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import random
+import ssl
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeBlobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _json(self, data, status=200):
+        self._send(status, json.dumps(data).encode())
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _record(self):
+        parsed = urlparse(self.path)
+        self.fake.log.append((self.command, parsed.path, dict(self.headers)))
+        return parsed.path.lstrip("/"), parse_qs(parsed.query)
+
+    def parse_request(self):
+        # Faults are applied here, returning False skips the do_* handler
+        if not super().parse_request():
+            return False
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        status = self.fake._fault(self.command, urlparse(self.path).path)
+        if status:
+            self._record()
+            self._body()
+            headers = {"Retry-After": "0"} if status == 429 else None
+            self._send(status, b'{"error": "injected"}', headers=headers)
+            return False
+        return True
+
+    def _blob_result(self, pathname, content_type):
+        data = self.fake.blobs[pathname]
+        return {
+            "url": f"{self.fake.url}/{pathname}",
+            "pathname": pathname,
+            "contentType": content_type,
+            "size": len(data),
+            "uploadedAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+
+    def do_PUT(self):
+        pathname, _ = self._record()
+        self.fake.blobs[pathname] = self._body()
+        content_type = self.headers.get("content-type", "application/octet-stream")
+        self._json(self._blob_result(pathname, content_type))
+
+    def do_POST(self):
+        path, query = self._record()
+        if path == "delete":
+            return self._delete()
+        if path != "mpu":
+            return self._send(404)
+
+        pathname = query["pathname"][0]
+        action = self.headers["x-mpu-action"]
+        if action == "create":
+            upload_id = str(len(self.fake.uploads) + 1)
+            self.fake.uploads[upload_id] = {}
+            return self._json({"key": pathname, "uploadId": upload_id})
+
+        parts = self.fake.uploads[self.headers["x-mpu-upload-id"]]
+        if action == "upload":
+            data = self._body()
+            etag = hashlib.md5(data).hexdigest()
+            parts[int(self.headers["x-mpu-part-number"])] = (etag, data)
+            return self._json({"etag": etag})
+
+        # complete
+        listed = json.loads(self._body())
+        self.fake.blobs[pathname] = b"".join(
+            parts[part["partNumber"]][1] for part in listed
+        )
+        content_type = self.headers.get("x-content-type", "application/octet-stream")
+        self._json(self._blob_result(pathname, content_type))
+
+    def do_DELETE(self):
+        self._record()
+        self._delete()
+
+    def _delete(self):
+        for url in json.loads(self._body())["urls"]:
+            self.fake.blobs.pop(url[len(self.fake.url) + 1:], None)
+        self._send(200, b"{}")
+
+    def do_GET(self):
+        path, query = self._record()
+        if path == "list":
+            return self._list(query)
+
+        data = self.fake.blobs.get(path)
+        if data is None:
+            return self._send(404)
+
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers={"ETag": etag})
+
+        headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+        byte_range = self.headers.get("Range")
+        if byte_range and byte_range.startswith("bytes="):
+            start, _, end = byte_range[len("bytes="):].partition("-")
+            start = int(start)
+            end = int(end) if end else len(data) - 1
+            if start >= len(data):
+                return self._send(416, headers={"Content-Range": f"bytes */{len(data)}"})
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return self._send(206, data[start:end + 1], "application/octet-stream", headers)
+        self._send(200, data, "application/octet-stream", headers)
+
+    do_HEAD = do_GET
+
+    def _list(self, query):
+        limit = int(query.get("limit", ["1000"])[0])
+        start = int(query.get("cursor", ["0"])[0])
+        names = sorted(self.fake.blobs)
+        page = names[start:start + limit]
+        has_more = start + limit < len(names)
+        self._json({
+            "blobs": [
+                {
+                    "url": f"{self.fake.url}/{name}",
+                    "pathname": name,
+                    "size": len(self.fake.blobs[name]),
+                    "uploadedAt": "2026-01-01T00:00:00.000Z",
+                }
+                for name in page
+            ],
+            "cursor": str(start + limit) if has_more else None,
+            "hasMore": has_more,
+        })
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop streamed downloads part way through on purpose
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeBlobServer:
+    """A FakeBlobHandler server on a background thread"""
+
+    def __init__(self, tls=False, directory=None, latency=0, error_rate=0, seed=None):
+        self.blobs = {}
+        self.uploads = {}
+        self.log = []
+        self.tls = tls
+        self.directory = directory
+        self.cert_path = None
+        self.latency = latency
+        self.error_rate = error_rate
+        self._faults = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fail(self, status, times=1, method=None, path=None):
+        """Answer the next `times` requests matching method/path with status"""
+        with self._lock:
+            self._faults.extend([(status, method, path)] * times)
+
+    def _fault(self, method, path):
+        with self._lock:
+            for i, (status, fault_method, fault_path) in enumerate(self._faults):
+                if fault_method in (None, method) and fault_path in (None, path):
+                    del self._faults[i]
+                    return status
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 503
+        return None
+
+    def start(self):
+        self.httpd = _Server(("localhost", 0), FakeBlobHandler)
+        self.httpd.fake = self
+        scheme = "http"
+        if self.tls:
+            self.cert_path, key_path = self_signed_cert(self.directory)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.cert_path, key_path)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+            scheme = "https"
+        self.url = f"{scheme}://localhost:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def self_signed_cert(directory):
+    """Write a throwaway certificate and key for localhost, returns their paths"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    return cert_path, key_path
@@ -70,6 +70,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the rest
+    "instrumentation.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -85,7 +87,7 @@ ROOT_URLCONF = "hootel.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "instrumentation.TimedDjangoTemplates",
         "DIRS": [
             BASE_DIR / "templates",
         ],
@@ -131,6 +133,27 @@ else:
     DATABASES = {"default": db_config}
 
 
+# Caching
+# An in-process LRU (cache_backends.TieredCache) in front of a table in the
+# main database, so every instance shares the second tier without another
+# service. Run `manage.py createcachetable` after migrating.
+CACHES = {
+    "default": {
+        "BACKEND": "cache_backends.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "LOCAL_MAX_ENTRIES": int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1000")),
+            "LOCAL_TIMEOUT": int(os.getenv("CACHE_LOCAL_TIMEOUT", "10")),
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "hootel_cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+
 # Password validation
 AUTH_USER_MODEL = "accounts.User"
 
@@ -209,6 +232,16 @@ else:
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Resize large image uploads in-process when the request commits instead of
+# leaving them for a worker. Off by default: `manage.py process_image_jobs`
+# is the worker where there is a long-running process, and on Vercel the cron
+# in vercel.json calls catalog:run_image_jobs every few minutes, authenticated
+# with CRON_SECRET, running jobs for at most IMAGE_JOBS_CRON_SECONDS. Plans
+# without frequent crons should set IMAGE_JOBS_INLINE=true instead.
+IMAGE_JOBS_INLINE = os.getenv("IMAGE_JOBS_INLINE", "False").lower() == "true"
+CRON_SECRET = os.getenv("CRON_SECRET")
+IMAGE_JOBS_CRON_SECONDS = float(os.getenv("IMAGE_JOBS_CRON_SECONDS", "8"))
+
 # Add this line to tell Django where to find static files during development
 STATICFILES_DIRS = [
     BASE_DIR / "static",
@@ -291,5 +324,16 @@ LOGGING = {
             "level": os.getenv("DJANGO_LOG_LEVEL", "WARNING"),
             "propagate": False,
         },
+        # Slow sampled requests at WARNING, REQUEST_LOG_LEVEL=INFO adds one
+        # JSON line per request
+        "instrumentation": {
+            "handlers": ["console"],
+            "level": os.getenv("REQUEST_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
     },
 }
+
+# Requests slower than this (ms) log their queries, if sampled
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "0.1"))
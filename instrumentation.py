@@ -0,0 +1,193 @@
+"""
+Per-request timing: SQL, template rendering, blob storage and total.
+
+    MIDDLEWARE = ["instrumentation.RequestTimingMiddleware", ...]
+    TEMPLATES = [{"BACKEND": "instrumentation.TimedDjangoTemplates", ...}]
+
+RequestTimingMiddleware (first in MIDDLEWARE, so its total covers the others)
+opens a Timings for each request. Queries are timed by a database execute
+wrapper, templates by TimedDjangoTemplates, and storage_backends adds the
+time of each HTTP request to the blob API with record(). The middleware then
+adds a Server-Timing header, which browsers show in their network panel:
+
+    Server-Timing: db;dur=12.1;desc="7 queries", tpl;dur=30.4,
+                   blob;dur=0.0;desc="0 requests", total;dur=51.9
+
+and logs one JSON line per request to the "instrumentation" logger at INFO,
+which settings only lets through when REQUEST_LOG_LEVEL=INFO.
+Template time includes queries run lazily while rendering.
+
+A sample of requests (SLOW_REQUEST_SAMPLE_RATE) also keep every query with
+the line of project code that ran it. When such a request takes longer than
+SLOW_REQUEST_MS, the queries are logged at WARNING.
+"""
+
+import json
+import logging
+import random
+import sys
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_SAMPLE_RATE = 0.1
+# Queries kept per sampled request
+MAX_SAMPLED_QUERIES = 200
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("timings", default=None)
+_this_file = __file__
+
+
+class Timings:
+    """What one request spent, in seconds, and how many times"""
+
+    def __init__(self, sample=False):
+        self.start = time.perf_counter()
+        self.seconds = {"db": 0.0, "tpl": 0.0, "blob": 0.0}
+        self.counts = {"db": 0, "tpl": 0, "blob": 0}
+        self.sample = sample
+        self.queries = []
+        self._rendering = 0
+
+    def add(self, kind, seconds, count=1):
+        self.seconds[kind] += seconds
+        self.counts[kind] += count
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total):
+        def entry(name, seconds, desc=None):
+            value = f"{name};dur={seconds * 1000:.1f}"
+            return f'{value};desc="{desc}"' if desc else value
+
+        return ", ".join(
+            [
+                entry("db", self.seconds["db"], f"{self.counts['db']} queries"),
+                entry("tpl", self.seconds["tpl"]),
+                entry("blob", self.seconds["blob"], f"{self.counts['blob']} requests"),
+                entry("total", total),
+            ]
+        )
+
+
+def current():
+    """The Timings of the request being handled, or None"""
+    return _current.get()
+
+
+def record(kind, seconds, count=1):
+    """Add time spent on `kind` ("db", "tpl" or "blob") to the current request"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(kind, seconds, count)
+
+
+def _origin():
+    """file:line (function) of the innermost project code on the stack"""
+    base = str(Path(settings.BASE_DIR))
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base)
+            and filename != _this_file
+            and "site-packages" not in filename
+        ):
+            relative = filename[len(base) :].lstrip("/\\")
+            return f"{relative}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return None
+
+
+def _query_timer(timings):
+    def execute(run, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return run(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            timings.add("db", seconds)
+            if timings.sample and len(timings.queries) < MAX_SAMPLED_QUERIES:
+                timings.queries.append(
+                    {"sql": sql, "ms": round(seconds * 1000, 1), "origin": _origin()}
+                )
+
+    return execute
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        # Only the outermost render counts, includes are part of it
+        if timings is None or timings._rendering:
+            return super().render(context, request)
+        timings._rendering += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings._rendering -= 1
+            timings.add("tpl", time.perf_counter() - start)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose templates report their render time"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "SLOW_REQUEST_MS", SLOW_REQUEST_MS)
+        self.sample_rate = getattr(
+            settings, "SLOW_REQUEST_SAMPLE_RATE", SLOW_REQUEST_SAMPLE_RATE
+        )
+
+    def __call__(self, request):
+        timings = Timings(sample=random.random() < self.sample_rate)
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_query_timer(timings))
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = timings.total
+        response["Server-Timing"] = timings.server_timing(total)
+        self.log(request, response, timings, total)
+        return response
+
+    def log(self, request, response, timings, total):
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+            "db_queries": timings.counts["db"],
+            "db_ms": round(timings.seconds["db"] * 1000, 1),
+            "tpl_ms": round(timings.seconds["tpl"] * 1000, 1),
+            "blob_requests": timings.counts["blob"],
+            "blob_ms": round(timings.seconds["blob"] * 1000, 1),
+        }
+        logger.info(json.dumps(line))
+        if timings.sample and total * 1000 >= self.slow_ms:
+            logger.warning(json.dumps({**line, "slow": True, "queries": timings.queries}))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LoansConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "loans"
+
+    def ready(self):
+        # register the availability index invalidation receivers
+        from . import availability  # noqa: F401
@@ -0,0 +1,99 @@
+"""
+Loan availability engine.
+
+Approved loans for an item are merged into a sorted list of disjoint, inclusive
+(start_date, end_date) intervals. Overlap checks and window lookups are then a
+binary search instead of a scan over every loan. The merged index is cached per
+item, lookup lists included, so a hit is only unpickled and never re-sorted or
+re-merged, and dropped whenever one of the item's loans is saved or deleted.
+The cache must be shared, see core.checks.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Loan
+
+APPROVED = 1
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class IntervalIndex:
+    """Sorted, merged, inclusive date intervals with O(log n) lookups"""
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(i for i in intervals if i[0] and i[1]):
+            if end < start:
+                continue
+            # Merge overlapping and back-to-back ranges, dates are inclusive
+            if merged and start <= merged[-1][1] + timedelta(days=1):
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+
+        self.intervals = merged
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def overlaps(self, start, end):
+        """True if any booked date falls within start..end (inclusive)"""
+        # The last interval starting on or before `end` is the only candidate,
+        # since the intervals are disjoint and sorted
+        i = bisect_right(self._starts, end) - 1
+        return i >= 0 and self._ends[i] >= start
+
+    def ranges_between(self, start, end):
+        """Booked intervals that intersect start..end (inclusive)"""
+        first = bisect_left(self._ends, start)
+        last = bisect_right(self._starts, end)
+        return self.intervals[first:last]
+
+
+def _cache_key(item_id):
+    # v2: the whole IntervalIndex, v1 stored only its intervals
+    return f"loan-availability:v2:{item_id}"
+
+
+def build_index(item_id):
+    """Build the interval index for an item straight from the database"""
+    return IntervalIndex(
+        Loan.objects.filter(item_id=item_id, status=APPROVED).values_list(
+            "start_date", "end_date"
+        )
+    )
+
+
+def get_index(item_id):
+    """Return the cached interval index for an item, building it on a miss"""
+    key = _cache_key(item_id)
+    index = cache.get(key)
+    if index is None:
+        index = build_index(item_id)
+        cache.set(key, index, CACHE_TIMEOUT)
+    return index
+
+
+def invalidate(item_id):
+    """Drop the cached interval index for an item"""
+    key = _cache_key(item_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def is_available(item_id, start_date, end_date):
+    """True if no approved loan for the item overlaps start_date..end_date"""
+    return not get_index(item_id).overlaps(start_date, end_date)
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_on_loan_change(sender, instance, **kwargs):
+    invalidate(instance.item_id)
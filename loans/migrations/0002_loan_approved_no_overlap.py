@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-17 23:40
+
+from django.db import migrations
+
+CONSTRAINT_NAME = "loan_approved_no_overlap"
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # Only PostgreSQL supports exclusion constraints, other backends rely on
+    # the locking in Loan.approve()
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Loan = apps.get_model("loans", "Loan")
+    approved = Loan.objects.filter(
+        status=1, start_date__isnull=False, end_date__isnull=False
+    )
+    conflicts = [
+        (loan.id, other.id)
+        for loan in approved
+        for other in approved.filter(
+            item_id=loan.item_id,
+            id__gt=loan.id,
+            start_date__lte=loan.end_date,
+            end_date__gte=loan.start_date,
+        )
+    ]
+    if conflicts:
+        raise RuntimeError(
+            "Resolve overlapping approved loans before migrating: "
+            + ", ".join(f"{a} & {b}" for a, b in conflicts)
+        )
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"""
+        ALTER TABLE loan ADD CONSTRAINT {CONSTRAINT_NAME}
+        EXCLUDE USING gist (
+            item_id WITH =,
+            daterange(start_date, end_date, '[]') WITH &&
+        )
+        WHERE (status = 1 AND start_date IS NOT NULL AND end_date IS NOT NULL)
+        """
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE loan DROP CONSTRAINT IF EXISTS {CONSTRAINT_NAME}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0001_squashed_0003_loan_delete_loanrequest"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -1,7 +1,26 @@
-from django.db import models
+import threading
+from contextlib import contextmanager
+from django.core.exceptions import ValidationError
+from django.db import models, transaction, connections, router, IntegrityError
+from django.db.models import F
 from django.conf import settings
 from catalog.models import Item
 
+# SQLite has no row locks, so approvals there are serialized in-process with
+# this lock and across processes by taking SQLite's write lock up front
+_approval_lock = threading.Lock()
+
+OVERLAP_MESSAGE = "This booking overlaps an approved booking for the same dates."
+
+
+@contextmanager
+def _approval_guard(using):
+    if connections[using].features.has_select_for_update:
+        yield
+    else:
+        with _approval_lock:
+            yield
+
 
 class Loan(models.Model):
     STATUS_CHOICES = (
@@ -21,5 +40,55 @@ class Loan(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True
     )
 
+    def overlapping(self):
+        """Other loans for the same item whose dates overlap this one (inclusive)"""
+        if not self.start_date or not self.end_date:
+            return Loan.objects.none()
+        return Loan.objects.filter(
+            item_id=self.item_id,
+            start_date__lte=self.end_date,
+            end_date__gte=self.start_date,
+        ).exclude(pk=self.pk)
+
+    def approve(self):
+        """
+        Approve this loan and deny the pending loans it overlaps.
+
+        Runs in one transaction with the loan and its item locked, so concurrent
+        approvals for the same item are serialized. Raises ValidationError if the
+        loan overlaps an already approved loan.
+        """
+        using = router.db_for_write(Loan, instance=self)
+        has_row_locks = connections[using].features.has_select_for_update
+
+        try:
+            with _approval_guard(using), transaction.atomic(using=using):
+                if not has_row_locks:
+                    # No-op write so this transaction holds SQLite's write lock
+                    # before it reads anything
+                    Loan.objects.using(using).filter(pk=self.pk).update(status=F("status"))
+
+                loan = Loan.objects.using(using).select_for_update().get(pk=self.pk)
+                list(
+                    Item.objects.using(using)
+                    .select_for_update()
+                    .filter(pk=loan.item_id)
+                    .values_list("pk", flat=True)
+                )
+
+                if loan.overlapping().filter(status=1).exists():
+                    raise ValidationError(OVERLAP_MESSAGE)
+
+                # deny all other pending loans for this item that overlap in time
+                loan.overlapping().filter(status=0).update(status=2)
+
+                loan.status = 1  # Approved
+                loan.save(update_fields=["status"])
+        except IntegrityError as e:
+            # Raised by the loan_approved_no_overlap exclusion constraint on PostgreSQL
+            raise ValidationError(OVERLAP_MESSAGE) from e
+
+        self.status = loan.status
+
     class Meta:
         db_table = "loan"  # <--- Custom table name
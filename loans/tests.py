@@ -1,9 +1,16 @@
-from django.test import TestCase, Client
+import threading
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, Client
+from django.core.exceptions import ValidationError
+from django.db import connection
 from loans.models import Loan
 from catalog.models import Item
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from datetime import date, timedelta
+from django.core.cache import cache
+from loans import availability
+from loans.availability import IntervalIndex
 
 class LoanModelTests(TestCase):
     
@@ -141,3 +148,202 @@ class LoanViewTests(TestCase):
         self.assertTrue(True)
 
 
+class AvailabilityTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        User = get_user_model()
+
+        self.patron = User.objects.create_user(
+            username="testpatron",
+            email="patron@example.com",
+            password="testpassword",
+            role=0
+        )
+
+        self.item = Item.objects.create(
+            title="Bookable Item",
+            status=0,
+            location="Test Location",
+            description="This is a bookable item"
+        )
+
+        Loan.objects.create(
+            item=self.item,
+            requester=self.patron,
+            status=1,
+            start_date=date(2030, 5, 10),
+            end_date=date(2030, 5, 14)
+        )
+
+    def test_interval_index_merges_and_overlaps(self):
+        index = IntervalIndex([
+            (date(2030, 1, 5), date(2030, 1, 8)),
+            (date(2030, 1, 1), date(2030, 1, 3)),
+            (date(2030, 1, 4), date(2030, 1, 4)),
+            (date(2030, 2, 1), date(2030, 2, 2)),
+        ])
+        self.assertEqual(index.intervals, [
+            (date(2030, 1, 1), date(2030, 1, 8)),
+            (date(2030, 2, 1), date(2030, 2, 2)),
+        ])
+        self.assertTrue(index.overlaps(date(2030, 1, 8), date(2030, 1, 20)))
+        self.assertFalse(index.overlaps(date(2030, 1, 9), date(2030, 1, 31)))
+        self.assertTrue(index.overlaps(date(2029, 12, 1), date(2030, 3, 1)))
+        self.assertEqual(
+            index.ranges_between(date(2030, 1, 20), date(2030, 2, 28)),
+            [(date(2030, 2, 1), date(2030, 2, 2))],
+        )
+
+    def test_cached_index_is_not_merged_again(self):
+        availability.get_index(self.item.id)
+        # A hit is unpickled with its lookup lists, without running __init__
+        with mock.patch.object(IntervalIndex, "__init__") as init:
+            index = availability.get_index(self.item.id)
+        init.assert_not_called()
+        self.assertTrue(index.overlaps(date(2030, 5, 14), date(2030, 5, 20)))
+        self.assertFalse(index.overlaps(date(2030, 5, 15), date(2030, 5, 20)))
+
+    def test_index_invalidated_when_loan_approved(self):
+        self.assertTrue(availability.is_available(self.item.id, date(2030, 6, 1), date(2030, 6, 3)))
+        Loan.objects.create(
+            item=self.item,
+            requester=self.patron,
+            status=1,
+            start_date=date(2030, 6, 2),
+            end_date=date(2030, 6, 5)
+        )
+        self.assertFalse(availability.is_available(self.item.id, date(2030, 6, 1), date(2030, 6, 3)))
+
+    def test_conflicting_booking_rejected(self):
+        self.client.login(username="testpatron", password="testpassword")
+        url = reverse("catalog:booking", args=[self.item.title])
+
+        self.client.post(url, {"start_date": "2030-05-12", "end_date": "2030-05-16", "total_price": "100"})
+        self.assertEqual(Loan.objects.filter(item=self.item).count(), 1)
+
+        self.client.post(url, {"start_date": "2030-05-15", "end_date": "2030-05-16", "total_price": "100"})
+        self.assertEqual(Loan.objects.filter(item=self.item).count(), 2)
+
+    def test_availability_endpoint(self):
+        url = reverse("catalog:availability", args=[self.item.title])
+
+        response = self.client.get(url, {"month": "2030-05"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["booked"], [{"from": "2030-05-10", "to": "2030-05-14"}])
+
+        response = self.client.get(url, {"month": "2030-06"})
+        self.assertEqual(response.json()["booked"], [])
+
+        response = self.client.get(url, {"month": "June"})
+        self.assertEqual(response.status_code, 400)
+
+        # The last representable month has no next month to end the window
+        response = self.client.get(url, {"month": "9999-12"})
+        self.assertEqual(response.status_code, 400)
+
+
+class LoanApprovalTests(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        User = get_user_model()
+
+        self.patron = User.objects.create_user(
+            username="testpatron",
+            email="patron@example.com",
+            password="testpassword",
+            role=0
+        )
+
+        self.librarian = User.objects.create_user(
+            username="testlibrarian",
+            email="librarian@example.com",
+            password="testpassword",
+            role=1
+        )
+
+        self.item = Item.objects.create(title="Approvable Item", status=0)
+
+        self.first = Loan.objects.create(
+            item=self.item,
+            requester=self.patron,
+            start_date=date(2030, 5, 1),
+            end_date=date(2030, 5, 5)
+        )
+        self.second = Loan.objects.create(
+            item=self.item,
+            requester=self.patron,
+            start_date=date(2030, 5, 4),
+            end_date=date(2030, 5, 8)
+        )
+
+    def test_approve_denies_overlapping_pending_loans(self):
+        self.client.login(username="testlibrarian", password="testpassword")
+        response = self.client.post(
+            reverse("core:handle_loan_action", args=["approve", self.first.id])
+        )
+        self.assertTrue(response.json()["success"])
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.status, 1)
+        self.assertEqual(self.second.status, 2)
+
+    def test_approve_rejects_overlap_with_approved_loan(self):
+        self.first.approve()
+        self.second.status = 0
+        self.second.save()
+
+        self.client.login(username="testlibrarian", password="testpassword")
+        response = self.client.post(
+            reverse("core:handle_loan_action", args=["approve", self.second.id])
+        )
+        self.assertEqual(response.status_code, 409)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.status, 0)
+
+
+class ConcurrentLoanApprovalTests(TransactionTestCase):
+
+    def test_concurrent_approvals_leave_no_overlaps(self):
+        User = get_user_model()
+        patron = User.objects.create_user(username="testpatron", password="testpassword")
+        item = Item.objects.create(title="Contended Item", status=0)
+
+        loans = [
+            Loan.objects.create(
+                item=item,
+                requester=patron,
+                start_date=date(2030, 1, 1) + timedelta(days=i),
+                end_date=date(2030, 1, 5) + timedelta(days=i)
+            )
+            for i in range(12)
+        ]
+
+        barrier = threading.Barrier(len(loans))
+        errors = []
+
+        def approve(loan):
+            try:
+                barrier.wait()
+                loan.approve()
+            except ValidationError:
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=approve, args=(loan,)) for loan in loans]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        approved = list(Loan.objects.filter(item=item, status=1).order_by("start_date"))
+        self.assertTrue(approved)
+        for earlier, later in zip(approved, approved[1:]):
+            self.assertLess(earlier.end_date, later.start_date)
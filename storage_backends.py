@@ -1,20 +1,141 @@
 """
 Custom storage backend for Vercel Blob Storage
+
+All requests go through one pooled requests.Session per process, so uploads,
+downloads and deletes reuse keep-alive connections instead of paying a TCP
+and TLS handshake each. Every operation has a (connect, read) timeout, and
+5xx, 429 and connection errors are retried with exponential backoff.
+
+The URL, size, content type, hash and upload time of each path are kept in
+the core.BlobURL table (one indexed row per path, upserted on save), so url(),
+size() and exists() don't call the API. URLs are also memoized per process,
+and sync_index() rebuilds the table from the paginated listing.
+
+Uploads are streamed from the file in chunks (files over
+MULTIPART_THRESHOLD use the multipart API a part at a time) and opened files
+read lazily by HTTP Range, so memory use doesn't grow with the file size.
+Files that fit in the local disk cache (blob_cache) are read from disk after
+an ETag revalidation instead.
+
+Static files are uploaded by the collectstatic_blobs command through
+upload_many(), which skips unchanged files and uploads the rest in parallel,
+then writes a manifest that url() reads without touching the database.
+The manifest sits next to this module, so it ships with the function and,
+unlike STATIC_ROOT, is never served.
+.vercel_blob_cache.json, which this used to rewrite after every change,
+is imported by a migration.
 """
 
+import io
 import os
 import time
 import re
 import json
+import hashlib
+import random
+import tempfile
+import threading
 import requests
 import mimetypes
-from io import BytesIO
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from django.core.files.base import ContentFile
+from requests.adapters import HTTPAdapter
+import instrumentation
+from blob_cache import BlobDiskCache
+from django.core.files.base import File
 from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.deconstruct import deconstructible
 from django.conf import settings
-from urllib.parse import urlparse
+
+# (connect, read) timeouts in seconds per operation, override with
+# VERCEL_BLOB_TIMEOUTS in settings
+DEFAULT_TIMEOUTS = {
+    'upload': (3.05, 60),
+    'download': (3.05, 30),
+    'delete': (3.05, 15),
+    'list': (3.05, 15),
+}
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+MAX_RETRIES = 3
+BACKOFF = 0.25  # seconds, doubled after every attempt
+MAX_BACKOFF = 8
+POOL_SIZE = 16
+UPLOAD_WORKERS = 8  # below POOL_SIZE so uploads don't wait for connections
+
+# Uploads are streamed in chunks, and files over the threshold use the
+# multipart API one part at a time. Vercel needs parts of at least 5 MB.
+UPLOAD_CHUNK_SIZE = 256 * 1024
+MULTIPART_THRESHOLD = 32 * 1024 * 1024
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# URLs per /delete request
+DELETE_BATCH_SIZE = 1000
+# Local read-through cache of downloads (see blob_cache), 0 disables it.
+# Files over a quarter of the cap are read by Range instead.
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Downloads are read through a buffer of this size from a streamed response
+READ_BUFFER_SIZE = 256 * 1024
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_session():
+    """
+    The process-wide pooled session. A forked worker builds its own, since
+    sockets inherited from the parent can't be shared safely.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                pool_size = getattr(settings, 'VERCEL_BLOB_POOL_SIZE', POOL_SIZE)
+                session = requests.Session()
+                # Retries are done in _request, where they can be counted
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=pool_size, max_retries=0
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def _count(operation, **values):
+    if 'seconds' in values:
+        # One HTTP request, for the Server-Timing of the request that made it
+        instrumentation.record('blob', values['seconds'])
+    with _stats_lock:
+        for key, value in values.items():
+            _stats[f"{operation}.{key}"] += value
+
+
+def blob_stats():
+    """Counters per operation: requests, retries, errors and seconds"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_blob_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _retry_delay(attempt, response=None):
+    if response is not None and response.status_code == 429:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(int(retry_after), MAX_BACKOFF)
+    delay = min(BACKOFF * 2 ** attempt, MAX_BACKOFF)
+    # Full jitter so workers that failed together don't retry together
+    return random.uniform(delay / 2, delay)
 
 
 @deconstructible
@@ -26,79 +147,267 @@ class VercelBlobStorage(Storage):
 
     def __init__(self):
         self.token = os.getenv('VERCEL_BLOB_READ_WRITE_TOKEN')
-        self.api_url = 'https://blob.vercel-storage.com'
-        self._cache_file = Path(settings.BASE_DIR) / '.vercel_blob_cache.json'
-        self._path_to_url = {}  # In-memory cache
+        self.api_url = getattr(
+            settings, 'VERCEL_BLOB_API_URL', 'https://blob.vercel-storage.com'
+        )
+        self.timeouts = {
+            **DEFAULT_TIMEOUTS, **getattr(settings, 'VERCEL_BLOB_TIMEOUTS', {})
+        }
+        self.max_retries = getattr(settings, 'VERCEL_BLOB_MAX_RETRIES', MAX_RETRIES)
+        self.multipart_threshold = getattr(
+            settings, 'VERCEL_BLOB_MULTIPART_THRESHOLD', MULTIPART_THRESHOLD
+        )
+        self.multipart_part_size = getattr(
+            settings, 'VERCEL_BLOB_MULTIPART_PART_SIZE', MULTIPART_PART_SIZE
+        )
+        cache_bytes = getattr(settings, 'VERCEL_BLOB_CACHE_MAX_BYTES', CACHE_MAX_BYTES)
+        self.cache = None
+        if cache_bytes:
+            self.cache = BlobDiskCache(
+                getattr(settings, 'VERCEL_BLOB_CACHE_DIR', None)
+                or os.path.join(tempfile.gettempdir(), 'hootel-blob-cache'),
+                cache_bytes,
+                getattr(settings, 'VERCEL_BLOB_CACHE_MAX_ENTRY_BYTES', None),
+            )
+        # In-memory cache of core.BlobURL, starting from the static manifest
+        self._path_to_url = _load_manifest()
 
         if not self.token:
             raise ValueError("VERCEL_BLOB_READ_WRITE_TOKEN is not set in environment variables")
 
-        # Load persistent cache from file
-        self._load_cache()
-
-    def _load_cache(self):
-        """Load URL mappings from persistent cache file"""
-        try:
-            if self._cache_file.exists():
-                with open(self._cache_file, 'r') as f:
-                    self._path_to_url = json.load(f)
-        except Exception as e:
-            print(f"Warning: Could not load Vercel Blob cache: {e}")
-            self._path_to_url = {}
-
-    def _save_cache(self):
-        """Save URL mappings to persistent cache file"""
-        try:
-            with open(self._cache_file, 'w') as f:
-                json.dump(self._path_to_url, f, indent=2)
-        except Exception as e:
-            print(f"Warning: Could not save Vercel Blob cache: {e}")
+    def _remember(self, *entries):
+        """Upsert BlobURL rows, single statements that are safe to race"""
+        from core.models import BlobURL
+
+        fields = ['url', 'size', 'content_type', 'uploaded_at', 'updated_at']
+        # Listing rows don't know the hash, they keep the one already stored
+        hashed = [entry for entry in entries if entry.sha256]
+        unhashed = [entry for entry in entries if not entry.sha256]
+        for batch, update_fields in ((hashed, fields + ['sha256']), (unhashed, fields)):
+            if batch:
+                BlobURL.objects.bulk_create(
+                    batch,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['name'],
+                    update_fields=update_fields,
+                )
+        self._path_to_url.update((entry.name, entry.url) for entry in entries)
+
+    def _lookup(self, name):
+        """URL of a (cleaned) path, or None if nothing is stored there"""
+        if name not in self._path_to_url:
+            self.prefetch_urls([name])
+        return self._path_to_url.get(name)
+
+    def prefetch_urls(self, names):
+        """
+        Load the URLs of many paths with one query, so rendering a page of
+        url() calls doesn't query once per file
+        """
+        from core.models import BlobURL
+
+        missing = {self.get_valid_name(name) for name in names} - self._path_to_url.keys()
+        if missing:
+            self._path_to_url.update(
+                BlobURL.objects.filter(name__in=missing).values_list('name', 'url')
+            )
+
+    def _request(self, operation, method, url, auth=True, **kwargs):
+        """
+        Send a request on the pooled session, retrying 5xx, 429 and
+        connection errors with backoff. Other responses are returned as is.
+        """
+        if auth:
+            kwargs['headers'] = {
+                'Authorization': f'Bearer {self.token}', **kwargs.get('headers', {})
+            }
+        session = get_session()
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = session.request(
+                    method, url, timeout=self.timeouts[operation], **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                _count(operation, requests=1, errors=1,
+                       seconds=time.monotonic() - start)
+                if attempt >= self.max_retries:
+                    raise
+                response = None
+            else:
+                _count(operation, requests=1, seconds=time.monotonic() - start)
+                if (response.status_code not in RETRY_STATUSES
+                        or attempt >= self.max_retries):
+                    return response
+                _count(operation, errors=1)
+                # Release the connection back to the pool before sleeping
+                response.close()
+
+            time.sleep(_retry_delay(attempt, response))
+            attempt += 1
+            _count(operation, retries=1)
 
     def _save(self, name, content):
         """
         Save file to Vercel Blob
         """
-        # Read file content
-        file_data = content.read()
+        # Clean the name to be URL-safe but preserve path structure
+        clean_name = self.get_valid_name(name)
+        pathname, entry = self._upload(clean_name, content)
+
+        if entry is not None:
+            self._remember(entry)
+
+        # Return the pathname that Vercel stored it as
+        return pathname
+
+    def _upload(self, clean_name, content):
+        """
+        Stream a file to Vercel Blob, returns the stored pathname and its
+        unsaved BlobURL row (None if the response had no URL). Makes no
+        database queries, so it can run on worker threads.
+        """
+        from core.models import BlobURL
 
         # Determine content type
-        content_type, _ = mimetypes.guess_type(name)
+        content_type, _ = mimetypes.guess_type(clean_name)
         if not content_type:
             content_type = 'application/octet-stream'
 
-        # Clean the name to be URL-safe but preserve path structure
-        clean_name = self.get_valid_name(name)
+        if not hasattr(content, 'chunks'):
+            content = File(content, clean_name)
+        body = _StreamBody(content, UPLOAD_CHUNK_SIZE)
+        if body.size > self.multipart_threshold:
+            result = self._upload_multipart(clean_name, content, content_type, body)
+        else:
+            result = self._upload_single(clean_name, content_type, body)
+
+        # Store the actual URL returned by Vercel
+        actual_url = result.get('url', '')
+        pathname = result.get('pathname', clean_name)
 
+        entry = None
+        if actual_url:
+            entry = BlobURL(
+                name=clean_name,
+                url=actual_url,
+                size=body.size,
+                content_type=result.get('contentType', content_type),
+                sha256=body.digest.hexdigest(),
+                uploaded_at=_uploaded_at(result),
+            )
+        return pathname or clean_name, entry
+
+    def _upload_single(self, clean_name, content_type, body):
         # Upload to Vercel Blob using the PUT endpoint with pathname
         # The PUT endpoint format preserves the pathname
-        response = requests.put(
+        response = self._request(
+            'upload',
+            'PUT',
             f"{self.api_url}/{clean_name}",
             headers={
-                'Authorization': f'Bearer {self.token}',
                 'content-type': content_type,  # Use content-type not x-content-type
             },
-            data=file_data
+            data=body
         )
 
         if response.status_code not in [200, 201]:
             raise Exception(f"Failed to upload file to Vercel Blob: {response.text}")
+        return response.json()
+
+    def _upload_multipart(self, clean_name, content, content_type, body):
+        """
+        Upload a large file with the multipart (/mpu) API, one part in
+        memory at a time
+        """
+        url = f"{self.api_url}/mpu"
+        params = {'pathname': clean_name}
+
+        def call(action, extra_headers=None, **kwargs):
+            response = self._request(
+                'upload', 'POST', url, params=params,
+                headers={'x-mpu-action': action, **(extra_headers or {})},
+                **kwargs
+            )
+            if response.status_code not in [200, 201]:
+                raise Exception(
+                    f"Failed multipart {action} to Vercel Blob: {response.text}"
+                )
+            return response.json()
+
+        created = call('create', {'x-content-type': content_type})
+        upload = {
+            'x-mpu-key': created['key'],
+            'x-mpu-upload-id': created['uploadId'],
+        }
+
+        parts = []
+        content.seek(0)
+        while True:
+            part = content.read(self.multipart_part_size)
+            if not part:
+                break
+            body.digest.update(part)
+            number = len(parts) + 1
+            result = call(
+                'upload', {**upload, 'x-mpu-part-number': str(number)}, data=part
+            )
+            parts.append({'etag': result['etag'], 'partNumber': number})
+
+        return call(
+            'complete', {**upload, 'content-type': 'application/json'}, json=parts
+        )
 
-        result = response.json()
+    def upload_many(self, files, workers=UPLOAD_WORKERS):
+        """
+        Upload [(name, local path), ...] incrementally: files whose sha256
+        matches what is already stored under their name are skipped, the rest
+        are uploaded by a bounded thread pool. Returns (uploaded, unchanged)
+        lists of cleaned names.
+        """
+        from core.models import BlobURL
 
-        # Store the actual URL returned by Vercel
-        actual_url = result.get('url', '')
-        pathname = result.get('pathname', clean_name)
+        paths = {self.get_valid_name(name): path for name, path in files}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = dict(zip(paths, pool.map(_file_digest, paths.values())))
 
-        if actual_url:
-            # Store mapping from both the original name and clean name to the URL
-            self._path_to_url[clean_name] = actual_url
-            self._path_to_url[name] = actual_url
+            stored = dict(
+                BlobURL.objects.filter(name__in=paths).values_list('name', 'sha256')
+            )
+            unchanged = [name for name in paths if stored.get(name) == digests[name]]
+            changed = [name for name in paths if stored.get(name) != digests[name]]
 
-            # Save the cache to disk for persistence
-            self._save_cache()
+            def upload(name):
+                with open(paths[name], 'rb') as f:
+                    return self._upload(name, File(f))[1]
 
-        # Return the pathname that Vercel stored it as
-        return pathname if pathname else clean_name
+            entries = [entry for entry in pool.map(upload, changed) if entry]
+
+        # One bulk upsert from this thread, the workers never touch the database
+        self._remember(*entries)
+        return changed, unchanged
+
+    def write_manifest(self, names, path=None):
+        """
+        Write {name: url} for the given names, e.g. every static file, to the
+        manifest that url() reads before the database. Written to a temporary
+        file and renamed so readers never see half a manifest.
+        """
+        self.prefetch_urls(names)
+        manifest = {
+            name: self._path_to_url[name]
+            for name in map(self.get_valid_name, names)
+            if name in self._path_to_url
+        }
+        path = Path(path or _manifest_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp, path)
+        return len(manifest)
 
     def _open(self, name, mode='rb'):
         """
@@ -107,51 +416,68 @@ class VercelBlobStorage(Storage):
         if 'w' in mode:
             raise ValueError("Writing to existing file not supported. Use save() instead.")
 
-        # Get file URL
-        url = self.url(name)
-
-        # Download file content
-        response = requests.get(url)
-        if response.status_code != 200:
+        url = self._lookup(self.get_valid_name(name))
+        if not url:
             raise FileNotFoundError(f"File not found: {name}")
 
-        return ContentFile(response.content, name=name)
+        size = self.size(name)
+        if self.cache is not None and size <= self.cache.max_entry_bytes:
+            # Revalidated against the local copy, a 304 reads from disk
+            cached, hit = self.cache.open(
+                url,
+                lambda headers: self._request(
+                    'download', 'GET', url, auth=False, stream=True, headers=headers
+                ),
+            )
+            _count('cache', hits=int(hit), misses=int(not hit))
+            blob_file = File(cached, name=name)
+            blob_file.size = size
+            return blob_file
+
+        # Nothing is downloaded until the file is read, and then only from
+        # the current position on, see BlobReader
+        reader = io.BufferedReader(BlobReader(self, url, size), READ_BUFFER_SIZE)
+        blob_file = File(reader, name=name)
+        blob_file.size = size
+        return blob_file
 
     def delete(self, name):
         """
         Delete file from Vercel Blob
         """
-        clean_name = self.get_valid_name(name)
-
-        # Get the URL from our cache
-        blob_url = None
-        if clean_name in self._path_to_url:
-            blob_url = self._path_to_url[clean_name]
-        elif name in self._path_to_url:
-            blob_url = self._path_to_url[name]
-
-        if not blob_url:
-            # File doesn't exist in cache, assume it doesn't exist
-            return
-
-        # Delete the blob using its URL
-        delete_response = requests.delete(
-            f"{self.api_url}/delete",
-            headers={
-                'Authorization': f'Bearer {self.token}',
-            },
-            json={
-                'urls': [blob_url]
-            }
-        )
-
-        if delete_response.status_code not in [200, 404]:
-            raise Exception(f"Failed to delete file from Vercel Blob: {delete_response.text}")
+        self.delete_many([name])
 
-        # Remove from cache after deletion attempt (even if file was already gone)
-        self._path_to_url.pop(name, None)
-        self._path_to_url.pop(clean_name, None)
-        self._save_cache()
+    def delete_many(self, names, batch_size=DELETE_BATCH_SIZE):
+        """
+        Delete many files with one /delete request per batch of URLs, and
+        their index rows with one query per batch
+        """
+        from core.models import BlobURL
+
+        clean_names = list(dict.fromkeys(map(self.get_valid_name, names)))
+        self.prefetch_urls(clean_names)
+        # Paths without a stored URL are assumed not to exist
+        found = [name for name in clean_names if self._path_to_url.get(name)]
+
+        for start in range(0, len(found), batch_size):
+            batch = found[start:start + batch_size]
+            # Delete the blobs using their URLs
+            delete_response = self._request(
+                'delete',
+                'DELETE',
+                f"{self.api_url}/delete",
+                json={
+                    'urls': [self._path_to_url[name] for name in batch]
+                }
+            )
+
+            if delete_response.status_code not in [200, 404]:
+                raise Exception(f"Failed to delete file from Vercel Blob: {delete_response.text}")
+
+            # Remove the mappings after deletion attempt (even if files were already gone)
+            BlobURL.objects.filter(name__in=batch).delete()
+            for name in batch:
+                self._path_to_url.pop(name, None)
 
     def exists(self, name):
         """
@@ -160,8 +486,10 @@ class VercelBlobStorage(Storage):
         # Clean the name the same way we do when saving
         clean_name = self.get_valid_name(name)
 
-        # Check if either the original name or clean name exists in persistent cache
-        return clean_name in self._path_to_url or name in self._path_to_url
+        # Always asks the table, another process may have deleted the file
+        from core.models import BlobURL
+
+        return BlobURL.objects.filter(name=clean_name).exists()
 
 
     def url(self, name):
@@ -171,11 +499,9 @@ class VercelBlobStorage(Storage):
         # Clean the name the same way we do when saving
         clean_name = self.get_valid_name(name)
 
-        # Check direct path mapping first
-        if clean_name in self._path_to_url:
-            return self._path_to_url[clean_name]
-        if name in self._path_to_url:
-            return self._path_to_url[name]
+        blob_url = self._lookup(clean_name)
+        if blob_url:
+            return blob_url
 
         # For missing files, return a placeholder URL instead of raising an exception
         # This prevents infinite loops when error pages try to load static files
@@ -189,25 +515,87 @@ class VercelBlobStorage(Storage):
         """
         Get file size
         """
-        # List all blobs to find the one with matching pathname
-        list_response = requests.get(
-            f"{self.api_url}/list",
-            headers={
-                'Authorization': f'Bearer {self.token}',
-            }
-        )
-
-        if list_response.status_code != 200:
-            raise Exception(f"Failed to get file size: {list_response.text}")
+        from core.models import BlobURL
 
-        blobs = list_response.json()['blobs']
-
-        # Find the blob with matching pathname
-        for blob in blobs:
-            if blob['pathname'] == name:
-                return blob['size']
+        clean_name = self.get_valid_name(name)
+        row = BlobURL.objects.filter(name=clean_name).values_list('url', 'size').first()
+        if row is None:
+            raise FileNotFoundError(f"File not found: {name}")
 
-        raise FileNotFoundError(f"File not found: {name}")
+        url, size = row
+        if size is None:
+            # Imported from the old cache file without a size, ask the blob
+            response = self._request('download', 'HEAD', url, auth=False)
+            if response.status_code != 200:
+                raise FileNotFoundError(f"File not found: {name}")
+            size = int(response.headers['Content-Length'])
+            BlobURL.objects.filter(name=clean_name).update(size=size)
+        return size
+
+    def listing(self, limit=1000):
+        """Every blob in the store, following the list API's cursor"""
+        cursor = None
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            response = self._request(
+                'list', 'GET', f"{self.api_url}/list", params=params
+            )
+            if response.status_code != 200:
+                raise Exception(f"Failed to list Vercel Blob files: {response.text}")
+
+            page = response.json()
+            yield from page['blobs']
+            cursor = page.get('cursor')
+            if not page.get('hasMore') or not cursor:
+                break
+
+    def sync_index(self, prune=False):
+        """
+        Upsert a BlobURL row for every blob in the listing, optionally
+        deleting rows for paths that are no longer in the store. Returns
+        (rows written, rows pruned).
+        """
+        from core.models import BlobURL
+
+        seen = set()
+        batch = []
+        written = 0
+        for blob in self.listing():
+            name = blob['pathname']
+            seen.add(name)
+            batch.append(BlobURL(
+                name=name,
+                url=blob['url'],
+                size=blob.get('size'),
+                content_type=(
+                    blob.get('contentType')
+                    or mimetypes.guess_type(name)[0]
+                    or 'application/octet-stream'
+                ),
+                uploaded_at=_uploaded_at(blob),
+            ))
+            if len(batch) >= 500:
+                self._remember(*batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            self._remember(*batch)
+            written += len(batch)
+
+        pruned = 0
+        if prune:
+            stale = [
+                pk for pk, name in BlobURL.objects.values_list('pk', 'name').iterator()
+                if name not in seen
+            ]
+            for start in range(0, len(stale), 500):
+                pruned += BlobURL.objects.filter(pk__in=stale[start:start + 500]).delete()[0]
+            for name in list(self._path_to_url):
+                if name not in seen:
+                    del self._path_to_url[name]
+        return written, pruned
 
     def get_available_name(self, name, max_length=None):
         """
@@ -221,15 +609,165 @@ class VercelBlobStorage(Storage):
         Returns a filename suitable for use with Vercel Blob
         Preserves directory structure for static files
         """
-        import re
-        # Keep forward slashes for path structure, replace backslashes
-        name = name.replace('\\', '/')
-        # Remove any dangerous path elements
-        name = name.replace('..', '')
-        # Replace spaces with underscores
-        name = name.replace(' ', '_')
-        # Keep alphanumeric, dash, underscore, dot, and forward slash
-        name = re.sub(r'[^\w\-\./]', '_', name)
-        # Remove leading slashes to prevent absolute paths
-        name = name.lstrip('/')
-        return name
\ No newline at end of file
+        return valid_name(name)
+
+
+class _StreamBody:
+    """
+    A request body that streams a file in chunks and hashes it on the way.
+    Iterating again starts from the beginning, so retries resend it all.
+    """
+
+    def __init__(self, content, chunk_size):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.size = content.size
+        self.digest = hashlib.sha256()
+
+    def __len__(self):
+        # Lets requests send a Content-Length instead of chunked encoding
+        return self.size
+
+    def __iter__(self):
+        self.digest = hashlib.sha256()
+        for chunk in self.content.chunks(self.chunk_size):
+            self.digest.update(chunk)
+            yield chunk
+
+
+class BlobReader(io.RawIOBase):
+    """
+    A seekable read-only stream over a blob URL. Reading opens one streamed
+    GET with a Range from the current position, sequential reads keep
+    consuming it and a seek elsewhere drops it, so only the bytes that are
+    read are downloaded and memory stays bounded by the caller's buffer.
+    """
+
+    def __init__(self, storage, url, size):
+        self.storage = storage
+        self.url = url
+        self.size = size
+        self.position = 0
+        self._response = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        if offset != self.position:
+            self._drop()
+            self.position = offset
+        return self.position
+
+    def _connect(self):
+        response = self.storage._request(
+            'download', 'GET', self.url, auth=False, stream=True,
+            headers={'Range': f'bytes={self.position}-'},
+        )
+        if response.status_code == 200 and self.position:
+            # Range ignored, skip to the position
+            remaining = self.position
+            while remaining:
+                skipped = response.raw.read(min(remaining, READ_BUFFER_SIZE))
+                if not skipped:
+                    break
+                remaining -= len(skipped)
+        elif response.status_code not in (200, 206):
+            response.close()
+            raise FileNotFoundError(f"Could not read {self.url}: {response.status_code}")
+        self._response = response
+
+    def readinto(self, buffer):
+        if self.position >= self.size or not len(buffer):
+            return 0
+        if self._response is None:
+            self._connect()
+        data = self._response.raw.read(len(buffer), decode_content=True)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def _drop(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def close(self):
+        self._drop()
+        super().close()
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_path():
+    return getattr(
+        settings,
+        'VERCEL_BLOB_MANIFEST',
+        Path(__file__).resolve().parent / 'blob-manifest.json',
+    )
+
+
+def _load_manifest():
+    """The {name: url} manifest written by collectstatic_blobs, if deployed"""
+    try:
+        with open(_manifest_path(), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Warning: Could not load Vercel Blob manifest: {e}")
+        return {}
+
+
+def _uploaded_at(blob):
+    uploaded_at = blob.get('uploadedAt')
+    return (parse_datetime(uploaded_at) if uploaded_at else None) or timezone.now()
+
+
+def valid_name(name):
+    # Keep forward slashes for path structure, replace backslashes
+    name = name.replace('\\', '/')
+    # Remove any dangerous path elements
+    name = name.replace('..', '')
+    # Replace spaces with underscores
+    name = name.replace(' ', '_')
+    # Keep alphanumeric, dash, underscore, dot, and forward slash
+    name = re.sub(r'[^\w\-\./]', '_', name)
+    # Remove leading slashes to prevent absolute paths
+    name = name.lstrip('/')
+    return name
+
+
+def load_json_cache(path=None):
+    """
+    Read the old .vercel_blob_cache.json, returns {path: url} keyed by the
+    cleaned name (the file also had an entry per uncleaned name)
+    """
+    path = Path(path or Path(settings.BASE_DIR) / '.vercel_blob_cache.json')
+    try:
+        with open(path, 'r') as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Warning: Could not load Vercel Blob cache: {e}")
+        return {}
+    return {valid_name(name): url for name, url in entries.items() if url}